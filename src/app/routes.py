@@ -1,14 +1,30 @@
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, Response
 import io
+import os
 import soundfile as sf
 from utils.primer_entrega.funcs import generar_sweep_inverse, wav_to_b64
 from utils.params_from_ri import obtener_parametros_de_RI
 from utils.segunda_entrega.graph import graficar_resultados,graficar_dominio_temporal,graficar_espectro
-from utils.segunda_entrega.obtener_sintetizar_ri import sintetizar_RI
-from utils.tercer_entrega.otras_func import array_multicanal_a_1d
+from utils.segunda_entrega.obtener_sintetizar_ri import sintetizar_RI, promediar_sweeps
+from utils.tercer_entrega.otras_func import array_multicanal_a_1d, get_output_filepath
 from utils.constantes.filtros import FRECUENCIAS_OCTAVA
+from utils.cache_resultados import CacheResultados
+from utils import metricas
 from . import app  
 
+# Caché de resultados de /file_upload (parámetros y gráficos) por contenido del audio
+cache_resultados = CacheResultados(str(get_output_filepath('', 2, ('temp_request', 'cache'))))
+
+# Gráficos que genera /file_upload en static/img/temp (los nombres son fijos para el front)
+GRAFICOS_ANALISIS = ('grafico_1000.png', 'time_domain_plot.png',
+                     'time_domain_plot_hilbert.png', 'freq_domain_plot.png')
+
+# Instrumentación por etapas (/metrics y Server-Timing), deshabilitada por
+# defecto. TPSYS_METRICAS=1 la habilita; TPSYS_METRICAS_MEMORIA=1 agrega el
+# pico de memoria por etapa.
+if os.environ.get('TPSYS_METRICAS') == '1':
+    metricas.habilitar(memoria=os.environ.get('TPSYS_METRICAS_MEMORIA') == '1')
+
 # Limitar tamaño máximo del body a 50MB
 app.config['MAX_CONTENT_LENGTH'] = 50 * 1024 * 1024
 
@@ -31,6 +47,7 @@ def validar_funcionamiento():
             datos = request.get_json()
             ruido_piso_db = datos['ruido_piso_db']
             frecuencias = datos['frecuencias']
+            recortar = _opcion_activada(datos.get('recortar'))
 
             # Convert string frequency keys to integers
             frecuencias_converted = {int(freq): values for freq, values in frecuencias.items()}
@@ -40,14 +57,17 @@ def validar_funcionamiento():
                                                           ri['fs'],
                                                           banda='octava',
                                                           ventana_suavizado_ms=5,
-                                                          debug_mode=True)
+                                                          debug_mode=True,
+                                                          por_banda=True,
+                                                          bandas_debug=[1000],
+                                                          recortar=recortar)
             
             graficar_resultados(1000,datos_graf,ri['fs'])
             graficar_dominio_temporal(ri['audio_data'],ri['fs'])
             graficar_dominio_temporal(ri['audio_data'],ri['fs'],hilbert=True)
             graficar_espectro(ri['audio_data'],ri['fs'])
 
-            return jsonify({"status": "success", "data": parametros_acusticos}), 200
+            return jsonify({"status": "success", "data": parametros_acusticos, "recortar": recortar}), 200
         except Exception as e:
             return jsonify({"status": "error", "message": str(e)}), 400
     
@@ -83,24 +103,140 @@ def generar():
 def file_upload():
     wav_file = request.files['file']
     
+    if not wav_file:
+        return jsonify(error='No se recibió audio_wav'), 400
+    # Opcional: recortar=1 descarta el retardo inicial y la cola de ruido
+    # antes del análisis; la respuesta informa si se recortó
+    recortar = _opcion_activada(request.form.get('recortar'))
+
+    with metricas.recolectar() as tiempos:
+        try:
+            with metricas.etapa('lectura_wav'):
+                audio_data, fs = sf.read(io.BytesIO(wav_file.read()))
+        except RuntimeError as e:
+            return jsonify(error=f'Error al leer WAV: {str(e)}'), 400
+
+        parametros = _analizar_con_cache(audio_data, fs, recortar)
+
+    # Con varios canales, 'data' es el promedio entre canales y 'canales' trae
+    # el resultado de cada uno
+    cuerpo = {"status": "success", "recortar": recortar}
+    if audio_data.ndim == 1:
+        cuerpo["data"] = parametros
+    else:
+        cuerpo["data"] = parametros['promedio']
+        cuerpo["canales"] = parametros['canales']
+    respuesta = jsonify(cuerpo)
+    if tiempos:
+        respuesta.headers['Server-Timing'] = metricas.server_timing(tiempos)
+    return respuesta, 200
+
+@app.route('/sweep_upload', methods=['POST'])
+def sweep_upload():
+    # Grabación con una o más repeticiones del sweep de /generar (duracion,
+    # f_inferior y f_superior deben ser los mismos): se promedian las RIs de
+    # todas las repeticiones y se analiza el promedio como en /file_upload
+    wav_file = request.files.get('file')
+
     if not wav_file:
         return jsonify(error='No se recibió audio_wav'), 400
 
     try:
-        audio_data, fs = sf.read(io.BytesIO(wav_file.read()))
-    except RuntimeError as e:
-        return jsonify(error=f'Error al leer WAV: {str(e)}'), 400
+        parametros_sweep = (float(request.form['duracion']),
+                            float(request.form.get('f_inferior', 20)),
+                            float(request.form.get('f_superior', 20000)))
+        repeticiones = request.form.get('repeticiones')
+        repeticiones = int(repeticiones) if repeticiones else None
+        recortar = _opcion_activada(request.form.get('recortar'))
+    except (KeyError, ValueError) as e:
+        return jsonify(error=f'Parámetros del sweep inválidos: {str(e)}'), 400
 
-    audio_data_mono = array_multicanal_a_1d(audio_data)
-    parametros_acusticos, datos_graf = obtener_parametros_de_RI(audio_data_mono, fs, banda='octava', ventana_suavizado_ms=5,debug_mode=True)
+    with metricas.recolectar() as tiempos:
+        try:
+            with metricas.etapa('lectura_wav'):
+                audio_data, fs = sf.read(io.BytesIO(wav_file.read()))
+        except RuntimeError as e:
+            return jsonify(error=f'Error al leer WAV: {str(e)}'), 400
+
+        try:
+            promedio = promediar_sweeps(array_multicanal_a_1d(audio_data), fs, parametros_sweep, repeticiones)
+        except ValueError as e:
+            return jsonify(error=str(e)), 400
+
+        parametros = _analizar_con_cache(promedio['audio_data'], fs, recortar)
+
+    respuesta = jsonify({"status": "success",
+                         "data": parametros,
+                         "recortar": recortar,
+                         "sweeps": {"posiciones_s": [p / fs for p in promedio['posiciones']],
+                                    "usadas": promedio['usadas'],
+                                    "residuos_db": promedio['residuos_db']}})
+    if tiempos:
+        respuesta.headers['Server-Timing'] = metricas.server_timing(tiempos)
+    return respuesta, 200
+
+def _opcion_activada(valor):
+    """
+    True si una opción del formulario o del JSON viene activada (True, 1,
+    'true', 'on' o 'si'); False si falta o tiene otro valor.
+    """
+    return str(valor).strip().lower() in ('true', '1', 'on', 'si', 'sí')
+
+def _analizar_con_cache(audio_data, fs, recortar=False):
+    """
+    Analiza el audio (todos los canales a la vez) y genera los gráficos de
+    /file_upload, salvo que el mismo audio ya se haya analizado con esta
+    configuración: en ese caso se reutilizan los parámetros y los gráficos
+    guardados en la caché. Con recortar, se descartan el retardo inicial y la
+    cola de ruido antes del análisis (ver obtener_parametros_de_RI), lo que
+    cambia D50, C50, C80 y Ts respecto del análisis de la RI completa.
+    """
+    with metricas.etapa('cache'):
+        clave = cache_resultados.clave(audio_data, fs, banda='octava', ventana_suavizado_ms=5, recortar=recortar)
+        entrada = cache_resultados.obtener(clave)
+        if entrada is not None:
+            for nombre, contenido in entrada['graficos'].items():
+                with open(get_output_filepath(nombre, 2, ('static', 'img', 'temp')), 'wb') as archivo:
+                    archivo.write(contenido)
+            return entrada['parametros']
+
+    parametros_acusticos, datos_graf = obtener_parametros_de_RI(audio_data, fs, banda='octava', ventana_suavizado_ms=5,debug_mode=True,
+                                                                por_banda=True, bandas_debug=[1000], recortar=recortar)
     
-    # Graficos
-    graficar_resultados(1000,datos_graf,fs)
+    # Graficos: el análisis de 1 kHz es el del primer canal; la señal y su
+    # espectro se muestran con los canales promediados
+    audio_data_mono = array_multicanal_a_1d(audio_data)
+    graficar_resultados(1000, datos_graf if audio_data.ndim == 1 else datos_graf['canales'][0], fs)
     graficar_dominio_temporal(audio_data_mono,fs)
     graficar_dominio_temporal(audio_data_mono,fs,hilbert=True)
     graficar_espectro(audio_data_mono,fs)
 
-    return jsonify({
-        "status": "success",
-        "data": parametros_acusticos
-    }), 200
\ No newline at end of file
+    graficos = {}
+    for nombre in GRAFICOS_ANALISIS:
+        with open(get_output_filepath(nombre, 2, ('static', 'img', 'temp')), 'rb') as archivo:
+            graficos[nombre] = archivo.read()
+    if audio_data.ndim == 1:
+        parametros_json = _a_json(parametros_acusticos)
+    else:
+        parametros_json = {'promedio': _a_json(parametros_acusticos['promedio']),
+                           'canales': [_a_json(canal) for canal in parametros_acusticos['canales']]}
+    cache_resultados.guardar(clave, {'parametros': parametros_json, 'graficos': graficos})
+    return parametros_json
+
+def _a_json(parametros_acusticos):
+    """
+    {frecuencia: {parametro: valor}} con claves de texto y valores float de Python.
+    """
+    return {str(freq): {p: float(v) for p, v in valores.items()}
+            for freq, valores in parametros_acusticos.items()}
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    estadisticas = cache_resultados.estadisticas()
+    adicionales = {f'cache_{nombre}_total': ('counter', estadisticas[nombre])
+                   for nombre in ('aciertos_memoria', 'aciertos_disco', 'fallos', 'guardados',
+                                  'descartes_memoria', 'descartes_disco')}
+    adicionales.update({f'cache_{nombre}': ('gauge', estadisticas[nombre])
+                        for nombre in ('entradas_memoria', 'bytes_memoria', 'entradas_disco', 'bytes_disco')})
+    return Response(metricas.exportar_prometheus(adicionales),
+                    content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -11,6 +11,10 @@ function uploadFile() {
         
         // Find the form that contains the file input
         const form = fileInput.closest('form');
+        const recortar = form.querySelector('#recortar');
+        if (recortar && recortar.checked) {
+            formData.append('recortar', '1');
+        }
         const submitBtn = form.querySelector('button[type="submit"], button[type="button"]');
         const originalBtnText = submitBtn.innerHTML;
         submitBtn.disabled = true;
@@ -46,8 +50,10 @@ function enviarFormulario(apiUrl = '/validar_funcionamiento') {
     const ruidoPisoDb = parseFloat(form.querySelector('#ruido_piso_db').value);
     
     // Prepare the data object with all required fields
+    const recortar = form.querySelector('#recortar');
     const datos = {
         ruido_piso_db: ruidoPisoDb,
+        recortar: recortar ? recortar.checked : false,
         frecuencias: {}
     };
     
@@ -0,0 +1,30 @@
+# Parámetros que se comparan en valor absoluto (dB o puntos porcentuales); el
+# resto son tiempos y se comparan en forma relativa
+PARAMETROS_ABSOLUTOS = ('C50', 'C80', 'D50')
+
+
+def desvio(ref, res, parametro):
+    """
+    Desvío de un parámetro entre dos resultados de obtener_parametros_de_RI
+    para una banda: relativo para los tiempos, absoluto para PARAMETROS_ABSOLUTOS.
+    """
+    d = abs(res[parametro] - ref[parametro])
+    if parametro not in PARAMETROS_ABSOLUTOS:
+        d /= abs(ref[parametro])
+    return float(d)
+
+
+def desvios_fuera(ref, res, tolerancia, etiqueta=''):
+    """
+    Compara ref y res banda por banda y retorna una línea por (banda, parámetro)
+    cuyo desvío supera la tolerancia. tolerancia es {parametro: valor} o
+    {parametro: función de la frecuencia central que da el valor}.
+    """
+    fuera = []
+    for fc in ref:
+        for parametro, tol in tolerancia.items():
+            tol = tol(fc) if callable(tol) else tol
+            d = desvio(ref[fc], res[fc], parametro)
+            if not d <= tol:
+                fuera.append(f'{parametro} en {fc} Hz{etiqueta}: {d:.3g} > {tol:.3g}')
+    return fuera
@@ -0,0 +1,41 @@
+import functools
+import numpy as np
+import pytest
+from utils.segunda_entrega.obtener_sintetizar_ri import sintetizar_RI
+from utils.constantes.filtros import FRECUENCIAS_TERCIO_OCTAVA
+
+# T60 de 2,2 s en las bandas graves a 0,4 s en las agudas
+TIEMPOS = {fc: (2.2 - 0.09 * i, 1.0) for i, fc in enumerate(FRECUENCIAS_TERCIO_OCTAVA)}
+
+
+@functools.lru_cache(maxsize=None)
+def _sintetizar(fs, semilla=0, delay_s=0.5):
+    np.random.seed(semilla)
+    ri = sintetizar_RI(TIEMPOS, fs=fs, piso_ruido_db=-60, delay_s=delay_s)['audio_data']
+    ri.flags.writeable = False
+    return ri
+
+
+@pytest.fixture
+def ri_sintetizada():
+    """
+    Fábrica de RI de sintetizar_RI (TIEMPOS, piso de ruido de -60 dB):
+    ri_sintetizada(fs, semilla=0, delay_s=0.5). Cada RI se sintetiza una sola
+    vez por sesión y se devuelve de solo lectura, así los casos parametrizados
+    la comparten.
+    """
+    return _sintetizar
+
+
+@pytest.fixture
+def generar_sweep_inverse():
+    """
+    generar_sweep_inverse de primer_entrega.funcs. Ese módulo es el de
+    grabación e importa sounddevice, así que sin sounddevice (o sin PortAudio)
+    las pruebas que lo usan se saltean.
+    """
+    try:
+        from utils.primer_entrega.funcs import generar_sweep_inverse
+    except (ImportError, OSError) as e:
+        pytest.skip(f'sin sounddevice: {e}')
+    return generar_sweep_inverse
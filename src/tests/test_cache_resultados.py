@@ -0,0 +1,28 @@
+import os
+import time
+from utils.cache_resultados import CacheResultados, ANTIGUEDAD_TEMPORAL_S, SUFIJO_TEMPORAL
+
+
+def test_borra_solo_temporales_abandonadas(tmp_path):
+    abandonada = tmp_path / f'abc.1.1{SUFIJO_TEMPORAL}'
+    en_curso = tmp_path / f'def.2.2{SUFIJO_TEMPORAL}'
+    for carpeta in (abandonada, en_curso):
+        carpeta.mkdir()
+        (carpeta / 'grafico.png').write_bytes(b'\x89PNG')
+    antes = time.time() - ANTIGUEDAD_TEMPORAL_S - 60
+    os.utime(abandonada, (antes, antes))
+
+    cache = CacheResultados(str(tmp_path))
+
+    assert not abandonada.exists()
+    assert (en_curso / 'grafico.png').exists()
+    assert cache.estadisticas()['entradas_disco'] == 0
+
+
+def test_indexa_entradas_guardadas(tmp_path):
+    entrada = {'parametros': {'1000': {'EDT': 1.0}}, 'graficos': {'grafico.png': b'\x89PNG'}}
+    CacheResultados(str(tmp_path)).guardar('abc', entrada)
+
+    cache = CacheResultados(str(tmp_path))
+
+    assert cache.obtener('abc') == entrada
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from scipy import signal as sp_signal
+from utils.segunda_entrega import obtener_sintetizar_ri as modulo
+from utils.segunda_entrega.obtener_sintetizar_ri import (obtener_RI_por_deconvolucion, deconvolucion_por_bloques,
+                                                         espectro_filtro_inverso, largo_fft_filtro_inverso)
+
+FS = 48000
+PARAMETROS_SWEEP = (1.0, 20, 20000)
+
+
+@pytest.fixture
+def grabacion(generar_sweep_inverse):
+    sweep, inverso, _ = generar_sweep_inverse(PARAMETROS_SWEEP[0], fs=FS)
+    ri = np.random.default_rng(0).standard_normal(FS // 2) * np.exp(-np.arange(FS // 2) / (0.05 * FS))
+    return sp_signal.fftconvolve(sweep, ri), inverso
+
+
+def test_largo_fft_potencia_de_2():
+    assert [largo_fft_filtro_inverso(n) for n in (1, 2, 3, 1000, 1024, 1025)] == [1, 2, 4, 1024, 1024, 2048]
+
+
+def test_espectro_guardado_como_filtro_explicito(grabacion):
+    audio, inverso = grabacion
+    ref = obtener_RI_por_deconvolucion(audio, inverso, fs=FS)['audio_data']
+    for extra in (0, 100, 1000):
+        # Largos parecidos comparten el espectro de la misma potencia de 2
+        grabado = np.concatenate([audio, np.zeros(extra)])
+        ri = obtener_RI_por_deconvolucion(grabado, fs=FS, parametros_sweep=PARAMETROS_SWEEP)['audio_data']
+        np.testing.assert_allclose(ri[:len(ref)], ref, atol=1e-9)
+
+
+def test_bloques_con_espectro_guardado(grabacion):
+    audio, inverso = grabacion
+    ref = np.concatenate([tramo for _, tramo in deconvolucion_por_bloques(audio, inverso, fs=FS)])
+    res = np.concatenate([tramo for _, tramo in deconvolucion_por_bloques(audio, fs=FS,
+                                                                          parametros_sweep=PARAMETROS_SWEEP)])
+    np.testing.assert_allclose(res, ref, atol=1e-9 * np.max(np.abs(ref)))
+
+
+def test_cache_limitada_en_bytes(generar_sweep_inverse, monkeypatch):
+    monkeypatch.setattr(modulo, '_espectros_inversos', type(modulo._espectros_inversos)())
+    # Espectros de 0,5, 1 y 2 MiB: entran los dos primeros, y el tercero (más
+    # grande que el límite) desplaza a todos los demás
+    monkeypatch.setattr(modulo, 'MAX_BYTES_ESPECTROS_INVERSOS', 2 * 2 ** 20)
+    largos = [2 ** 16, 2 ** 17, 2 ** 18]
+
+    espectro_filtro_inverso(*PARAMETROS_SWEEP, FS, largos[0])
+    espectro_filtro_inverso(*PARAMETROS_SWEEP, FS, largos[1])
+    assert [clave[-1] for clave in modulo._espectros_inversos] == largos[:2]
+
+    espectro, _ = espectro_filtro_inverso(*PARAMETROS_SWEEP, FS, largos[2])
+    assert [clave[-1] for clave in modulo._espectros_inversos] == largos[2:]
+    assert espectro_filtro_inverso(*PARAMETROS_SWEEP, FS, largos[2])[0] is espectro
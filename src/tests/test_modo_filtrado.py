@@ -0,0 +1,24 @@
+import pytest
+from utils.params_from_ri import obtener_parametros_de_RI
+from tests.comun import desvios_fuera
+
+# Desvío relativo máximo admitido de los modos de una sola pasada respecto de
+# 'filtfilt': la mitad de la diferencia apenas perceptible de 5 % para tiempos
+# de reverberación (ISO 3382-1, Anexo A). Aplican |H| en vez de |H|², con
+# bandas algo más anchas: el peor desvío medido es 1,4 % en las bandas medias
+# y agudas y 0,3 % en las graves.
+TOLERANCIA = {'EDT': 0.025, 'T60_from_T20': 0.025, 'T60_from_T30': 0.025}
+
+
+@pytest.mark.parametrize('modo_filtrado', ['reversed', 'causal'])
+@pytest.mark.parametrize('tipo_motor', ['directo', 'espectral'])
+@pytest.mark.parametrize('banda', ['octava', 'tercio_octava'])
+@pytest.mark.parametrize('fs', [44100, 48000, 96000])
+def test_tiempos_como_filtfilt(ri_sintetizada, fs, banda, tipo_motor, modo_filtrado):
+    fuera = []
+    for semilla in (0, 1, 2):
+        ri = ri_sintetizada(fs, semilla)
+        ref = obtener_parametros_de_RI(ri, fs, banda=banda, tipo_motor=tipo_motor)
+        res = obtener_parametros_de_RI(ri, fs, banda=banda, tipo_motor=tipo_motor, modo_filtrado=modo_filtrado)
+        fuera += desvios_fuera(ref, res, TOLERANCIA, f' (semilla {semilla})')
+    assert not fuera, f'modo_filtrado={modo_filtrado!r} fuera de tolerancia:\n' + '\n'.join(fuera)
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from utils.params_from_ri import obtener_parametros_de_RI
+from utils.segunda_entrega.filtrar import filtrar_espectral, filtrar_signal
+from tests.comun import desvios_fuera
+
+# Desvío máximo admitido del motor espectral respecto del directo, como
+# (bandas por debajo de FRECUENCIA_GRAVES, resto): relativo para los tiempos de
+# reverberación, en dB para C80 y en puntos porcentuales para D50. Los peores
+# medidos son 1,1e-3 (T30 en graves), 0,06 dB y 0,42 puntos, con la RI
+# empezando en el sonido directo.
+TOLERANCIA = {'EDT': (2e-3, 5e-4), 'T60_from_T20': (1e-3, 3e-4), 'T60_from_T30': (3e-3, 1e-3),
+              'C80': (0.1, 0.15), 'D50': (0.5, 1.0)}
+FRECUENCIA_GRAVES = 250
+
+# Desvío máximo muestra a muestra de las bandas, en dB respecto del pico de la banda
+TOLERANCIA_BANDAS_DB = -60.0
+
+# (delay_s, recortar, parámetros comparados). Con 0,5 s de retardo y sin recortar,
+# C80 y D50 miden el ruido previo (a -90 dB) y no se comparan.
+ESCENARIOS = {'retardo': (0.5, False, ('EDT', 'T60_from_T20', 'T60_from_T30')),
+              'sonido_directo': (0.0, False, tuple(TOLERANCIA)),
+              'recorte': (0.5, True, tuple(TOLERANCIA))}
+
+
+@pytest.mark.parametrize('delay_s', [0.0, 0.5])
+@pytest.mark.parametrize('banda', ['octava', 'tercio_octava'])
+@pytest.mark.parametrize('fs', [44100, 48000, 96000])
+def test_bandas_como_sosfiltfilt(ri_sintetizada, fs, banda, delay_s):
+    ri = ri_sintetizada(fs, delay_s=delay_s)
+    ref, frecuencias = filtrar_signal(ri, fs, tipo_filtro=banda, como_matriz=True)
+    res, _, _ = filtrar_espectral(ri, fs, tipo_filtro=banda)
+    desvio_db = 20 * np.log10(np.max(np.abs(res - ref), axis=-1) / np.max(np.abs(ref), axis=-1))
+    fuera = [f'{fc} Hz: {d:.1f} dB' for fc, d in zip(frecuencias, desvio_db) if d > TOLERANCIA_BANDAS_DB]
+    assert not fuera, f'bandas espectrales fuera de tolerancia: {fuera}'
+
+
+@pytest.mark.parametrize('escenario', list(ESCENARIOS))
+@pytest.mark.parametrize('banda', ['octava', 'tercio_octava'])
+@pytest.mark.parametrize('fs', [44100, 48000, 96000])
+def test_parametros_como_motor_directo(ri_sintetizada, fs, banda, escenario):
+    delay_s, recortar, parametros = ESCENARIOS[escenario]
+    tolerancia = {p: (lambda fc, t=TOLERANCIA[p]: t[fc >= FRECUENCIA_GRAVES]) for p in parametros}
+    fuera = []
+    for semilla in (0, 1):
+        ri = ri_sintetizada(fs, semilla, delay_s)
+        ref = obtener_parametros_de_RI(ri, fs, banda=banda, recortar=recortar)
+        res = obtener_parametros_de_RI(ri, fs, banda=banda, recortar=recortar, tipo_motor='espectral')
+        fuera += desvios_fuera(ref, res, tolerancia, f' (semilla {semilla})')
+    assert not fuera, 'motor espectral fuera de tolerancia:\n' + '\n'.join(fuera)
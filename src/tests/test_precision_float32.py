@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+from utils.params_from_ri import obtener_parametros_de_RI
+from tests.comun import desvios_fuera
+
+# Desvío máximo admitido de dtype=float32 respecto de float64: relativo para
+# los tiempos de reverberación, en dB para C80
+TOLERANCIA = {'EDT': 1e-3, 'T60_from_T20': 1e-3, 'T60_from_T30': 1e-3, 'C80': 0.05}
+
+
+@pytest.mark.parametrize('tipo_motor', ['directo', 'espectral'])
+@pytest.mark.parametrize('banda', ['octava', 'tercio_octava'])
+@pytest.mark.parametrize('fs', [44100, 48000, 96000])
+def test_float32_como_float64(ri_sintetizada, fs, banda, tipo_motor):
+    fuera = []
+    for semilla in (0, 1, 2):
+        ri = ri_sintetizada(fs, semilla)
+        ref = obtener_parametros_de_RI(ri, fs, banda=banda, tipo_motor=tipo_motor)
+        res = obtener_parametros_de_RI(ri, fs, banda=banda, tipo_motor=tipo_motor, dtype=np.float32)
+        fuera += desvios_fuera(ref, res, TOLERANCIA, f' (semilla {semilla})')
+    assert not fuera, 'float32 fuera de tolerancia:\n' + '\n'.join(fuera)
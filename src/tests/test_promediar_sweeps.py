@@ -0,0 +1,84 @@
+import io
+import numpy as np
+import pytest
+import soundfile as sf
+from scipy import signal as sp_signal
+from utils.segunda_entrega.obtener_sintetizar_ri import promediar_sweeps
+
+FS = 48000
+PARAMETROS_SWEEP = (2.0, 20, 20000)
+
+# Desvío máximo admitido (dB respecto del pico) entre el promedio de
+# repeticiones idénticas de un sweep y la RI de una sola repetición
+TOLERANCIA_DB = -120.0
+
+# Silencio antes del primer sweep (s)
+PREVIO_S = 0.3
+
+
+@pytest.fixture
+def respuesta(generar_sweep_inverse):
+    """
+    Respuesta de una RI sintética (ruido con decaimiento de T60 0,8 s) al
+    sweep. La localización de las repeticiones se guía por el sonido
+    directo, así que la RI empieza con un pico.
+    """
+    sweep, _, _ = generar_sweep_inverse(PARAMETROS_SWEEP[0], fs=FS)
+    rng = np.random.default_rng(0)
+    t = np.arange(int(1.2 * FS)) / FS
+    ri = rng.standard_normal(len(t)) * 10 ** (-3 * t / 0.8) + 10 ** (-70 / 20) * rng.standard_normal(len(t))
+    ri[0] += 10 * np.max(np.abs(ri))
+    return sp_signal.fftconvolve(sweep, ri)
+
+
+def _grabacion(respuesta, repeticiones, silencio_s):
+    previo = int(PREVIO_S * FS)
+    periodo = int((PARAMETROS_SWEEP[0] + silencio_s) * FS)
+    x = np.zeros(previo + repeticiones * periodo + len(respuesta))
+    for r in range(repeticiones):
+        x[previo + r * periodo:previo + r * periodo + len(respuesta)] += respuesta
+    return x
+
+
+@pytest.mark.parametrize('repeticiones', [2, 4])
+@pytest.mark.parametrize('silencio_s', [1.5, 0.2])
+def test_repeticiones_identicas_como_una(respuesta, silencio_s, repeticiones):
+    unica = promediar_sweeps(_grabacion(respuesta, 1, silencio_s), FS, PARAMETROS_SWEEP)['audio_data']
+    promedio = promediar_sweeps(_grabacion(respuesta, repeticiones, silencio_s), FS, PARAMETROS_SWEEP,
+                                n_repeticiones=repeticiones)
+
+    assert promedio['usadas'] == [True] * repeticiones
+    ri = promedio['audio_data']
+    desvio_db = 20 * np.log10(max(np.max(np.abs(ri - unica[:len(ri)])), 1e-300))
+    assert desvio_db <= TOLERANCIA_DB
+
+
+def test_sweep_upload(respuesta, tmp_path, monkeypatch):
+    from app import routes
+    from utils.cache_resultados import CacheResultados
+    # Sin gráficos ni caché compartida: la ruta solo se prueba por su respuesta
+    monkeypatch.setattr(routes, 'cache_resultados', CacheResultados(str(tmp_path)))
+    for nombre in ('graficar_resultados', 'graficar_dominio_temporal', 'graficar_espectro'):
+        monkeypatch.setattr(routes, nombre, lambda *args, **kwargs: None)
+    monkeypatch.setattr(routes, 'GRAFICOS_ANALISIS', ())
+
+    wav = io.BytesIO()
+    sf.write(wav, _grabacion(respuesta, 3, 1.5) * 0.1, FS, format='WAV', subtype='FLOAT')
+    cliente = routes.app.test_client()
+    r = cliente.post('/sweep_upload', content_type='multipart/form-data',
+                     data={'file': (io.BytesIO(wav.getvalue()), 'sweeps.wav'),
+                           'duracion': str(PARAMETROS_SWEEP[0]), 'repeticiones': '3'})
+
+    assert r.status_code == 200
+    cuerpo = r.get_json()
+    assert cuerpo['status'] == 'success'
+    assert cuerpo['sweeps']['usadas'] == [True] * 3
+    np.testing.assert_allclose(np.diff(cuerpo['sweeps']['posiciones_s']), PARAMETROS_SWEEP[0] + 1.5, atol=1e-3)
+    assert set(cuerpo['data']['1000']) >= {'EDT', 'T60_from_T30', 'C80', 'D50'}
+
+
+def test_sweep_upload_sin_duracion(generar_sweep_inverse):
+    from app import routes
+    r = routes.app.test_client().post('/sweep_upload', content_type='multipart/form-data',
+                                      data={'file': (io.BytesIO(b'RIFF'), 'sweeps.wav')})
+    assert r.status_code == 400
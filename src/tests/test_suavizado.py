@@ -0,0 +1,11 @@
+import numpy as np
+import pytest
+from scipy import signal
+from utils.tercer_entrega.suavizado import envolvente_hilbert
+
+
+@pytest.mark.parametrize('N', [1000, 1001, 1024, 997])
+def test_envolvente_sin_relleno_como_scipy(N):
+    x = np.random.default_rng(N).standard_normal((3, N))
+    np.testing.assert_allclose(envolvente_hilbert(x), np.abs(signal.hilbert(x)), atol=1e-12)
+
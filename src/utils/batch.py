@@ -0,0 +1,204 @@
+"""
+Análisis por lotes de respuestas al impulso (sin gráficos).
+
+Recorre directorios o patrones de archivos WAV, analiza cada uno con
+obtener_parametros_de_RI en un pool de procesos y escribe un resultado por
+archivo (JSONL o CSV) a medida que se completan.
+
+Uso (desde la carpeta src):
+    python -m utils.batch mediciones/ -o resultados.jsonl
+    python -m utils.batch "sala_*/**/*.wav" -o resultados.csv --banda tercio_octava --procesos 8
+    python -m utils.batch mediciones/ -o resultados.jsonl --continuar
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import soundfile as sf
+from utils.tercer_entrega.otras_func import array_multicanal_a_1d
+from utils.params_from_ri import obtener_parametros_de_RI
+from utils.resultados import ExportadorResultados, ids_exportados
+
+# Muestras por bloque al leer los WAV
+TAMANO_BLOQUE_LECTURA = 1 << 16
+
+# Extensiones que se buscan al recorrer un directorio
+EXTENSIONES_AUDIO = ('.wav', '.flac', '.aiff', '.aif')
+
+
+def leer_ri(ruta, tamano_bloque=TAMANO_BLOQUE_LECTURA):
+    """
+    Lee un archivo de audio por bloques y lo pasa a mono con
+    array_multicanal_a_1d, sin tener en memoria todos los canales a la vez.
+
+    Parámetros
+    ----------
+    ruta : str
+        Ruta del archivo.
+    tamano_bloque : int, opcional
+        Muestras por bloque. Por defecto TAMANO_BLOQUE_LECTURA.
+
+    Retorna
+    -------
+    tuple
+        (audio_mono, fs): array 1D float64 y frecuencia de muestreo en Hz.
+    """
+    with sf.SoundFile(ruta) as archivo:
+        mono = np.empty(archivo.frames)
+        bloque = np.empty((tamano_bloque, archivo.channels))
+        inicio = 0
+        while inicio < archivo.frames:
+            leidas = archivo.read(out=bloque[:min(tamano_bloque, archivo.frames - inicio)])
+            if len(leidas) == 0:
+                break
+            mono[inicio:inicio + len(leidas)] = array_multicanal_a_1d(leidas)
+            inicio += len(leidas)
+        return mono[:inicio], archivo.samplerate
+
+
+def analizar_archivo(ruta, **opciones):
+    """
+    Lee y analiza un archivo. Se ejecuta en los procesos del pool.
+
+    Parámetros
+    ----------
+    ruta : str
+        Ruta del archivo.
+    **opciones
+        Argumentos para obtener_parametros_de_RI (banda, ventana_suavizado_ms,
+        tipo_motor, fs_analisis, ...).
+
+    Retorna
+    -------
+    ResultadoAnalisis
+    """
+    ri, fs = leer_ri(ruta)
+    return obtener_parametros_de_RI(ri, fs, salida='columnar', **opciones)
+
+
+def buscar_archivos(entradas, recursivo=True):
+    """
+    Expande directorios y patrones glob a una lista ordenada de archivos de
+    audio, sin repetidos.
+    """
+    archivos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            patron = os.path.join(entrada, '**', '*') if recursivo else os.path.join(entrada, '*')
+            candidatos = glob.glob(patron, recursive=recursivo)
+            archivos.extend(c for c in candidatos if c.lower().endswith(EXTENSIONES_AUDIO))
+        else:
+            archivos.extend(glob.glob(entrada, recursive=True) or [entrada])
+    return sorted(set(os.path.normpath(a) for a in archivos if os.path.isfile(a)))
+
+
+def analizar_lote(archivos, salida, procesos=None, continuar=False, opciones=None, progreso=True):
+    """
+    Analiza una lista de archivos en un pool de procesos y escribe cada
+    resultado en salida apenas está listo (en orden de finalización).
+
+    Parámetros
+    ----------
+    archivos : list of str
+        Archivos a analizar. La ruta es el id del resultado.
+    salida : str
+        Archivo de resultados ('.jsonl' o '.csv').
+    procesos : int, opcional
+        Procesos del pool. Por defecto, uno por núcleo.
+    continuar : bool, opcional
+        Si es True, se saltean los archivos que ya están en salida y los nuevos
+        resultados se agregan al final. Por defecto False.
+    opciones : dict, opcional
+        Argumentos para obtener_parametros_de_RI.
+    progreso : bool, opcional
+        Si es True, informa el avance por stderr. Por defecto True.
+
+    Retorna
+    -------
+    dict
+        'analizados', 'salteados', 'errores' (lista de (archivo, mensaje)),
+        'segundos' y 'archivos_por_segundo'.
+    """
+    opciones = opciones or {}
+    hechos = ids_exportados(salida) if continuar else set()
+    pendientes = [a for a in archivos if a not in hechos]
+
+    errores = []
+    analizados = 0
+    inicio = time.perf_counter()
+    with ExportadorResultados(salida, continuar=continuar) as exportador, \
+            ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {pool.submit(analizar_archivo, archivo, **opciones): archivo for archivo in pendientes}
+        for futuro in as_completed(futuros):
+            archivo = futuros[futuro]
+            try:
+                exportador.escribir(futuro.result(), archivo)
+                analizados += 1
+            except Exception as e:
+                errores.append((archivo, str(e)))
+                print(f"ERROR en {archivo}: {e}", file=sys.stderr)
+            if progreso:
+                hechos_ahora = analizados + len(errores)
+                transcurrido = time.perf_counter() - inicio
+                print(f"[{hechos_ahora}/{len(pendientes)}] {archivo} "
+                      f"({hechos_ahora / transcurrido:.2f} archivos/s)", file=sys.stderr)
+
+    segundos = time.perf_counter() - inicio
+    return {'analizados': analizados,
+            'salteados': len(archivos) - len(pendientes),
+            'errores': errores,
+            'segundos': segundos,
+            'archivos_por_segundo': analizados / segundos if segundos > 0 else 0.0}
+
+
+def _fs_analisis(valor):
+    return valor if valor in (None, 'auto') else float(valor)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('entradas', nargs='+', help='Directorios, archivos o patrones glob')
+    parser.add_argument('-o', '--salida', required=True, help="Archivo de resultados ('.jsonl' o '.csv')")
+    parser.add_argument('--banda', default='octava', choices=['octava', 'tercio_octava'])
+    parser.add_argument('--ventana', type=float, default=5, help='Ventana de suavizado en ms')
+    parser.add_argument('--motor', default='directo', choices=['directo', 'espectral'])
+    parser.add_argument('--modo-filtrado', default='filtfilt', choices=['filtfilt', 'reversed', 'causal'])
+    parser.add_argument('--fs-analisis', type=_fs_analisis, default=None,
+                        help="Frecuencia de análisis de las curvas: Hz o 'auto'")
+    parser.add_argument('--recortar', action='store_true',
+                        help='Recortar el retardo inicial y la cola de ruido antes de analizar')
+    parser.add_argument('--procesos', type=int, default=None, help='Por defecto, uno por núcleo')
+    parser.add_argument('--no-recursivo', action='store_true', help='No entrar en subdirectorios')
+    parser.add_argument('--continuar', action='store_true',
+                        help='Saltear los archivos que ya están en la salida y agregar al final')
+    parser.add_argument('--silencioso', action='store_true', help='No informar el avance')
+    args = parser.parse_args(argv)
+
+    if os.path.splitext(args.salida)[1].lower() not in ('.jsonl', '.csv'):
+        parser.error("La salida debe ser un archivo '.jsonl' o '.csv'")
+
+    archivos = buscar_archivos(args.entradas, recursivo=not args.no_recursivo)
+    if not archivos:
+        parser.error('No se encontraron archivos de audio')
+
+    opciones = {'banda': args.banda,
+                'ventana_suavizado_ms': args.ventana,
+                'tipo_motor': args.motor,
+                'modo_filtrado': args.modo_filtrado,
+                'fs_analisis': args.fs_analisis,
+                'recortar': args.recortar}
+    resumen = analizar_lote(archivos, args.salida, procesos=args.procesos, continuar=args.continuar,
+                            opciones=opciones, progreso=not args.silencioso)
+
+    print(f"{resumen['analizados']} analizados, {resumen['salteados']} salteados, "
+          f"{len(resumen['errores'])} con error en {resumen['segundos']:.1f} s "
+          f"({resumen['archivos_por_segundo']:.2f} archivos/s)", file=sys.stderr)
+    return 1 if resumen['errores'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,434 @@
+"""
+Mediciones de rendimiento de las etapas del análisis.
+
+Uso (desde la carpeta src):
+    python -m utils.benchmark promedio_movil
+    python -m utils.benchmark workers
+    python -m utils.benchmark suite --comparar
+    python -m utils.benchmark suite --guardar otra_linea_base.json
+
+La línea de base de referencia está versionada en utils/linea_base_benchmark.json
+(LINEA_BASE): es la suite completa medida en una sola máquina, con las
+versiones de Python, NumPy y SciPy guardadas en 'entorno'. --comparar sin ruta
+compara contra ella. Los tiempos dependen de la máquina, así que para buscar
+regresiones conviene comparar contra una línea de base medida en el mismo
+equipo. Cuando un cambio modifica a propósito el rendimiento, se regenera con
+    python -m utils.benchmark suite --guardar
+y se versiona junto con el cambio.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+import tracemalloc
+import numpy as np
+import scipy
+from concurrent.futures import ThreadPoolExecutor
+from scipy import signal as sp_signal
+from utils.tercer_entrega.suavizado import filtro_promedio_movil, hilbert_transform, envolvente_hilbert
+from utils.tercer_entrega.schroeder_lundeby import lundeby_bandas, integral_schroeder
+from utils.tercer_entrega.param_acusticos import calcular_parametros_acusticos
+from utils.segunda_entrega.escala_log import escala_log
+from utils.segunda_entrega.filtrar import filtrar_signal
+from utils.params_from_ri import obtener_parametros_de_RI
+from utils.plan_analisis import obtener_plan_analisis
+from utils.segunda_entrega.obtener_sintetizar_ri import sintetizar_RI, obtener_RI_por_deconvolucion
+from utils.constantes.filtros import FRECUENCIAS_OCTAVA
+
+# Grilla de la suite de etapas: frecuencias de muestreo, T60 (s) y tipos de banda
+GRILLA_FS = (44100, 48000, 96000)
+GRILLA_T60 = (0.3, 1.0, 3.0, 8.0)
+GRILLA_BANDAS = ('octava', 'tercio_octava')
+
+# Una etapa se marca como regresión si tarda más de (1 + umbral) veces la
+# línea de base y además la diferencia supera este mínimo (ruido de medición)
+UMBRAL_REGRESION = 0.25
+DIFERENCIA_MINIMA_S = 1e-3
+
+# Duración del sweep de las etapas de deconvolución (s)
+DURACION_SWEEP_S = 5.0
+
+# Línea de base versionada de la suite (ver el docstring del módulo)
+LINEA_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'linea_base_benchmark.json')
+
+
+def _mejor_tiempo(funcion, repeticiones=5):
+    """
+    Mejor tiempo (s) de varias ejecuciones de funcion().
+    """
+    return min(timeit.repeat(funcion, number=1, repeat=repeticiones))
+
+
+def benchmark_promedio_movil(fs=96000, duracion_s=6.0, n_bandas=1,
+                             ventanas_ms=(1, 2, 5, 10, 20, 50), repeticiones=5):
+    """
+    Compara filtro_promedio_movil (suma acumulada) con np.convolve(mode='same')
+    para distintos largos de ventana.
+
+    Parámetros
+    ----------
+    fs : int, opcional
+        Frecuencia de muestreo en Hz. Por defecto 96000.
+    duracion_s : float, opcional
+        Duración de la señal de prueba en segundos. Por defecto 6 s.
+    n_bandas : int, opcional
+        Cantidad de filas de la matriz de prueba. Por defecto 1.
+    ventanas_ms : tuple, opcional
+        Ventanas a medir, en milisegundos.
+    repeticiones : int, opcional
+        Repeticiones por medición (se informa la mejor). Por defecto 5.
+
+    Retorna
+    -------
+    list of dict
+        Una entrada por ventana con 'ventana_ms', 'L', 't_convolve' y
+        't_acumulado' (segundos), y 'aceleracion'.
+    """
+    rng = np.random.default_rng(0)
+    x = np.abs(rng.standard_normal((n_bandas, int(duracion_s * fs))))
+
+    resultados = []
+    for ventana_ms in ventanas_ms:
+        L = int(ventana_ms * 1e-3 * fs)
+        kernel = np.ones(L) / L
+        t_convolve = _mejor_tiempo(lambda: [np.convolve(fila, kernel, mode='same') for fila in x],
+                                   repeticiones)
+        t_acumulado = _mejor_tiempo(lambda: filtro_promedio_movil(x, L), repeticiones)
+        resultados.append({'ventana_ms': ventana_ms,
+                           'L': L,
+                           't_convolve': t_convolve,
+                           't_acumulado': t_acumulado,
+                           'aceleracion': t_convolve / t_acumulado})
+    return resultados
+
+
+def _ri_sintetica(fs, duracion_s, t60=1.5, piso_ruido_db=-70, semilla=0):
+    """
+    Ruido blanco con decaimiento exponencial de T60 dado más un piso de ruido.
+    """
+    rng = np.random.default_rng(semilla)
+    t = np.arange(int(duracion_s * fs)) / fs
+    ri = rng.standard_normal(len(t)) * 10 ** (-3 * t / t60)
+    return ri + 10 ** (piso_ruido_db / 20) * rng.standard_normal(len(t))
+
+
+def benchmark_workers(fs=48000, duracion_s=4.0, bandas=('octava', 'tercio_octava'),
+                      n_workers=(1, 2, 4, 8), tipo_motor='directo', repeticiones=3):
+    """
+    Mide obtener_parametros_de_RI con distinta cantidad de hilos (un pool
+    creado una vez por medición y reutilizado entre repeticiones).
+
+    Parámetros
+    ----------
+    fs : int, opcional
+        Frecuencia de muestreo en Hz. Por defecto 48000.
+    duracion_s : float, opcional
+        Duración de la RI de prueba en segundos. Por defecto 4 s.
+    bandas : tuple, opcional
+        Tipos de banda a medir.
+    n_workers : tuple, opcional
+        Cantidades de hilos a medir.
+    tipo_motor : str, opcional
+        Motor del banco de filtros. Por defecto 'directo'.
+    repeticiones : int, opcional
+        Repeticiones por medición (se informa la mejor). Por defecto 3.
+
+    Retorna
+    -------
+    list of dict
+        Una entrada por (banda, n_workers) con 'banda', 'n_workers', 't' (s) y
+        'aceleracion' respecto de un solo hilo.
+    """
+    ri = _ri_sintetica(fs, duracion_s)
+
+    resultados = []
+    for banda in bandas:
+        # Primera llamada fuera de la medición: arma el plan de análisis
+        obtener_parametros_de_RI(ri, fs, banda=banda, tipo_motor=tipo_motor)
+        t_un_hilo = None
+        for n in n_workers:
+            with ThreadPoolExecutor(max_workers=n) as pool:
+                t = _mejor_tiempo(lambda: obtener_parametros_de_RI(ri, fs, banda=banda, tipo_motor=tipo_motor,
+                                                                   n_workers=n,
+                                                                   executor=pool if n > 1 else None),
+                                  repeticiones)
+            if t_un_hilo is None:
+                t_un_hilo = t
+            resultados.append({'banda': banda,
+                               'n_workers': n,
+                               't': t,
+                               'aceleracion': t_un_hilo / t})
+    return resultados
+
+
+def _pico_memoria(funcion):
+    """
+    Memoria máxima (bytes) que reserva una ejecución de funcion(), medida con
+    tracemalloc (incluye los arrays de NumPy).
+    """
+    tracemalloc.start()
+    try:
+        inicial = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        funcion()
+        return tracemalloc.get_traced_memory()[1] - inicial
+    finally:
+        tracemalloc.stop()
+
+
+def _etapas_escenario(fs, t60, banda, graficos=False, semilla=0):
+    """
+    Arma las etapas de un escenario de la suite: una RI de sintetizar_RI con el
+    mismo T60 en todas las bandas de octava, y cada etapa con su entrada ya
+    calculada (para medirla sola).
+
+    Retorna
+    -------
+    tuple
+        (etapas, n_muestras): lista de (nombre, funcion) y largo de la RI.
+    """
+    np.random.seed(semilla)
+    ri = sintetizar_RI({fc: (t60, 1.0) for fc in FRECUENCIAS_OCTAVA}, fs=fs, piso_ruido_db=-60)['audio_data']
+    plan = obtener_plan_analisis(fs, len(ri), banda=banda, ventana_suavizado_ms=5)
+
+    # Entradas de cada etapa, calculadas una vez fuera de la medición
+    ri_bandas, _ = filtrar_signal(ri, fs, sos_bandas=plan.sos_bandas, como_matriz=True)
+    envolventes = envolvente_hilbert(ri_bandas, relleno=ri_bandas.shape[-1])
+    suavizado = filtro_promedio_movil(envolventes, plan.L)
+    idx_lundeby = lundeby_bandas(suavizado, fs)
+    curva = integral_schroeder(suavizado, fs, idx_lundeby, con_energia=True)
+    curva_db = escala_log(curva['schroeder'], por_fila=True)
+
+    etapas = [
+        ('filtrar_signal', lambda: filtrar_signal(ri, fs, sos_bandas=plan.sos_bandas, como_matriz=True)),
+        ('hilbert_transform', lambda: hilbert_transform(ri_bandas)),
+        ('envolvente_hilbert', lambda: envolvente_hilbert(ri_bandas, relleno=ri_bandas.shape[-1])),
+        ('filtro_promedio_movil', lambda: filtro_promedio_movil(envolventes, plan.L)),
+        ('lundeby', lambda: lundeby_bandas(suavizado, fs)),
+        ('integral_schroeder', lambda: integral_schroeder(suavizado, fs, idx_lundeby, con_energia=True)),
+        ('calcular_parametros_acusticos', lambda: calcular_parametros_acusticos(curva_db, p2=curva['p2'], fs=fs,
+                                                                                 energia=curva['energia'])),
+        ('obtener_parametros_de_RI', lambda: obtener_parametros_de_RI(ri, fs, banda=banda, plan=plan)),
+    ]
+
+    # generar_sweep_inverse está en el módulo de grabación, que necesita sounddevice
+    try:
+        from utils.primer_entrega.funcs import generar_sweep_inverse
+    except (ImportError, OSError):
+        # OSError: sounddevice instalado sin la biblioteca PortAudio
+        generar_sweep_inverse = None
+    if generar_sweep_inverse is not None:
+        sweep, inverso, _ = generar_sweep_inverse(DURACION_SWEEP_S, fs=fs)
+        grabacion = sp_signal.fftconvolve(sweep, ri)
+        etapas += [
+            ('generar_sweep_inverse', lambda: generar_sweep_inverse(DURACION_SWEEP_S, fs=fs)),
+            ('obtener_RI_por_deconvolucion', lambda: obtener_RI_por_deconvolucion(grabacion, inverso, fs=fs)),
+        ]
+
+    if graficos:
+        # Los gráficos se escriben en static/img/temp, igual que desde la app
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        from utils.segunda_entrega.graph import graficar_resultados, graficar_dominio_temporal, graficar_espectro
+        _, datos_debug = obtener_parametros_de_RI(ri, fs, banda=banda, plan=plan, debug_mode=True,
+                                                  bandas_debug=[1000])
+
+        def _cerrando(funcion):
+            def envoltura():
+                funcion()
+                plt.close('all')
+            return envoltura
+
+        etapas += [
+            ('graficar_resultados', _cerrando(lambda: graficar_resultados(1000, datos_debug, fs))),
+            ('graficar_dominio_temporal', _cerrando(lambda: graficar_dominio_temporal(ri, fs))),
+            ('graficar_espectro', _cerrando(lambda: graficar_espectro(ri, fs))),
+        ]
+    return etapas, len(ri)
+
+
+def benchmark_suite(fs_casos=GRILLA_FS, t60_casos=GRILLA_T60, bandas=GRILLA_BANDAS,
+                    graficos=False, repeticiones=3, memoria=True, progreso=True):
+    """
+    Mide cada etapa del análisis por separado sobre una grilla de RI
+    sintetizadas (semilla fija): filtrado, envolvente, suavizado, Lundeby,
+    Schroeder, parámetros, el análisis completo, el sweep y la deconvolución
+    y, opcionalmente, los gráficos.
+
+    Parámetros
+    ----------
+    fs_casos : tuple, opcional
+        Frecuencias de muestreo. Por defecto GRILLA_FS.
+    t60_casos : tuple, opcional
+        Tiempos de reverberación de las RI (s). Por defecto GRILLA_T60.
+    bandas : tuple, opcional
+        Tipos de banda. Por defecto GRILLA_BANDAS.
+    graficos : bool, opcional
+        Si es True, mide también los gráficos de graph.py (que se escriben en
+        static/img/temp). Por defecto False.
+    repeticiones : int, opcional
+        Repeticiones por medición (se informa la mejor). Por defecto 3.
+    memoria : bool, opcional
+        Si es True, mide el pico de memoria de cada etapa (en una ejecución
+        aparte). Por defecto True.
+    progreso : bool, opcional
+        Si es True, informa el avance por stderr. Por defecto True.
+
+    Retorna
+    -------
+    list of dict
+        Una entrada por (fs, t60, banda, etapa) con 'muestras', 't' (s),
+        'muestras_por_s' y 'memoria_mb'.
+    """
+    resultados = []
+    for fs in fs_casos:
+        for t60 in t60_casos:
+            for banda in bandas:
+                etapas, n = _etapas_escenario(fs, t60, banda, graficos=graficos)
+                for nombre, funcion in etapas:
+                    if progreso:
+                        print(f"fs={fs} t60={t60} {banda}: {nombre}", file=sys.stderr)
+                    t = _mejor_tiempo(funcion, repeticiones)
+                    resultados.append({'fs': fs,
+                                       't60': float(t60),
+                                       'banda': banda,
+                                       'etapa': nombre,
+                                       'muestras': n,
+                                       't': t,
+                                       'muestras_por_s': n / t,
+                                       'memoria_mb': _pico_memoria(funcion) / 2**20 if memoria else float('nan')})
+    return resultados
+
+
+def _clave_suite(fila):
+    return (fila['fs'], float(fila['t60']), fila['banda'], fila['etapa'])
+
+
+def guardar_linea_base(resultados, ruta):
+    """
+    Guarda los resultados de benchmark_suite como línea de base (JSON), junto
+    con las versiones de Python, NumPy y SciPy y la plataforma.
+    """
+    datos = {'entorno': {'python': platform.python_version(),
+                         'numpy': np.__version__,
+                         'scipy': scipy.__version__,
+                         'plataforma': platform.platform(),
+                         'procesador': platform.processor()},
+             'resultados': resultados}
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(datos, archivo, indent=1, allow_nan=True)
+
+
+def comparar_con_linea_base(resultados, ruta, umbral=UMBRAL_REGRESION, diferencia_minima=DIFERENCIA_MINIMA_S):
+    """
+    Compara resultados de benchmark_suite con una línea de base guardada.
+
+    Parámetros
+    ----------
+    resultados : list of dict
+        Resultados actuales.
+    ruta : str
+        Archivo de guardar_linea_base.
+    umbral : float, opcional
+        Aumento relativo del tiempo a partir del cual se marca una regresión.
+        Por defecto UMBRAL_REGRESION (25 %).
+    diferencia_minima : float, opcional
+        Diferencia absoluta (s) por debajo de la cual no se marca regresión.
+
+    Retorna
+    -------
+    list of dict
+        Una entrada por etapa medida con 'fs', 't60', 'banda', 'etapa', 't',
+        't_base', 'relacion' (t / t_base) y 'estado' ('ok', 'regresion',
+        'mejora' o 'nueva').
+    """
+    with open(ruta, encoding='utf-8') as archivo:
+        base = {_clave_suite(fila): fila for fila in json.load(archivo)['resultados']}
+
+    comparacion = []
+    for fila in resultados:
+        anterior = base.get(_clave_suite(fila))
+        if anterior is None:
+            t_base, relacion, estado = float('nan'), float('nan'), 'nueva'
+        else:
+            t_base = anterior['t']
+            relacion = fila['t'] / t_base
+            diferencia = fila['t'] - t_base
+            if relacion > 1 + umbral and diferencia > diferencia_minima:
+                estado = 'regresion'
+            elif relacion < 1 / (1 + umbral) and -diferencia > diferencia_minima:
+                estado = 'mejora'
+            else:
+                estado = 'ok'
+        comparacion.append({'fs': fila['fs'], 't60': fila['t60'], 'banda': fila['banda'],
+                            'etapa': fila['etapa'], 't': fila['t'], 't_base': t_base,
+                            'relacion': relacion, 'estado': estado})
+    return comparacion
+
+
+def _imprimir_tabla(resultados):
+    columnas = list(resultados[0].keys())
+    # Las columnas de texto se ensanchan hasta el valor más largo
+    anchos = [max([12, len(c)] + [len(v) for v in (fila[c] for fila in resultados) if isinstance(v, str)])
+              for c in columnas]
+    print('  '.join(f'{c:>{a}}' for c, a in zip(columnas, anchos)))
+    for fila in resultados:
+        print('  '.join(f'{v:>{a}.4g}' if isinstance(v, float) else f'{v:>{a}}'
+                        for v, a in zip(fila.values(), anchos)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('medicion', choices=['promedio_movil', 'workers', 'suite'])
+    parser.add_argument('--fs', type=int, default=None,
+                        help='Por defecto 96000 (promedio_movil) o 48000 (workers)')
+    parser.add_argument('--duracion', type=float, default=None,
+                        help='Por defecto 6 s (promedio_movil) o 4 s (workers)')
+    parser.add_argument('--motor', default='directo', choices=['directo', 'espectral'])
+    suite = parser.add_argument_group('suite')
+    suite.add_argument('--grilla-fs', type=int, nargs='+', default=GRILLA_FS)
+    suite.add_argument('--grilla-t60', type=float, nargs='+', default=GRILLA_T60)
+    suite.add_argument('--grilla-bandas', nargs='+', default=GRILLA_BANDAS, choices=GRILLA_BANDAS)
+    suite.add_argument('--rapido', action='store_true',
+                       help='Grilla reducida: 48 kHz, T60 de 0,3 y 1 s, octavas')
+    suite.add_argument('--graficos', action='store_true', help='Medir también los gráficos de graph.py')
+    suite.add_argument('--sin-memoria', action='store_true', help='No medir el pico de memoria')
+    suite.add_argument('--repeticiones', type=int, default=3)
+    suite.add_argument('--guardar', metavar='RUTA', nargs='?', const=LINEA_BASE,
+                       help='Guardar los resultados como línea de base (por defecto, la versionada)')
+    suite.add_argument('--comparar', metavar='RUTA', nargs='?', const=LINEA_BASE,
+                       help='Comparar con una línea de base guardada (por defecto, la versionada)')
+    suite.add_argument('--umbral', type=float, default=UMBRAL_REGRESION,
+                       help='Aumento relativo del tiempo que se marca como regresión')
+    args = parser.parse_args(argv)
+
+    if args.medicion == 'promedio_movil':
+        _imprimir_tabla(benchmark_promedio_movil(fs=args.fs or 96000, duracion_s=args.duracion or 6.0))
+    elif args.medicion == 'workers':
+        _imprimir_tabla(benchmark_workers(fs=args.fs or 48000, duracion_s=args.duracion or 4.0,
+                                          tipo_motor=args.motor))
+    elif args.medicion == 'suite':
+        if args.rapido:
+            args.grilla_fs, args.grilla_t60, args.grilla_bandas = (48000,), (0.3, 1.0), ('octava',)
+        resultados = benchmark_suite(args.grilla_fs, args.grilla_t60, args.grilla_bandas,
+                                     graficos=args.graficos, repeticiones=args.repeticiones,
+                                     memoria=not args.sin_memoria)
+        _imprimir_tabla(resultados)
+        if args.guardar:
+            guardar_linea_base(resultados, args.guardar)
+        if args.comparar:
+            comparacion = comparar_con_linea_base(resultados, args.comparar, umbral=args.umbral)
+            print()
+            _imprimir_tabla(comparacion)
+            regresiones = [c for c in comparacion if c['estado'] == 'regresion']
+            if regresiones:
+                print(f"{len(regresiones)} etapas más lentas que la línea de base")
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+# Límites por defecto de cada nivel de la caché, en bytes
+MAX_BYTES_MEMORIA = 64 * 1024 * 1024
+MAX_BYTES_DISCO = 512 * 1024 * 1024
+
+# Nombre del archivo con los parámetros dentro de cada entrada en disco
+ARCHIVO_PARAMETROS = 'parametros.json'
+
+# Sufijo de las carpetas a medio escribir
+SUFIJO_TEMPORAL = '.tmp'
+
+# Antigüedad (s, por fecha de modificación) a partir de la cual una carpeta
+# temporal se considera abandonada por una escritura interrumpida. Las más
+# nuevas pueden ser de otro proceso que todavía está escribiendo
+ANTIGUEDAD_TEMPORAL_S = 3600
+
+# Versión del formato de las entradas y del análisis que las produce: entra en
+# la clave, así que al cambiarla las entradas viejas dejan de encontrarse (y se
+# descartan por antigüedad)
+VERSION_CACHE = 1
+
+
+class CacheResultados:
+    """
+    Caché de resultados de análisis (parámetros y gráficos) direccionada por
+    contenido: la clave es un hash del audio decodificado más los parámetros
+    del análisis, de modo que volver a subir el mismo audio no repite el
+    cálculo ni los gráficos.
+
+    Tiene dos niveles: una LRU en memoria y, detrás, un directorio en disco
+    (una carpeta por clave). Cada nivel se limita por tamaño en bytes y descarta
+    primero las entradas usadas hace más tiempo. Un acierto en disco sube la
+    entrada a memoria.
+
+    Una entrada es un diccionario con:
+        - 'parametros': datos serializables en JSON (por ejemplo, el
+          resultado de obtener_parametros_de_RI con claves y valores nativos).
+        - 'graficos': {nombre_archivo: bytes} con las imágenes generadas.
+
+    Es segura para usar desde varios hilos.
+
+    Ejemplo
+    -------
+    >>> cache = CacheResultados('temp_request/cache')
+    >>> clave = cache.clave(audio, fs, banda='octava', ventana_suavizado_ms=5)
+    >>> entrada = cache.obtener(clave)
+    >>> if entrada is None:
+    ...     entrada = {'parametros': analizar(audio, fs), 'graficos': {}}
+    ...     cache.guardar(clave, entrada)
+    """
+
+    def __init__(self, directorio=None, max_bytes_memoria=MAX_BYTES_MEMORIA, max_bytes_disco=MAX_BYTES_DISCO):
+        self.directorio = directorio
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+
+        self._memoria = OrderedDict()   # clave -> (entrada, bytes), la más reciente al final
+        self._bytes_memoria = 0
+        self._disco = OrderedDict()     # clave -> bytes, la más reciente al final
+        self._bytes_disco = 0
+        self._lock = threading.Lock()
+        self._contadores = {'aciertos_memoria': 0, 'aciertos_disco': 0, 'fallos': 0,
+                            'guardados': 0, 'descartes_memoria': 0, 'descartes_disco': 0}
+
+        if directorio is not None:
+            os.makedirs(directorio, exist_ok=True)
+            self._indexar_disco()
+
+    @staticmethod
+    def clave(audio, fs, **parametros):
+        """
+        Clave de caché de un audio y su configuración de análisis: hash BLAKE2b
+        de las muestras (sin copiarlas), su tipo y forma, fs, los parámetros y
+        VERSION_CACHE.
+
+        Parámetros
+        ----------
+        audio : np.ndarray
+            Audio decodificado.
+        fs : int
+            Frecuencia de muestreo en Hz.
+        **parametros
+            Parámetros del análisis (banda, ventana_suavizado_ms, ...). Deben
+            ser serializables en JSON.
+
+        Retorna
+        -------
+        str
+            Clave hexadecimal de 32 caracteres.
+        """
+        audio = np.ascontiguousarray(audio)
+        h = hashlib.blake2b(digest_size=16)
+        h.update(json.dumps({'version': VERSION_CACHE, 'dtype': audio.dtype.str, 'forma': audio.shape,
+                             'fs': fs, 'parametros': parametros}, sort_keys=True).encode())
+        h.update(memoryview(audio).cast('B'))
+        return h.hexdigest()
+
+    def obtener(self, clave):
+        """
+        Retorna la entrada guardada con esa clave, o None si no está.
+        """
+        with self._lock:
+            if clave in self._memoria:
+                self._memoria.move_to_end(clave)
+                self._contadores['aciertos_memoria'] += 1
+                return self._memoria[clave][0]
+            if clave not in self._disco:
+                self._contadores['fallos'] += 1
+                return None
+
+        entrada = self._leer_disco(clave)
+        with self._lock:
+            if entrada is None:
+                self._contadores['fallos'] += 1
+                return None
+            self._contadores['aciertos_disco'] += 1
+            if clave in self._disco:
+                self._disco.move_to_end(clave)
+            self._guardar_memoria(clave, entrada)
+        return entrada
+
+    def guardar(self, clave, entrada):
+        """
+        Guarda una entrada en memoria y, si hay directorio, en disco. Si la
+        escritura en disco falla, la entrada queda solo en memoria.
+        """
+        tamano = None
+        if self.directorio is not None:
+            tamano = self._escribir_disco(clave, entrada)
+        with self._lock:
+            self._contadores['guardados'] += 1
+            self._guardar_memoria(clave, entrada)
+            if tamano is not None:
+                self._bytes_disco += tamano - self._disco.pop(clave, 0)
+                self._disco[clave] = tamano
+                self._descartar_disco()
+
+    def estadisticas(self):
+        """
+        Retorna los contadores de aciertos, fallos, guardados y descartes, y la
+        ocupación de cada nivel.
+        """
+        with self._lock:
+            consultas = (self._contadores['aciertos_memoria'] + self._contadores['aciertos_disco']
+                         + self._contadores['fallos'])
+            aciertos = self._contadores['aciertos_memoria'] + self._contadores['aciertos_disco']
+            return {**self._contadores,
+                    'tasa_aciertos': aciertos / consultas if consultas else 0.0,
+                    'entradas_memoria': len(self._memoria),
+                    'bytes_memoria': self._bytes_memoria,
+                    'entradas_disco': len(self._disco),
+                    'bytes_disco': self._bytes_disco}
+
+    def limpiar(self):
+        """
+        Vacía los dos niveles de la caché.
+        """
+        with self._lock:
+            self._memoria.clear()
+            self._bytes_memoria = 0
+            for clave in list(self._disco):
+                shutil.rmtree(self._ruta(clave), ignore_errors=True)
+            self._disco.clear()
+            self._bytes_disco = 0
+
+    # --- Memoria (se llama con el lock tomado) ---
+
+    def _guardar_memoria(self, clave, entrada):
+        tamano = _tamano_entrada(entrada)
+        if clave in self._memoria:
+            self._bytes_memoria -= self._memoria.pop(clave)[1]
+        if tamano > self.max_bytes_memoria:
+            return
+        self._memoria[clave] = (entrada, tamano)
+        self._bytes_memoria += tamano
+        while self._bytes_memoria > self.max_bytes_memoria:
+            _, (_, tamano_viejo) = self._memoria.popitem(last=False)
+            self._bytes_memoria -= tamano_viejo
+            self._contadores['descartes_memoria'] += 1
+
+    # --- Disco ---
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, clave)
+
+    def _indexar_disco(self):
+        """
+        Carga el índice de las entradas que ya están en el directorio, de la
+        usada hace más tiempo a la más reciente. Borra las carpetas temporales
+        que haya dejado una escritura interrumpida (las modificadas hace más de
+        ANTIGUEDAD_TEMPORAL_S; las recientes se ignoran).
+        """
+        entradas = []
+        limite_temporales = time.time() - ANTIGUEDAD_TEMPORAL_S
+        for clave in os.listdir(self.directorio):
+            ruta = self._ruta(clave)
+            if clave.endswith(SUFIJO_TEMPORAL):
+                try:
+                    abandonada = os.path.getmtime(ruta) < limite_temporales
+                except OSError:
+                    # Su escritor ya la renombró o la borró
+                    abandonada = False
+                if abandonada:
+                    shutil.rmtree(ruta, ignore_errors=True)
+                continue
+            if not os.path.isfile(os.path.join(ruta, ARCHIVO_PARAMETROS)):
+                continue
+            tamano = sum(os.path.getsize(os.path.join(ruta, n)) for n in os.listdir(ruta))
+            entradas.append((os.path.getmtime(ruta), clave, tamano))
+        for _, clave, tamano in sorted(entradas):
+            self._disco[clave] = tamano
+            self._bytes_disco += tamano
+        self._descartar_disco()
+
+    def _escribir_disco(self, clave, entrada):
+        """
+        Escribe la entrada en una carpeta temporal y la renombra al final, para
+        que un lector nunca vea una entrada a medio escribir. Retorna el tamaño
+        escrito, o None si falló (por ejemplo, si otro hilo o proceso escribía
+        la misma clave a la vez y su carpeta ocupó la ruta primero).
+        """
+        ruta = self._ruta(clave)
+        temporal = f'{ruta}.{os.getpid()}.{threading.get_ident()}{SUFIJO_TEMPORAL}'
+        tamano = 0
+        try:
+            os.makedirs(temporal, exist_ok=True)
+            for nombre, contenido in entrada.get('graficos', {}).items():
+                with open(os.path.join(temporal, nombre), 'wb') as archivo:
+                    archivo.write(contenido)
+                tamano += len(contenido)
+            texto = json.dumps(entrada['parametros']).encode()
+            with open(os.path.join(temporal, ARCHIVO_PARAMETROS), 'wb') as archivo:
+                archivo.write(texto)
+            tamano += len(texto)
+
+            shutil.rmtree(ruta, ignore_errors=True)
+            os.replace(temporal, ruta)
+        except OSError:
+            shutil.rmtree(temporal, ignore_errors=True)
+            return None
+        return tamano
+
+    def _leer_disco(self, clave):
+        ruta = self._ruta(clave)
+        try:
+            with open(os.path.join(ruta, ARCHIVO_PARAMETROS), 'rb') as archivo:
+                parametros = json.loads(archivo.read())
+            graficos = {}
+            for nombre in os.listdir(ruta):
+                if nombre != ARCHIVO_PARAMETROS:
+                    with open(os.path.join(ruta, nombre), 'rb') as archivo:
+                        graficos[nombre] = archivo.read()
+            # La fecha de modificación marca el último uso (para el índice al reiniciar)
+            os.utime(ruta, (time.time(), time.time()))
+        except (OSError, ValueError):
+            with self._lock:
+                self._bytes_disco -= self._disco.pop(clave, 0)
+            return None
+        return {'parametros': parametros, 'graficos': graficos}
+
+    def _descartar_disco(self):
+        """
+        Descarta las entradas usadas hace más tiempo hasta respetar el límite
+        (se llama con el lock tomado).
+        """
+        while self._bytes_disco > self.max_bytes_disco and self._disco:
+            clave, tamano = self._disco.popitem(last=False)
+            self._bytes_disco -= tamano
+            shutil.rmtree(self._ruta(clave), ignore_errors=True)
+            self._contadores['descartes_disco'] += 1
+
+
+def _tamano_entrada(entrada):
+    """
+    Tamaño aproximado de una entrada en bytes (gráficos más parámetros).
+    """
+    graficos = sum(len(contenido) for contenido in entrada.get('graficos', {}).values())
+    return graficos + len(json.dumps(entrada['parametros']))
@@ -0,0 +1,86 @@
+import threading
+import numpy as np
+
+# Un espacio de trabajo por hilo: los buffers nunca se comparten entre hilos
+_local = threading.local()
+
+# Memoria máxima que un espacio de trabajo retiene entre cálculos: un pedido
+# excepcionalmente grande no debe quedar reservado para siempre en cada hilo
+LIMITE_BYTES_RETENIDOS = 128 * 2**20
+
+
+class EspacioTrabajo:
+    """
+    Buffers reutilizables para las etapas del análisis que trabajan sobre arrays
+    del largo de la RI (integral de Schroeder, escala logarítmica, etc.).
+
+    Cada buffer se identifica por nombre y tipo de dato, y crece a demanda hasta
+    el tamaño del pedido más grande visto; los pedidos siguientes reciben una
+    vista de la memoria ya reservada, sin volver a pedirle memoria al sistema.
+
+    Los arrays devueltos se sobreescriben en el siguiente pedido con el mismo
+    nombre, por lo que no deben guardarse más allá del cálculo que los usa.
+    Al terminar el cálculo, liberar_excedente descarta los buffers si superan
+    LIMITE_BYTES_RETENIDOS.
+    """
+
+    def __init__(self):
+        self._buffers = {}
+
+    def buffer(self, nombre, forma, dtype=np.float64):
+        """
+        Retorna un array sin inicializar de la forma pedida, que es una vista
+        del buffer nombre (agrandado si hace falta).
+
+        Parámetros
+        ----------
+        nombre : str
+            Identificador del buffer.
+        forma : tuple
+            Forma del array pedido.
+        dtype : np.dtype, opcional
+            Tipo de dato. Por defecto float64.
+        """
+        dtype = np.dtype(dtype)
+        n = int(np.prod(forma))
+        clave = (nombre, dtype)
+        plano = self._buffers.get(clave)
+        if plano is None or plano.size < n:
+            plano = np.empty(n, dtype=dtype)
+            self._buffers[clave] = plano
+        return plano[:n].reshape(forma)
+
+    def bytes_reservados(self):
+        """
+        Memoria total reservada por los buffers, en bytes.
+        """
+        return sum(plano.nbytes for plano in self._buffers.values())
+
+    def liberar(self):
+        """
+        Descarta todos los buffers.
+        """
+        self._buffers.clear()
+
+    def liberar_excedente(self, limite_bytes=LIMITE_BYTES_RETENIDOS):
+        """
+        Descarta todos los buffers si en conjunto superan limite_bytes.
+
+        Parámetros
+        ----------
+        limite_bytes : int, opcional
+            Memoria máxima a retener. Por defecto LIMITE_BYTES_RETENIDOS.
+        """
+        if self.bytes_reservados() > limite_bytes:
+            self.liberar()
+
+
+def obtener_espacio_trabajo():
+    """
+    Retorna el EspacioTrabajo del hilo actual (lo crea la primera vez).
+    """
+    espacio = getattr(_local, 'espacio', None)
+    if espacio is None:
+        espacio = EspacioTrabajo()
+        _local.espacio = espacio
+    return espacio
@@ -0,0 +1,316 @@
+"""
+Instrumentación de las etapas del análisis: tiempo de reloj, tiempo de CPU,
+pico de memoria (opcional, con tracemalloc), tamaño de los arrays y contadores
+(por ejemplo, las iteraciones de Lundeby), agregados en histogramas que se
+exportan en el formato de texto de Prometheus.
+
+Está deshabilitada por defecto: mientras tanto etapa() devuelve siempre el
+mismo objeto vacío y medida() solo agrega una comparación por llamada.
+
+Uso:
+    from utils import metricas
+    metricas.habilitar()
+    with metricas.etapa('filtrado') as m:
+        ri_bandas = ...
+        m.tamano(ri_bandas)
+    print(metricas.exportar_prometheus())
+"""
+import bisect
+import contextvars
+import functools
+import threading
+import time
+import tracemalloc
+import numpy as np
+
+# Prefijo de todas las métricas exportadas
+PREFIJO = 'tpsys'
+
+# Límites superiores de los buckets de cada tipo de histograma
+BUCKETS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BUCKETS_BYTES = tuple(float(4 ** k * 1024) for k in range(12))   # 1 KiB a 4 GiB
+BUCKETS_CONTEO = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+DESCRIPCIONES = {
+    'etapa_segundos': 'Tiempo de reloj por etapa (s)',
+    'etapa_cpu_segundos': 'Tiempo de CPU del hilo por etapa (s)',
+    'etapa_memoria_pico_bytes': 'Pico de memoria de Python (tracemalloc) por etapa (bytes)',
+    'etapa_bytes': 'Tamaño de los arrays producidos por etapa (bytes)',
+    'lundeby_iteraciones': 'Iteraciones de Lundeby por banda',
+    'lundeby_bandas_total': 'Bandas procesadas por Lundeby, según si la iteración convergió (si, no o sin_rango por SNR bajo)',
+}
+
+
+class _Estado:
+    habilitado = False
+    memoria = False
+
+
+_estado = _Estado()
+_lock = threading.Lock()
+_histogramas = {}   # nombre -> {'buckets': tuple, 'series': {etiquetas: [conteos, suma, cuenta]}}
+_contadores = {}    # nombre -> {etiquetas: valor}
+
+# Tiempos de la petición en curso (ver recolectar)
+_recolector = contextvars.ContextVar('recolector_metricas', default=None)
+
+
+def habilitar(memoria=False):
+    """
+    Habilita la instrumentación.
+
+    Parámetros
+    ----------
+    memoria : bool, opcional
+        Si es True, además mide el pico de memoria de cada etapa con
+        tracemalloc (que hace más lenta toda asignación de memoria mientras
+        está activo). El pico se reinicia al entrar a cada etapa, por lo que
+        con etapas simultáneas en varios hilos es aproximado. Por defecto False.
+    """
+    _estado.memoria = memoria
+    if memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _estado.habilitado = True
+
+
+def deshabilitar():
+    """
+    Deshabilita la instrumentación (los valores acumulados se conservan).
+    """
+    _estado.habilitado = False
+    if _estado.memoria and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _estado.memoria = False
+
+
+def habilitadas():
+    return _estado.habilitado
+
+
+def reiniciar():
+    """
+    Descarta todos los valores acumulados.
+    """
+    with _lock:
+        _histogramas.clear()
+        _contadores.clear()
+
+
+class _EtapaNula:
+    """
+    Etapa que no mide nada (instrumentación deshabilitada).
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def tamano(self, *arrays):
+        pass
+
+
+_ETAPA_NULA = _EtapaNula()
+
+
+class _Etapa:
+    """
+    Mide una etapa: al salir registra el tiempo de reloj, el de CPU del hilo,
+    el pico de memoria (si está habilitado) y el tamaño de los arrays
+    informados con tamano().
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.bytes = 0
+
+    def __enter__(self):
+        if _estado.memoria:
+            self._memoria_inicial = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        self._cpu = time.thread_time()
+        self._inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self._inicio
+        cpu = time.thread_time() - self._cpu
+        observar('etapa_segundos', segundos, BUCKETS_SEGUNDOS, etapa=self.nombre)
+        observar('etapa_cpu_segundos', cpu, BUCKETS_SEGUNDOS, etapa=self.nombre)
+        if _estado.memoria:
+            pico = tracemalloc.get_traced_memory()[1] - self._memoria_inicial
+            observar('etapa_memoria_pico_bytes', max(pico, 0), BUCKETS_BYTES, etapa=self.nombre)
+        if self.bytes:
+            observar('etapa_bytes', self.bytes, BUCKETS_BYTES, etapa=self.nombre)
+
+        tiempos = _recolector.get()
+        if tiempos is not None:
+            tiempos[self.nombre] = tiempos.get(self.nombre, 0.0) + segundos
+        return False
+
+    def tamano(self, *arrays):
+        """
+        Suma el tamaño en bytes de los arrays producidos por la etapa.
+        """
+        self.bytes += sum(np.asarray(a).nbytes for a in arrays)
+
+
+def etapa(nombre):
+    """
+    Context manager que mide una etapa del análisis. Con la instrumentación
+    deshabilitada devuelve un objeto vacío, sin medir nada.
+
+    Parámetros
+    ----------
+    nombre : str
+        Nombre de la etapa (etiqueta 'etapa' de las métricas).
+    """
+    if not _estado.habilitado:
+        return _ETAPA_NULA
+    return _Etapa(nombre)
+
+
+def medida(nombre):
+    """
+    Decorador que mide cada llamada a la función como la etapa nombre.
+    """
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _estado.habilitado:
+                return funcion(*args, **kwargs)
+            with _Etapa(nombre):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+
+def observar(nombre, valores, buckets=BUCKETS_SEGUNDOS, **etiquetas):
+    """
+    Agrega uno o varios valores (escalar o array) al histograma nombre.
+    No hace nada con la instrumentación deshabilitada.
+    """
+    if not _estado.habilitado:
+        return
+    clave = tuple(sorted(etiquetas.items()))
+    if np.ndim(valores) == 0:
+        indices = None
+        valor = float(valores)
+    else:
+        valores = np.asarray(valores, dtype=np.float64).ravel()
+        indices = np.bincount(np.searchsorted(buckets, valores, side='left'), minlength=len(buckets) + 1)
+
+    with _lock:
+        histograma = _histogramas.setdefault(nombre, {'buckets': tuple(buckets), 'series': {}})
+        serie = histograma['series'].get(clave)
+        if serie is None:
+            serie = histograma['series'][clave] = [[0] * (len(buckets) + 1), 0.0, 0]
+        if indices is None:
+            serie[0][bisect.bisect_left(histograma['buckets'], valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+        else:
+            serie[0] = [a + int(b) for a, b in zip(serie[0], indices)]
+            serie[1] += float(valores.sum())
+            serie[2] += len(valores)
+
+
+def contar(nombre, cantidad=1, **etiquetas):
+    """
+    Suma cantidad al contador nombre. No hace nada con la instrumentación
+    deshabilitada.
+    """
+    if not _estado.habilitado:
+        return
+    clave = tuple(sorted(etiquetas.items()))
+    with _lock:
+        serie = _contadores.setdefault(nombre, {})
+        serie[clave] = serie.get(clave, 0) + cantidad
+
+
+class recolectar:
+    """
+    Context manager que junta el tiempo de reloj de las etapas medidas en el
+    contexto actual (hilo o petición), por ejemplo para el encabezado
+    Server-Timing. Las etapas que corren en otros hilos (n_workers) no se
+    incluyen.
+
+    Ejemplo
+    -------
+    >>> with metricas.recolectar() as tiempos:
+    ...     obtener_parametros_de_RI(ri, fs)
+    >>> tiempos
+    {'filtrado': 0.41, 'hilbert': 0.22, ...}
+    """
+
+    def __enter__(self):
+        self.tiempos = {}
+        self._token = _recolector.set(self.tiempos)
+        return self.tiempos
+
+    def __exit__(self, *exc):
+        _recolector.reset(self._token)
+        return False
+
+
+def server_timing(tiempos):
+    """
+    Arma el valor del encabezado HTTP Server-Timing a partir de un
+    diccionario {etapa: segundos} (ver recolectar).
+    """
+    return ', '.join(f'{nombre};dur={segundos * 1e3:.1f}' for nombre, segundos in tiempos.items())
+
+
+def exportar_prometheus(adicionales=None):
+    """
+    Exporta los histogramas y contadores en el formato de texto de Prometheus.
+
+    Parámetros
+    ----------
+    adicionales : dict, opcional
+        Valores a exportar además de los acumulados, como
+        {nombre: (tipo, valor)} con tipo 'counter' o 'gauge' (por ejemplo, los
+        contadores de la caché de resultados).
+
+    Retorna
+    -------
+    str
+    """
+    lineas = []
+    with _lock:
+        for nombre, histograma in sorted(_histogramas.items()):
+            completo = f'{PREFIJO}_{nombre}'
+            lineas.append(f'# HELP {completo} {DESCRIPCIONES.get(nombre, nombre)}')
+            lineas.append(f'# TYPE {completo} histogram')
+            limites = [_numero(b) for b in histograma['buckets']] + ['+Inf']
+            for clave, (conteos, suma, cuenta) in sorted(histograma['series'].items()):
+                acumulado = 0
+                for limite, conteo in zip(limites, conteos):
+                    acumulado += conteo
+                    lineas.append(f'{completo}_bucket{_etiquetas(clave, le=limite)} {acumulado}')
+                lineas.append(f'{completo}_sum{_etiquetas(clave)} {_numero(suma)}')
+                lineas.append(f'{completo}_count{_etiquetas(clave)} {cuenta}')
+        for nombre, series in sorted(_contadores.items()):
+            completo = f'{PREFIJO}_{nombre}'
+            lineas.append(f'# HELP {completo} {DESCRIPCIONES.get(nombre, nombre)}')
+            lineas.append(f'# TYPE {completo} counter')
+            for clave, valor in sorted(series.items()):
+                lineas.append(f'{completo}{_etiquetas(clave)} {_numero(valor)}')
+
+    for nombre, (tipo, valor) in (adicionales or {}).items():
+        completo = f'{PREFIJO}_{nombre}'
+        lineas.append(f'# TYPE {completo} {tipo}')
+        lineas.append(f'{completo} {_numero(valor)}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _etiquetas(clave, **extra):
+    pares = list(clave) + list(extra.items())
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pares) + '}'
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
@@ -1,10 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import numpy as np
 from utils.segunda_entrega.escala_log import escala_log
-from utils.segunda_entrega.filtrar import filtrar_signal
-from utils.tercer_entrega.suavizado import filtro_promedio_movil, hilbert_transform
-from utils.tercer_entrega.schroeder_lundeby import integral_schroeder, lundeby
+from utils.segunda_entrega.filtrar import filtrar_signal, filtrar_espectral
+from utils.tercer_entrega.suavizado import filtro_promedio_movil, envolvente_hilbert
+from utils.tercer_entrega.schroeder_lundeby import integral_schroeder, lundeby_bandas
 from utils.tercer_entrega.param_acusticos import calcular_parametros_acusticos
+from utils.tercer_entrega.recorte import recortar_ri
+from utils.plan_analisis import obtener_plan_analisis
+from utils.espacio_trabajo import obtener_espacio_trabajo
+from utils.resultados import ResultadoAnalisis
+from utils import metricas
 
-def obtener_parametros_de_RI(ri,fs,banda='octava',ventana_suavizado_ms=5,debug_mode = False):
+def obtener_parametros_de_RI(ri,fs,banda='octava',ventana_suavizado_ms=5,debug_mode = False, *, plan=None,
+                             tipo_motor='directo', modo_filtrado='filtfilt', workers=None,
+                             fs_analisis=None, salida='dict', n_workers=None, executor=None,
+                             por_banda=False, bandas_debug=None, dtype=np.float64,
+                             recortar=False, margen_previo_ms=10):
     """
     Procesa una respuesta al impulso multibanda y calcula sus parámetros acústicos.
 
@@ -16,8 +28,11 @@ def obtener_parametros_de_RI(ri,fs,banda='octava',ventana_suavizado_ms=5,debug_m
 
     Parámetros:
     ----------
-    signal : numpy.ndarray
-        Array 1D que contiene la señal de respuesta al impulso.
+    ri : numpy.ndarray
+        Array 1D que contiene la señal de respuesta al impulso, o array
+        (N, canales) con una RI por canal (la forma de soundfile.read). Los
+        canales se analizan todos juntos: cada filtro, FFT y suma acumulada
+        recorre todas las señales de una vez.
     fs : int
         Frecuencia de muestreo de la señal (Hz).
     banda : {'octava', 'tercio_octava'}, opcional
@@ -27,8 +42,69 @@ def obtener_parametros_de_RI(ri,fs,banda='octava',ventana_suavizado_ms=5,debug_m
         Duración de la ventana de promedio móvil para suavizar la envolvente,
         en milisegundos. Por defecto: 5 ms.
     debug_mode : bool, opcional
-        Si es True, habilita la impresión de información de depuración.
-        Por defecto: False.
+        Si es True, además de los parámetros devuelve datos_debug con las RI
+        filtradas, las curvas de decaimiento, los datos de Lundeby y las
+        regresiones de cada banda (ver Retorna). No imprime nada; la
+        convergencia de Lundeby se cuenta, con las métricas habilitadas, en
+        'lundeby_bandas_total' (utils.metricas). Por defecto: False.
+    plan : PlanAnalisis, opcional
+        Esta y todas las opciones siguientes se pasan solo por nombre.
+        Plan precalculado (filtros y ventana de suavizado) para
+        reutilizar entre llamadas. Si es None se obtiene de la caché de
+        obtener_plan_analisis según fs, la longitud de la RI, banda y ventana.
+        Debe haberse construido con los mismos fs, banda y ventana_suavizado_ms
+        (si no, ValueError).
+    tipo_motor : {'directo', 'espectral'}, opcional
+        Motor del banco de filtros: 'directo' (por defecto) filtra cada banda
+        con filtrar_signal y calcula su envolvente con Hilbert; 'espectral'
+        obtiene bandas y envolventes con filtrar_espectral.
+    fs_analisis : None, float o 'auto', opcional
+        Frecuencia a la que se analizan las envolventes suavizadas (Lundeby,
+        Schroeder, escala log, regresiones y D50/C80). El promedio móvil ya es
+        un pasabajos, por lo que las envolventes se pueden diezmar sin aliasing
+        apreciable. None (por defecto) usa fs; 'auto' la ata a la ventana de
+        suavizado (8 muestras por ventana: 1,6 kHz con 5 ms). Ver
+        PlanAnalisis.factor_decimacion.
+    salida : {'dict', 'columnar'}, opcional
+        'dict' (por defecto) devuelve el diccionario por frecuencia descrito
+        abajo. 'columnar' devuelve un ResultadoAnalisis: una tabla (array
+        estructurado banda × parámetro) con metadatos, que se convierte a la
+        forma de diccionario con a_dict() y se exporta con ExportadorResultados.
+    n_workers : int, opcional
+        Cantidad de hilos para procesar las bandas en paralelo: las bandas se
+        reparten en n_workers grupos y cada grupo recorre la cadena completa en
+        su hilo. El resultado (y el orden de las bandas) es el mismo que con un
+        solo hilo. Por defecto None (sin hilos).
+    executor : concurrent.futures.Executor, opcional
+        Pool de hilos ya creado para reutilizar entre llamadas (en lugar de
+        crear uno por llamada con n_workers). Requiere n_workers, que fija en
+        cuántos grupos se reparten las bandas (normalmente, los hilos del pool).
+    por_banda : bool, opcional
+        Si es True, las bandas se procesan de a una: los intermedios de cada
+        banda (filtrada, envolvente, curvas) se liberan apenas se calculan sus
+        parámetros, y la memoria máxima pasa a ser la de una sola banda. Los
+        resultados son los mismos. Por defecto False.
+    bandas_debug : list, opcional
+        Con debug_mode, frecuencias de las que se guardan los datos de
+        depuración (el resto no aparece en datos_debug y no retiene memoria).
+        Por defecto None, todas.
+    dtype : {np.float64, np.float32}, opcional
+        Tipo de dato de la cadena de análisis. Con float32, el filtrado, las
+        envolventes y el suavizado trabajan en simple precisión (mitad de
+        memoria); las sumas acumuladas (promedio móvil, Schroeder, energía) y
+        las regresiones siguen en float64. Ver tests/test_precision_float32.py
+        para la tolerancia. Por defecto float64.
+    recortar : bool, opcional
+        Si es True, antes de filtrar se recortan el retardo inicial (desde el
+        punto de inicio de ISO 3382-1: la primera muestra a -20 dB del pico) y
+        la cola de ruido (ver tercer_entrega.recorte.estimar_fin), de modo que
+        toda la cadena procesa solo la parte útil de la RI. D50, C50, C80 y Ts
+        quedan referidos al sonido directo. Por defecto False.
+    margen_previo_ms : float, opcional
+        Con recortar, milisegundos previos al inicio que se filtran junto con la
+        RI (para que el transitorio de los filtros de fase cero no se pierda) y
+        se descartan después del suavizado. Sin margen, el T30 de las bandas
+        graves se subestima hasta un 6 %. Por defecto 10 ms.
 
     Retorna:
     --------
@@ -41,6 +117,17 @@ def obtener_parametros_de_RI(ri,fs,banda='octava',ventana_suavizado_ms=5,debug_m
           - 'T60_from_T30'   : Tiempo de reverberación estimado de -5 a -35 dB (s)
           - 'C80'            : Claridad C80 en dB
           - 'D50'            : Porcentaje de energía en los primeros 50 ms (valor entre 0 y 1)
+          - 'C50'            : Claridad C50 en dB
+          - 'Ts'             : Tiempo central (s)
+        Con salida='columnar', un ResultadoAnalisis con esos mismos parámetros.
+        Si ri tiene varios canales, un diccionario con:
+          - 'canales' : lista con el resultado de cada canal (de la forma anterior).
+          - 'promedio': el resultado con cada parámetro promediado entre canales.
+        En modo depuración, datos_debug es entonces {'canales': [datos de cada canal]}.
+        Con recortar, los tiempos de los datos de depuración se cuentan desde el
+        inicio detectado; datos_debug['recorte'] tiene 'inicio' y 'fin' (índices
+        en la RI original), y los metadatos de salida='columnar', 'inicio_s' y
+        'fin_s'.
 
     Ejemplo:
     --------
@@ -57,61 +144,288 @@ def obtener_parametros_de_RI(ri,fs,banda='octava',ventana_suavizado_ms=5,debug_m
     >>> print(f"T30 a 1kHz: {result[1000]['T60_from_T30']:.2f} s")
     """
 
-    ventana_suavizado_muestras = int(ventana_suavizado_ms*1e-3 * fs)
-    
-    #1 Filtro de banda
-    ri_octavas = filtrar_signal(ri, fs, tipo_filtro=banda)
+    if salida not in ('dict', 'columnar'):
+        raise ValueError("salida debe ser 'dict' o 'columnar'")
+    if tipo_motor not in ('directo', 'espectral'):
+        raise ValueError("tipo_motor debe ser 'directo' o 'espectral'")
+    if executor is not None and n_workers is None:
+        raise ValueError("Con executor hay que indicar n_workers (la cantidad de grupos de bandas)")
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.float64):
+        raise ValueError("dtype debe ser np.float32 o np.float64")
+    ri = np.asarray(ri, dtype=dtype)
+    if ri.ndim not in (1, 2):
+        raise ValueError("ri debe ser un array 1D o (N, canales)")
+    multicanal = ri.ndim == 2
+    if multicanal:
+        # Una señal por fila, contigua a lo largo del tiempo (el eje de los filtros y las FFT)
+        ri = np.ascontiguousarray(ri.T)
+    recorte = None
+    margen = 0
+    if recortar:
+        with metricas.etapa('recorte'):
+            recorte = recortar_ri(ri, fs, margen_previo=round(margen_previo_ms * 1e-3 * fs))
+        ri = recorte['ri']
+        margen = recorte['margen']
+    if plan is None:
+        plan = obtener_plan_analisis(fs, ri.shape[-1], banda=banda, ventana_suavizado_ms=ventana_suavizado_ms)
+    elif plan.fs != fs or plan.banda != banda or plan.ventana_suavizado_ms != ventana_suavizado_ms:
+        raise ValueError("El plan de análisis no corresponde a la fs, banda o ventana_suavizado_ms indicadas")
+
+    q = plan.factor_decimacion(fs_analisis)
+    if margen % q:
+        # El margen se descarta ya diezmado: tiene que ser múltiplo de q
+        ri = ri[..., margen % q:]
+        margen -= margen % q
+    fs_curvas = fs / q if q > 1 else fs
+    frecuencias = list(plan.frecuencias)
+    if not debug_mode:
+        bandas_debug = set()
+    elif bandas_debug is None:
+        bandas_debug = set(frecuencias)
+    else:
+        bandas_debug = set(bandas_debug)
+        if not bandas_debug <= set(frecuencias):
+            raise ValueError(f"bandas_debug debe ser un subconjunto de las bandas del análisis: {frecuencias}")
+
+    #1-5. Cadena completa por grupos de bandas; con varios hilos, cada grupo en uno
+    #     (los filtros y las FFT liberan el GIL). La banda i va al grupo i % n_grupos
+    #     para repartir parejo las bandas graves y agudas.
+    analizar = partial(_analizar_grupo, ri, fs, plan, tipo_motor=tipo_motor, modo_filtrado=modo_filtrado,
+                       workers=workers, q=q, por_banda=por_banda, bandas_debug=bandas_debug, margen=margen)
+    if executor is not None:
+        partes = _analizar_en_grupos(analizar, frecuencias, executor, n_workers)
+    elif n_workers is not None and n_workers > 1:
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            partes = _analizar_en_grupos(analizar, frecuencias, pool, n_workers)
+    else:
+        partes = [analizar(frecuencias)]
+    parte = _unir_partes(partes, frecuencias)
+
+    param_bandas = parte['param_bandas']
+    idx_lundeby = parte['idx_lundeby']
+    metadatos = {'fs': fs, 'banda': banda, 'fs_analisis': fs_curvas,
+                 'tipo_motor': tipo_motor, 'modo_filtrado': modo_filtrado}
+    if recorte is not None:
+        metadatos.update(inicio_s=recorte['inicio'] / fs, fin_s=recorte['fin'] / fs)
+    armar = partial(_armar_resultado, frecuencias, salida=salida, fs_curvas=fs_curvas, metadatos=metadatos)
+
+    if not multicanal:
+        parametros_acusticos = armar(param_bandas, idx_lundeby)
+    else:
+        # Parámetros (n_bandas, canales): uno por canal y el promedio entre canales
+        n_canales = ri.shape[0]
+        parametros_acusticos = {
+            'canales': [armar({param: valores[:, c] for param, valores in param_bandas.items()},
+                              idx_lundeby[:, c], canal=c)
+                        for c in range(n_canales)],
+            'promedio': armar({param: valores.mean(axis=-1) for param, valores in param_bandas.items()},
+                              idx_lundeby.mean(axis=-1), canal='promedio')}
+
+    if not debug_mode:
+        return parametros_acusticos
+    else:
+         datos_debug = {
+              'ri_filtradas': parte.get('ri_filtradas', {}),
+              'curvas_decay_db': parte.get('curvas_decay_db', {}),
+              'datos_lundeby': parte.get('datos_lundeby', {}),
+              'datos_regresion': parte.get('datos_regresion', {})}
+         if q > 1:
+              datos_debug['fs_analisis'] = fs_curvas
+         if recorte is not None:
+              datos_debug['recorte'] = {'inicio': recorte['inicio'], 'fin': recorte['fin']}
+         if multicanal:
+              # Los datos de cada banda vienen como lista por canal
+              datos_debug = {'canales': [{clave: (valor if clave in ('fs_analisis', 'recorte') else
+                                                  {freq: por_canal[c] for freq, por_canal in valor.items()})
+                                          for clave, valor in datos_debug.items()}
+                                         for c in range(ri.shape[0])]}
+         
+         return (parametros_acusticos,datos_debug)
+
+
+def _armar_resultado(frecuencias, param_bandas, idx_lundeby, salida, fs_curvas, metadatos, canal=None):
+    """
+    Arma el resultado de un canal (o del promedio) a partir de los arrays por
+    banda: el diccionario {frecuencia: {parametro: valor}} o, con
+    salida='columnar', un ResultadoAnalisis.
+    """
+    if salida == 'columnar':
+        if canal is not None:
+            metadatos = {**metadatos, 'canal': canal}
+        return ResultadoAnalisis(frecuencias, param_bandas,
+                                 tiempo_lundeby=idx_lundeby / fs_curvas,
+                                 metadatos=metadatos)
+    parametros_acusticos = {}
+    for i,freq in enumerate(frecuencias):
+        parametros_acusticos[freq] = {param: valores[i] for param, valores in param_bandas.items()}
+    return parametros_acusticos
+
+
+def _analizar_grupo(ri, fs, plan, frecuencias, tipo_motor, modo_filtrado, workers, q, por_banda, bandas_debug,
+                    margen=0):
+    """
+    Analiza un grupo de bandas con _analizar_bandas: de a una si por_banda es
+    True, o en dos tandas (con y sin datos de depuración) si solo algunas
+    bandas del grupo están en bandas_debug.
+    """
+    if por_banda:
+        tandas = [[freq] for freq in frecuencias]
+    else:
+        tandas = [[freq for freq in frecuencias if freq in bandas_debug],
+                  [freq for freq in frecuencias if freq not in bandas_debug]]
+    partes = [_analizar_bandas(ri, fs, plan, tanda, tipo_motor, modo_filtrado, workers, q,
+                               debug_mode=tanda[0] in bandas_debug, margen=margen)
+              for tanda in tandas if tanda]
+    return _unir_partes(partes, frecuencias)
+
 
-    #2. Suavizado envolvente + promedio movil
-    suavizado_octavas = {}
-    for freq,signal in ri_octavas.items():
-        suavizado_octavas[freq] = filtro_promedio_movil(hilbert_transform(signal),L=ventana_suavizado_muestras)
+def _analizar_bandas(ri, fs, plan, frecuencias, tipo_motor, modo_filtrado, workers, q, debug_mode, margen=0):
+    """
+    Cadena completa de obtener_parametros_de_RI (filtro, envolvente, suavizado,
+    Lundeby, Schroeder, escala log y parámetros) para un subconjunto de bandas.
+
+    ri puede ser una señal 1D o una matriz (canales, N): en ese caso, desde el
+    filtro en adelante cada fila es un par (banda, canal), banda por banda.
+    Las primeras margen muestras (múltiplo de q) se filtran y suavizan, pero
+    se descartan antes de Lundeby.
+
+    Retorna un diccionario con 'frecuencias', 'param_bandas' (arrays en el orden
+    de frecuencias, (n_bandas, canales) si hay varios canales), 'idx_lundeby' y,
+    en modo depuración, los datos de depuración por frecuencia ('ri_filtradas',
+    'curvas_decay_db', 'datos_lundeby', 'datos_regresion'; con varios canales,
+    una lista por canal).
+    """
+    fs_curvas = fs / q if q > 1 else fs
+    canales = ri.shape[:-1]
+    N = ri.shape[-1]
+
+    #1 Filtro de banda: matriz (n_bandas, N), una banda por fila, del tipo de ri
+    #  (el motor espectral entrega directamente las envolventes)
+    if tipo_motor == 'espectral':
+        with metricas.etapa('filtrado_espectral') as m:
+            ri_bandas, envolventes, _ = filtrar_espectral(ri, fs, tipo_filtro=plan.banda,
+                                                          orden_filtro=plan.orden_filtro,
+                                                          modo_filtrado=modo_filtrado,
+                                                          workers=workers, frecuencias=frecuencias)
+            m.tamano(ri_bandas, envolventes)
+    else:
+        with metricas.etapa('filtrado') as m:
+            banco = {fc: plan.sos_bandas[fc].astype(ri.dtype, copy=False) for fc in frecuencias}
+            ri_bandas, _ = filtrar_signal(ri, fs, sos_bandas=banco, como_matriz=True,
+                                          modo_filtrado=modo_filtrado)
+            m.tamano(ri_bandas)
+        with metricas.etapa('hilbert') as m:
+            # Relleno de N ceros: la envolvente de la transformada circular se
+            # ensucia al final cuando la RI empieza en el sonido directo
+            envolventes = envolvente_hilbert(ri_bandas, workers=workers, relleno=N)
+            m.tamano(envolventes)
+
+    # Con varios canales: una fila por (banda, canal), sin copiar
+    ri_bandas = ri_bandas.reshape(-1, N)
+    envolventes = envolventes.reshape(-1, N)
+
+    #2. Suavizado envolvente + promedio movil (todas las bandas a la vez),
+    #   diezmado a la frecuencia de análisis
+    with metricas.etapa('suavizado') as m:
+        suavizado_bandas = filtro_promedio_movil(envolventes,L=plan.L,paso=q)
+        m.tamano(suavizado_bandas)
+    if margen:
+        ri_bandas = ri_bandas[:, margen:]
+        suavizado_bandas = suavizado_bandas[:, margen // q:]
     
-    #2.5 Lundeby
-    lundeby_ = {}
-    datos_lundeby = {}
+    #2.5 Lundeby (todas las bandas a la vez)
+    with metricas.etapa('lundeby'):
+        res = lundeby_bandas(suavizado_bandas, fs_curvas, return_debug_data=debug_mode)
+    datos_lundeby = []
     #Analizamos si estamos en modo depuracion
-    for freq,signal in suavizado_octavas.items():
-            res = lundeby(signal, fs, return_debug_data=debug_mode)
-            lundeby_[freq] = res
-            #Analizamos si estamos en modo depuracion
-            if debug_mode:
-                datos_lundeby[freq] = res
-                t_lundaby = res['idx_cruce']
-                lundeby_[freq] = t_lundaby     
+    if debug_mode:
+        for fila in range(len(suavizado_bandas)):
+            datos_lundeby.append({clave: (valor if clave == 'tiempo_rms' else valor[fila])
+                                  for clave, valor in res.items()})
+        res = res['idx_cruce']
+    idx_lundeby = res
 
     #3. Schroeder
-    curva_decay = {}
-    for freq,signal in suavizado_octavas.items():
-        curva_decay[freq] = integral_schroeder(signal,fs,lundeby_[freq])
-
-    #4. Escala log
-    curva_decay_db = {}
-    for freq,signal in curva_decay.items():
-        curva_decay_db[freq] = escala_log(signal['schroeder'])
-   
+    #   Fuera del modo depuración las curvas no sobreviven a esta llamada: se
+    #   calculan sobre los buffers del espacio de trabajo del hilo.
+    if debug_mode:
+        out_schroeder = out_p2 = None
+    else:
+        espacio = obtener_espacio_trabajo()
+        out_schroeder = espacio.buffer('schroeder', suavizado_bandas.shape, np.float64)
+        out_p2 = espacio.buffer('p2', suavizado_bandas.shape, suavizado_bandas.dtype)
+    with metricas.etapa('schroeder') as m:
+        curva_decay = integral_schroeder(suavizado_bandas,fs_curvas,idx_lundeby,
+                                         out=out_schroeder, out_p2=out_p2, con_energia=True)
+        m.tamano(curva_decay['schroeder'], curva_decay['p2'])
+
+    #4. Escala log (sobre la misma curva de Schroeder, que no se vuelve a usar)
+    with metricas.etapa('escala_log'):
+        curva_decay_db = escala_log(curva_decay['schroeder'], out=out_schroeder, por_fila=True)
     
     #5. Calcular parámetros acústicos
-    parametros_acusticos = {}
-    datos_regresion = {}
-    for freq, signal in curva_decay_db.items():
-        resultado = calcular_parametros_acusticos(signal,
-                                                            p2=curva_decay[freq]['p2'],
-                                                            fs=fs,
-                                                            return_regs=debug_mode)
-        if debug_mode:
-             param_dict, debug_dict = resultado
-             datos_regresion[freq] = debug_dict
-             parametros_acusticos[freq] = param_dict 
-        else:
-            parametros_acusticos[freq] = resultado
-    if not debug_mode:
-        return parametros_acusticos
+    with metricas.etapa('parametros'):
+        resultado = calcular_parametros_acusticos(curva_decay_db,
+                                                  p2=curva_decay['p2'],
+                                                  fs=fs_curvas,
+                                                  return_regs=debug_mode,
+                                                  energia=curva_decay['energia'])
+    if debug_mode:
+        resultado, regs_bandas = resultado
     else:
-         datos_debug = {
-              'ri_filtradas': ri_octavas,
-              'curvas_decay_db': curva_decay_db,
-              'datos_lundeby': datos_lundeby,
-              'datos_regresion': datos_regresion }
-         
-         return (parametros_acusticos,datos_debug)
\ No newline at end of file
+        espacio.liberar_excedente()
+    forma = (len(frecuencias),) + canales
+    parte = {'frecuencias': frecuencias,
+             'idx_lundeby': idx_lundeby.reshape(forma),
+             'param_bandas': {param: valores.reshape(forma) for param, valores in resultado.items()}}
+    if not debug_mode:
+        return parte
+
+    # Vistas por fila de las matrices, con la forma de siempre, agrupadas por
+    # banda (una lista por canal si hay varios)
+    n_filas = len(curva_decay_db)
+    L_curva = np.clip(idx_lundeby, 1, curva_decay_db.shape[-1])
+    datos_por_fila = {
+        'ri_filtradas': list(ri_bandas),
+        'curvas_decay_db': [curva_decay_db[f, :L_curva[f]] for f in range(n_filas)],
+        'datos_lundeby': datos_lundeby,
+        'datos_regresion': [{reg: {k: v[f] for k, v in datos.items()} for reg, datos in regs_bandas.items()}
+                            for f in range(n_filas)]}
+    n_canales = int(np.prod(canales))
+    for clave, por_fila in datos_por_fila.items():
+        parte[clave] = {freq: (por_fila[i] if not canales else por_fila[i * n_canales:(i + 1) * n_canales])
+                        for i, freq in enumerate(frecuencias)}
+    return parte
+
+
+def _analizar_en_grupos(analizar, frecuencias, executor, n_grupos):
+    """
+    Reparte las bandas en n_grupos grupos intercalados y los analiza en el
+    executor. Retorna las partes en el orden de los grupos.
+    """
+    n_grupos = max(1, min(n_grupos, len(frecuencias)))
+    return list(executor.map(analizar, [frecuencias[k::n_grupos] for k in range(n_grupos)]))
+
+
+def _unir_partes(partes, frecuencias):
+    """
+    Une los resultados de _analizar_bandas de varios grupos de bandas en uno
+    solo, con las bandas en el orden de frecuencias.
+    """
+    if len(partes) == 1:
+        return partes[0]
+
+    orden = np.argsort(np.concatenate([[frecuencias.index(f) for f in p['frecuencias']] for p in partes]))
+    unido = {'frecuencias': frecuencias,
+             'idx_lundeby': np.concatenate([p['idx_lundeby'] for p in partes])[orden],
+             'param_bandas': {param: np.concatenate([p['param_bandas'][param] for p in partes])[orden]
+                              for param in partes[0]['param_bandas']}}
+    # Los datos de depuración solo están en las partes que los pidieron
+    for clave in ('ri_filtradas', 'curvas_decay_db', 'datos_lundeby', 'datos_regresion'):
+        por_frecuencia = {}
+        for p in partes:
+            por_frecuencia.update(p.get(clave, {}))
+        if por_frecuencia:
+            unido[clave] = {freq: por_frecuencia[freq] for freq in frecuencias if freq in por_frecuencia}
+    return unido
@@ -0,0 +1,146 @@
+from functools import lru_cache
+import numpy as np
+from utils.segunda_entrega.filtrar import disenar_banco_filtros
+
+# Cantidad máxima de planes distintos que se mantienen en memoria
+TAMANO_CACHE_PLANES = 32
+
+# Longitud mínima de las "cubetas" de longitud (en muestras)
+LONGITUD_MINIMA_CUBETA = 1 << 10
+
+# Con fs_analisis='auto' se toman al menos estas muestras por ventana de suavizado
+MUESTRAS_POR_VENTANA_AUTO = 8
+
+
+class PlanAnalisis:
+    """
+    Conjunto de datos precalculados que dependen solamente de la configuración
+    del análisis y no de la respuesta al impulso en sí.
+
+    Un plan se construye una sola vez para cada combinación de frecuencia de
+    muestreo, cubeta de longitud, tipo de banda, orden de filtro y ventana de
+    suavizado, y luego se reutiliza para todas las RI que comparten esa
+    configuración, de forma que el trabajo por RI sea únicamente el cálculo
+    numérico.
+
+    Atributos
+    ---------
+    fs : int
+        Frecuencia de muestreo en Hz.
+    n_max : int
+        Longitud máxima (en muestras) de las RI que cubre el plan.
+    banda : {'octava', 'tercio_octava'}
+        Tipo de banda del banco de filtros.
+    orden_filtro : int
+        Orden de los filtros Butterworth.
+    ventana_suavizado_ms : float
+        Duración de la ventana del promedio móvil en milisegundos.
+    sos_bandas : dict
+        Secciones de segundo orden de cada banda, indexadas por frecuencia central.
+    frecuencias : list
+        Frecuencias centrales de las bandas, en el orden del banco de filtros.
+    L : int
+        Longitud en muestras de la ventana de promedio móvil.
+    """
+
+    def __init__(self, fs, n_max, banda='octava', orden_filtro=4, ventana_suavizado_ms=5):
+        self.fs = fs
+        self.n_max = n_max
+        self.banda = banda
+        self.orden_filtro = orden_filtro
+        self.ventana_suavizado_ms = ventana_suavizado_ms
+
+        # 1) Banco de filtros
+        self.sos_bandas = disenar_banco_filtros(fs, tipo_filtro=banda, orden_filtro=orden_filtro)
+        self.frecuencias = list(self.sos_bandas.keys())
+
+        # 2) Ventana del promedio móvil
+        self.L = int(ventana_suavizado_ms*1e-3 * fs)
+        if self.L < 1:
+            raise ValueError("La ventana de suavizado debe abarcar al menos una muestra")
+
+    def factor_decimacion(self, fs_analisis):
+        """
+        Factor entero q con el que se diezman las envolventes suavizadas para
+        analizar las curvas de decaimiento a fs/q.
+
+        Parámetros
+        ----------
+        fs_analisis : None, float o 'auto'
+            None analiza a la fs original (q = 1). Un valor en Hz pide una
+            frecuencia de análisis aproximada. 'auto' la ata a la ventana de
+            suavizado, con MUESTRAS_POR_VENTANA_AUTO muestras por ventana.
+
+        Retorna
+        -------
+        int
+            Factor de decimación. Cuando fs es múltiplo de 100 se elige un divisor
+            de fs/100, para que los límites de 10 ms (bloques de Lundeby de 20 ms,
+            50 ms de D50, 80 ms de C80) caigan justo sobre una muestra.
+        """
+        if fs_analisis is None:
+            return 1
+        if fs_analisis == 'auto':
+            objetivo = self.L // MUESTRAS_POR_VENTANA_AUTO
+        elif isinstance(fs_analisis, str) or fs_analisis <= 0:
+            raise ValueError("fs_analisis debe ser None, 'auto' o una frecuencia positiva en Hz")
+        else:
+            objetivo = int(self.fs // fs_analisis)
+        objetivo = max(1, objetivo)
+
+        muestras_10ms = int(self.fs) // 100
+        if int(self.fs) % 100 != 0:
+            return objetivo
+        return max(d for d in range(1, objetivo + 1) if muestras_10ms % d == 0)
+
+    def __repr__(self):
+        return (f"PlanAnalisis(fs={self.fs}, n_max={self.n_max}, banda='{self.banda}', "
+                f"orden_filtro={self.orden_filtro}, ventana_suavizado_ms={self.ventana_suavizado_ms})")
+
+
+def cubeta_longitud(n_muestras):
+    """
+    Redondea una longitud a la potencia de 2 inmediatamente superior, para que
+    RI de longitudes parecidas compartan el mismo plan.
+    """
+    n = max(int(n_muestras), LONGITUD_MINIMA_CUBETA)
+    return 1 << int(np.ceil(np.log2(n)))
+
+
+@lru_cache(maxsize=TAMANO_CACHE_PLANES)
+def _crear_plan(fs, n_max, banda, orden_filtro, ventana_suavizado_ms):
+    return PlanAnalisis(fs, n_max, banda, orden_filtro, ventana_suavizado_ms)
+
+
+def obtener_plan_analisis(fs, n_muestras, banda='octava', orden_filtro=4, ventana_suavizado_ms=5):
+    """
+    Obtiene (o construye) el plan de análisis para una configuración dada.
+
+    Los planes se guardan en una caché LRU acotada a TAMANO_CACHE_PLANES
+    entradas, indexada por (fs, cubeta de longitud, banda, orden_filtro,
+    ventana_suavizado_ms).
+
+    Parámetros
+    ----------
+    fs : int
+        Frecuencia de muestreo en Hz.
+    n_muestras : int
+        Longitud de la RI a analizar.
+    banda : {'octava', 'tercio_octava'}, opcional
+        Tipo de banda. Por defecto 'octava'.
+    orden_filtro : int, opcional
+        Orden de los filtros Butterworth. Por defecto 4.
+    ventana_suavizado_ms : float, opcional
+        Ventana del promedio móvil en ms. Por defecto 5 ms.
+
+    Retorna
+    -------
+    PlanAnalisis
+        Plan reutilizable entre llamadas a obtener_parametros_de_RI.
+
+    Ejemplo
+    -------
+    >>> plan = obtener_plan_analisis(48000, len(ri), banda='tercio_octava')
+    >>> resultado = obtener_parametros_de_RI(ri, 48000, banda='tercio_octava', plan=plan)
+    """
+    return _crear_plan(fs, cubeta_longitud(n_muestras), banda, orden_filtro, ventana_suavizado_ms)
@@ -0,0 +1,245 @@
+import csv
+import io
+import json
+import os
+import zipfile
+import numpy as np
+
+# Formatos que entiende ExportadorResultados (se deducen de la extensión)
+FORMATOS_EXPORTACION = ('csv', 'jsonl', 'npz')
+
+
+class ResultadoAnalisis:
+    """
+    Resultado de obtener_parametros_de_RI en forma de tabla: una fila por banda
+    y una columna por parámetro, en un único array estructurado de NumPy.
+
+    Atributos
+    ---------
+    tabla : np.ndarray
+        Array estructurado (n_bandas,) con los campos 'frecuencia', uno por
+        parámetro (en el orden de calcular_parametros_acusticos) y
+        'tiempo_lundeby' (cruce de Lundeby en segundos). Todos float64.
+    frecuencias : list
+        Frecuencias centrales, tal como aparecen como claves en a_dict().
+    parametros : tuple
+        Nombres de los parámetros acústicos (columnas de la tabla).
+    metadatos : dict
+        Datos de la corrida: 'fs', 'banda', 'fs_analisis', 'tipo_motor',
+        'modo_filtrado'.
+    """
+
+    def __init__(self, frecuencias, param_bandas, tiempo_lundeby, metadatos):
+        self.frecuencias = list(frecuencias)
+        self.parametros = tuple(param_bandas.keys())
+        self.metadatos = dict(metadatos)
+
+        columnas = ('frecuencia',) + self.parametros + ('tiempo_lundeby',)
+        self.tabla = np.empty(len(self.frecuencias), dtype=[(c, np.float64) for c in columnas])
+        self.tabla['frecuencia'] = self.frecuencias
+        for param, valores in param_bandas.items():
+            self.tabla[param] = valores
+        self.tabla['tiempo_lundeby'] = tiempo_lundeby
+
+    def __len__(self):
+        return len(self.tabla)
+
+    def columna(self, nombre):
+        """
+        Retorna una columna de la tabla (una vista, sin copiar).
+        """
+        return self.tabla[nombre]
+
+    def columnas(self):
+        """
+        Retorna la tabla como diccionario {columna: array}, con vistas de la tabla.
+        """
+        return {nombre: self.tabla[nombre] for nombre in self.tabla.dtype.names}
+
+    def matriz(self):
+        """
+        Retorna los parámetros como matriz (n_bandas, n_parametros) float64.
+        """
+        return np.stack([self.tabla[p] for p in self.parametros], axis=-1)
+
+    def a_dict(self):
+        """
+        Convierte el resultado a la forma de siempre de obtener_parametros_de_RI:
+        {frecuencia: {parametro: valor}}.
+        """
+        columnas = [(p, self.tabla[p]) for p in self.parametros]
+        return {freq: {p: valores[i] for p, valores in columnas}
+                for i, freq in enumerate(self.frecuencias)}
+
+    def __repr__(self):
+        return (f"ResultadoAnalisis(fs={self.metadatos.get('fs')}, banda='{self.metadatos.get('banda')}', "
+                f"bandas={len(self)}, parametros={list(self.parametros)})")
+
+
+class ExportadorResultados:
+    """
+    Escribe muchos ResultadoAnalisis a un archivo a medida que se producen, sin
+    armar un diccionario de Python por valor.
+
+    - 'csv': una fila por banda, con columnas id, fs, banda, fs_analisis y las
+      de la tabla. Se escribe con np.savetxt, una llamada por resultado.
+    - 'jsonl': una línea por resultado, con las columnas como listas. Los
+      valores no finitos se escriben como null.
+    - 'npz': un array estructurado por resultado, guardado como '<id>.npy'
+      dentro del zip (se lee con np.load). Los metadatos van en
+      '<id>.metadatos.json'.
+
+    Todos los resultados de un mismo archivo deben tener las mismas columnas.
+    Con continuar=True ('csv' y 'jsonl'), los resultados se agregan al final de
+    un archivo existente (ver ids_exportados para saber cuáles ya están).
+
+    Ejemplo
+    -------
+    >>> with ExportadorResultados('encuesta.csv') as exportador:
+    ...     for nombre, ri in respuestas.items():
+    ...         exportador.escribir(obtener_parametros_de_RI(ri, fs, salida='columnar'), nombre)
+    """
+
+    def __init__(self, ruta, formato=None, continuar=False):
+        formato = _formato_de(ruta, formato)
+        self.ruta = ruta
+        self.formato = formato
+        self.cantidad = 0
+        self._columnas = None
+        if formato == 'npz':
+            if continuar:
+                raise ValueError("continuar solo está disponible para 'csv' y 'jsonl'")
+            self._archivo = zipfile.ZipFile(ruta, mode='w', compression=zipfile.ZIP_STORED, allowZip64=True)
+            return
+
+        if continuar and os.path.exists(ruta) and os.path.getsize(ruta) > 0:
+            _descartar_linea_incompleta(ruta)
+            if formato == 'csv':
+                with open(ruta, newline='', encoding='utf-8') as archivo:
+                    encabezado = next(csv.reader(archivo), None)
+                if encabezado:
+                    self._columnas = tuple(encabezado[4:])
+            self._archivo = open(ruta, 'a', newline='', encoding='utf-8')
+        else:
+            self._archivo = open(ruta, 'w', newline='', encoding='utf-8')
+
+    def escribir(self, resultado, id_resultado=None):
+        """
+        Agrega un resultado al archivo.
+
+        Parámetros
+        ----------
+        resultado : ResultadoAnalisis
+            Resultado a exportar.
+        id_resultado : str, opcional
+            Identificador del resultado (por ejemplo, el nombre del archivo de
+            audio). Por defecto, el número de orden.
+        """
+        if id_resultado is None:
+            id_resultado = str(self.cantidad)
+        columnas = resultado.tabla.dtype.names
+        if self._columnas is None:
+            self._columnas = columnas
+            if self.formato == 'csv':
+                self._archivo.write(','.join(('id', 'fs', 'banda', 'fs_analisis') + columnas) + '\n')
+        elif columnas != self._columnas:
+            raise ValueError("Todos los resultados exportados deben tener las mismas columnas")
+
+        getattr(self, f'_escribir_{self.formato}')(resultado, str(id_resultado))
+        if self.formato != 'npz':
+            # Cada resultado queda completo en disco (para poder continuar)
+            self._archivo.flush()
+        self.cantidad += 1
+
+    def _escribir_csv(self, resultado, id_resultado):
+        metadatos = resultado.metadatos
+        prefijo = io.StringIO()
+        csv.writer(prefijo, lineterminator='').writerow(
+            [id_resultado, metadatos.get('fs'), metadatos.get('banda'), metadatos.get('fs_analisis')])
+        prefijo = prefijo.getvalue() + ','
+
+        # Los números se formatean en bloque; solo se recorre una vez por fila
+        valores = resultado.tabla.view(np.float64).reshape(len(resultado), -1)
+        bloque = io.StringIO()
+        np.savetxt(bloque, valores, fmt='%.10g', delimiter=',')
+        self._archivo.write(''.join(prefijo + fila for fila in bloque.getvalue().splitlines(keepends=True)))
+
+    def _escribir_jsonl(self, resultado, id_resultado):
+        linea = {'id': id_resultado, **resultado.metadatos}
+        for nombre in self._columnas:
+            columna = resultado.tabla[nombre]
+            if np.all(np.isfinite(columna)):
+                linea[nombre] = columna.tolist()
+            else:
+                linea[nombre] = [v if np.isfinite(v) else None for v in columna.tolist()]
+        self._archivo.write(json.dumps(linea, default=_a_json) + '\n')
+
+    def _escribir_npz(self, resultado, id_resultado):
+        with self._archivo.open(f'{id_resultado}.npy', mode='w', force_zip64=True) as destino:
+            np.lib.format.write_array(destino, resultado.tabla, allow_pickle=False)
+        self._archivo.writestr(f'{id_resultado}.metadatos.json',
+                               json.dumps(resultado.metadatos, default=_a_json))
+
+    def cerrar(self):
+        self._archivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+def ids_exportados(ruta, formato=None):
+    """
+    Retorna el conjunto de ids que ya están en un archivo de ExportadorResultados
+    ('csv' o 'jsonl'). Si el archivo no existe, el conjunto está vacío. Las
+    líneas incompletas (por ejemplo, de una corrida interrumpida) se ignoran.
+    """
+    formato = _formato_de(ruta, formato)
+    if not os.path.exists(ruta):
+        return set()
+
+    ids = set()
+    with open(ruta, newline='', encoding='utf-8') as archivo:
+        if formato == 'csv':
+            filas = csv.reader(archivo)
+            next(filas, None)
+            ids.update(fila[0] for fila in filas if fila)
+        elif formato == 'jsonl':
+            for linea in archivo:
+                try:
+                    ids.add(str(json.loads(linea)['id']))
+                except (ValueError, KeyError):
+                    continue
+        else:
+            raise ValueError("ids_exportados solo lee archivos 'csv' y 'jsonl'")
+    return ids
+
+
+def _formato_de(ruta, formato):
+    if formato is None:
+        formato = os.path.splitext(ruta)[1].lstrip('.').lower()
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación no soportado: '{formato}'. "
+                         f"Opciones: {', '.join(FORMATOS_EXPORTACION)}")
+    return formato
+
+
+def _descartar_linea_incompleta(ruta):
+    """
+    Recorta el archivo hasta el último salto de línea.
+    """
+    with open(ruta, 'rb+') as archivo:
+        contenido = archivo.read()
+        if contenido and not contenido.endswith(b'\n'):
+            archivo.truncate(contenido.rfind(b'\n') + 1)
+
+
+def _a_json(valor):
+    """
+    Convierte escalares de NumPy a tipos nativos para json.dumps.
+    """
+    if isinstance(valor, np.generic):
+        return valor.item()
+    raise TypeError(f"Objeto no serializable: {type(valor).__name__}")
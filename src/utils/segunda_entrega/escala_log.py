@@ -1,24 +1,37 @@
 import numpy as np  
     
-def escala_log(signal):
+def escala_log(signal, out=None, por_fila=False):
     """
     Convierte un array a escala logarítmica normalizada.
 
     Parámetros:
-    signal (numpy array): por ejemplo, señal de respuesta al impulso
+    signal (numpy array): por ejemplo, señal de respuesta al impulso. Puede ser
+        una matriz (n_bandas, N).
+
+    out (numpy array, opcional): array de la forma de signal donde escribir el
+        resultado, sin reservar memoria nueva. Puede ser el propio signal.
+
+    por_fila (bool, opcional): si es True, cada fila (a lo largo del último
+        eje) se normaliza por su propio máximo, como si se convirtiera sola. Por
+        defecto False: todo el array se normaliza por el máximo global.
 
     Retorna:
     - signal_db (numpy array): señal convertida a escala logarítmica
     """
-    a_max = np.max(np.abs(signal))
+    # max(|x|) sin calcular |x|: el mayor entre el máximo y el -mínimo
+    eje = -1 if por_fila else None
+    a_max = np.maximum(np.max(signal, axis=eje, keepdims=True),
+                       -np.min(signal, axis=eje, keepdims=True))
 
     # Normalizar la señal
-    signal_norm = np.abs(signal) / a_max
+    signal_db = np.abs(signal, out=out)
+    signal_db /= a_max
 
     # Evitar log(0): forzar un mínimo valor positivo
-    signal_norm_clipped = np.clip(signal_norm, 1e-10, None)
+    np.clip(signal_db, 1e-10, None, out=signal_db)
 
     # Calcular en escala logarítmica
-    signal_db = 10 * np.log10(signal_norm_clipped)
+    np.log10(signal_db, out=signal_db)
+    signal_db *= 10
 
     return signal_db
\ No newline at end of file
@@ -1,4 +1,5 @@
 from scipy import signal
+from scipy import fft as sp_fft
 import numpy as np
 from ..constantes.filtros import (
     FRECUENCIAS_OCTAVA,
@@ -7,8 +8,85 @@ from ..constantes.filtros import (
     FACTOR_ANCHO_TERCIO_OCTAVA
 )
 
+# Motor espectral: ceros agregados tras la RI, en múltiplos de 1/(ancho de banda de la
+# banda más angosta), para que la convolución circular no se pliegue sobre la señal.
+RELLENO_ESPECTRAL_ANCHOS = 12
 
-def filtrar_signal(audiodata, fs, tipo_filtro='octava', orden_filtro=4):
+
+def _bandas(tipo_filtro):
+    """
+    Retorna el factor de ancho G y las frecuencias centrales del tipo de banda.
+    """
+    if tipo_filtro == 'octava':
+        return FACTOR_ANCHO_OCTAVA, FRECUENCIAS_OCTAVA
+    elif tipo_filtro == 'tercio_octava':
+        return FACTOR_ANCHO_TERCIO_OCTAVA, FRECUENCIAS_TERCIO_OCTAVA
+    else:
+        raise ValueError("El tipo_filtro debe ser 'octava' o 'tercio_octava'")
+
+
+def _validar_modo_filtrado(modo_filtrado):
+    if modo_filtrado not in ('filtfilt', 'reversed', 'causal'):
+        raise ValueError("El modo_filtrado debe ser 'filtfilt', 'reversed' o 'causal'")
+
+
+def _aplicar_filtro(sos, x, modo_filtrado):
+    """
+    Aplica un filtro SOS según el modo:
+        - 'filtfilt': ida y vuelta (fase cero, atenuación al cuadrado).
+        - 'reversed': una sola pasada causal sobre la señal invertida en el tiempo,
+          de forma que el transitorio del filtro queda antes del inicio y no
+          contamina el decaimiento.
+        - 'causal'  : una sola pasada causal.
+    """
+    if modo_filtrado == 'filtfilt':
+        return signal.sosfiltfilt(sos, x)
+    elif modo_filtrado == 'reversed':
+        return signal.sosfilt(sos, x[..., ::-1])[..., ::-1]
+    return signal.sosfilt(sos, x)
+
+
+def _disenar_pasabanda(centerFrequency_Hz, factor, fs, orden_filtro):
+    lowerCutoffFrequency_Hz = centerFrequency_Hz / factor
+    upperCutoffFrequency_Hz = centerFrequency_Hz * factor
+
+    return signal.iirfilter(orden_filtro,
+                            [lowerCutoffFrequency_Hz, upperCutoffFrequency_Hz],
+                            rs=60,
+                            btype='band',
+                            analog=False,
+                            ftype='butter', 
+                            fs=fs,
+                            output='sos')
+
+
+def disenar_banco_filtros(fs, tipo_filtro='octava', orden_filtro=4):
+    """
+    Diseña el banco de filtros Butterworth (en forma SOS) de octava o tercio de octava.
+
+    Args:
+        fs (int): Frecuencia de muestreo en Hz.
+        tipo_filtro (str, optional): 'octava' o 'tercio_octava'. Por defecto 'octava'.
+        orden_filtro (int, optional): Orden del filtro IIR Butterworth. Por defecto 4.
+
+    Returns:
+        dict: Claves: frecuencias centrales de las bandas (Hz).
+              Valores: arrays SOS de cada filtro paso banda.
+
+    Raises:
+        ValueError: Si el tipo_filtro no es 'octava' ni 'tercio_octava'.
+    """
+    G, frecuencias_centrales = _bandas(tipo_filtro)
+    factor = np.power(2, G)
+
+    sos_bandas = {}
+    for centerFrequency_Hz in frecuencias_centrales:
+        sos_bandas[centerFrequency_Hz] = _disenar_pasabanda(centerFrequency_Hz, factor, fs, orden_filtro)
+    return sos_bandas
+
+
+def filtrar_signal(audiodata, fs, tipo_filtro='octava', orden_filtro=4, sos_bandas=None,
+                   como_matriz=False, modo_filtrado='filtfilt'):
     """
     Filtra una señal de audio en bandas de octava o tercio de octava según la norma IEC 61260.
     
@@ -17,7 +95,9 @@ def filtrar_signal(audiodata, fs, tipo_filtro='octava', orden_filtro=4):
     Utiliza filtros Butterworth implementados como cascada de secciones de segundo orden (SOS).
 
     Args:
-        audiodata (np.array): La señal de audio a filtrar. Debe ser un array 1D de numpy.
+        audiodata (np.array): La señal de audio a filtrar: un array 1D, o un array
+            (..., N) con varias señales (por ejemplo, una por canal) que se filtran
+            todas a la vez a lo largo del último eje.
         fs (int): Frecuencia de muestreo de la señal de audio en Hz (ej: 44100, 48000).
         tipo_filtro (str, optional): Tipo de filtro a aplicar. Debe ser:
             - 'octava': Para filtros de octava (ancho de banda de 1 octava)
@@ -26,14 +106,29 @@ def filtrar_signal(audiodata, fs, tipo_filtro='octava', orden_filtro=4):
         orden_filtro (int, optional): Orden del filtro IIR Butterworth. Un valor más alto
             proporciona una pendiente más pronunciada pero puede introducir más retardo.
             Por defecto es 4.
+        sos_bandas (dict, optional): Banco de filtros ya diseñado (ver disenar_banco_filtros),
+            por ejemplo el de un PlanAnalisis. Si se indica, se omite el diseño de los filtros
+            y se ignoran tipo_filtro y orden_filtro. Por defecto None.
+        como_matriz (bool, optional): Si es True, en lugar del diccionario se devuelve
+            una matriz contigua (n_bandas, N) con una banda por fila (o
+            (n_bandas, ..., N) si audiodata tiene varias señales), junto con el
+            array de frecuencias centrales de cada fila. Por defecto False.
+        modo_filtrado (str, optional): Forma de aplicar cada filtro de banda:
+            - 'filtfilt': sosfiltfilt, ida y vuelta con fase cero.
+            - 'reversed': una pasada causal sobre la señal invertida en el tiempo
+              (mitad de costo; el transitorio del filtro queda fuera del decaimiento).
+            - 'causal': una pasada causal (mitad de costo).
+            Por defecto es 'filtfilt'.
 
     Returns:
         dict: Un diccionario donde:
             - Claves: Frecuencias centrales de las bandas en Hz (float)
             - Valores: Arrays de numpy con las señales de audio filtradas para cada banda
+        Con como_matriz=True retorna una tupla (matriz, frecuencias).
 
     Raises:
-        ValueError: Si el tipo_filtro no es 'octava' ni 'tercio_octava'.
+        ValueError: Si el tipo_filtro no es 'octava' ni 'tercio_octava', o si el
+            modo_filtrado no es válido.
 
     Example:
         >>> # Filtrado de señal de audio con filtros de octava
@@ -41,34 +136,173 @@ def filtrar_signal(audiodata, fs, tipo_filtro='octava', orden_filtro=4):
         >>> # Acceder a la señal filtrada para 1000 Hz
         >>> señal_1k = señales_filtradas[1000.0]
     """
-    if tipo_filtro == 'octava':
-        G = FACTOR_ANCHO_OCTAVA
-        frecuencias_centrales = FRECUENCIAS_OCTAVA
-    elif tipo_filtro == 'tercio_octava':
-        G = FACTOR_ANCHO_TERCIO_OCTAVA
-        frecuencias_centrales = FRECUENCIAS_TERCIO_OCTAVA
-    else:
-        raise ValueError("El tipo_filtro debe ser 'octava' o 'tercio_octava'")
-
-    factor = np.power(2, G)
-    señales_filtradas = {}
+    _validar_modo_filtrado(modo_filtrado)
+    if sos_bandas is None:
+        sos_bandas = disenar_banco_filtros(fs, tipo_filtro, orden_filtro)
 
+    if como_matriz:
+        # Cada banda se escribe directamente en su fila de la matriz (float32 solo
+        # si la señal y los filtros lo son)
+        tipo = np.result_type(audiodata, *sos_bandas.values(), np.float32)
+        matriz = np.empty((len(sos_bandas),) + np.shape(audiodata), dtype=tipo)
+        for i, sos in enumerate(sos_bandas.values()):
+            matriz[i] = _aplicar_filtro(sos, audiodata, modo_filtrado)
+        return matriz, np.array(list(sos_bandas.keys()))
 
-    for centerFrequency_Hz in frecuencias_centrales:
-        lowerCutoffFrequency_Hz = centerFrequency_Hz / factor
-        upperCutoffFrequency_Hz = centerFrequency_Hz * factor
-
-        sos = signal.iirfilter(orden_filtro,
-                               [lowerCutoffFrequency_Hz, upperCutoffFrequency_Hz],
-                               rs=60,
-                               btype='band',
-                               analog=False,
-                               ftype='butter', 
-                               fs=fs,
-                               output='sos')
+    señales_filtradas = {}
 
+    for centerFrequency_Hz, sos in sos_bandas.items():
         # Aplicando el filtro al audio
-        filt_signal = signal.sosfiltfilt(sos, audiodata)
+        filt_signal = _aplicar_filtro(sos, audiodata, modo_filtrado)
         señales_filtradas[centerFrequency_Hz] = filt_signal
         
-    return señales_filtradas
\ No newline at end of file
+    return señales_filtradas
+
+
+def _respuesta_espectral(Omega, centerFrequency_Hz, factor, fs, orden_filtro, modo_filtrado='filtfilt'):
+    """
+    Respuesta en frecuencia del pasabanda Butterworth de _disenar_pasabanda, para
+    cada modo de filtrado:
+        - 'filtfilt': |H|², la respuesta de fase cero de sosfiltfilt.
+        - 'causal'  : H, la de sosfilt.
+        - 'reversed': conj(H), la de filtrar la señal invertida en el tiempo.
+
+    Omega es tan(π·f/fs): por la transformación bilineal, el filtro digital vale
+    exactamente lo mismo que el prototipo analógico en la frecuencia pre-distorsionada,
+    y el pasabanda es el pasabajos de Butterworth evaluado en j·q con
+    q = (Ω² - Ω_inf·Ω_sup) / (Ω·(Ω_sup - Ω_inf)).
+    """
+    Omega_inf = np.tan(np.pi * centerFrequency_Hz / factor / fs)
+    Omega_sup = np.tan(np.pi * centerFrequency_Hz * factor / fs)
+    with np.errstate(divide='ignore', over='ignore', invalid='ignore'):
+        q = (Omega**2 - Omega_inf * Omega_sup) / (Omega * (Omega_sup - Omega_inf))
+
+        if modo_filtrado == 'filtfilt':
+            return 1.0 / (1.0 + q**(2 * orden_filtro))
+
+        # Polos del pasabajos de Butterworth normalizado (los mismos que signal.buttap)
+        m = np.arange(-orden_filtro + 1, orden_filtro, 2)
+        polos = -np.exp(1j * np.pi * m / (2 * orden_filtro))
+        jq = 1j * np.where(np.isfinite(q), q, 0.0)
+        H = np.ones_like(jq)
+        for polo in polos:
+            H /= (jq - polo)
+    H[~np.isfinite(q)] = 0.0
+
+    if modo_filtrado == 'reversed':
+        np.conjugate(H, out=H)
+    return H
+
+
+def _extension_impar(x, n):
+    """
+    Extiende x (a lo largo del último eje) con n muestras en cada extremo,
+    reflejadas con simetría impar respecto de la primera y la última muestra:
+    la misma extensión que aplica sosfiltfilt antes de filtrar.
+    """
+    inicio = 2 * x[..., :1] - x[..., n:0:-1]
+    fin = 2 * x[..., -1:] - x[..., -2:-(n + 2):-1]
+    return np.concatenate((inicio, x, fin), axis=-1)
+
+
+def _escalon_filtfilt(n_fft):
+    """
+    Espectro (rfft de largo n_fft, sin la continua) del escalón unitario en la
+    muestra 0, como 1/(1 - e^(-jω)).
+
+    sosfiltfilt arranca cada pasada en el estado estacionario de su primera
+    muestra c (sosfilt_zi): para un pasabanda, eso equivale a filtrar la señal
+    menos c·u(t), un escalón que en las bandas graves deja un transitorio mucho
+    mayor que el del sonido directo. Restándolo del espectro, el motor espectral
+    da el mismo resultado que sosfiltfilt desde la primera muestra. (En el
+    dominio circular el escalón es un diente de sierra de media nula; la rampa
+    no aporta nada al filtrarla con una respuesta de fase cero y ganancia nula
+    en continua.)
+    """
+    k = np.arange(n_fft // 2 + 1)
+    escalon = np.zeros(len(k), dtype=complex)
+    escalon[1:] = 1.0 / (1.0 - np.exp(-2j * np.pi * k[1:] / n_fft))
+    return escalon
+
+
+def filtrar_espectral(audiodata, fs, tipo_filtro='octava', orden_filtro=4, n_fft=None,
+                      modo_filtrado='filtfilt', workers=None, frecuencias=None):
+    """
+    Motor espectral del banco de filtros: obtiene la señal analítica de cada banda
+    con una sola FFT de la RI y una FFT inversa por banda.
+
+    El espectro de la RI se multiplica por la respuesta de cada filtro (por defecto
+    la de fase cero |H|², la misma que produce sosfiltfilt con el banco de
+    disenar_banco_filtros) y por la máscara de la señal analítica (1+sgn(w)). La parte real del resultado
+    es la banda filtrada y su módulo es la envolvente (lo que antes requería
+    filtrar_signal + hilbert_transform). Con 'filtfilt' también se reproduce el
+    tratamiento del borde inicial de sosfiltfilt (extensión impar y estado
+    inicial estacionario), que en una RI que empieza en el sonido directo
+    domina la energía temprana de las bandas graves.
+
+    Args:
+        audiodata (np.array): Señal 1D a analizar, o array (..., N) con varias
+            señales (una FFT por señal, a lo largo del último eje).
+        fs (int): Frecuencia de muestreo en Hz.
+        tipo_filtro (str, optional): 'octava' o 'tercio_octava'. Por defecto 'octava'.
+        orden_filtro (int, optional): Orden del filtro Butterworth. Por defecto 4.
+        n_fft (int, optional): Largo de las FFT. Por defecto, el siguiente largo rápido
+            mayor a la señal más un relleno de RELLENO_ESPECTRAL_ANCHOS / (ancho de
+            banda más angosto) segundos.
+        modo_filtrado (str, optional): 'filtfilt' (|H|²), 'causal' (H) o 'reversed'
+            (conj(H), equivalente a filtrar la RI invertida). Por defecto 'filtfilt'.
+        workers (int, optional): Hilos para las FFT de scipy.fft. Por defecto None.
+        frecuencias (list, optional): Subconjunto de frecuencias centrales a
+            calcular (en el orden del banco). El largo de las FFT se elige igual
+            con todas las bandas, para que el resultado de cada banda no dependa
+            del subconjunto. Por defecto, todas.
+
+    Returns:
+        tuple: (ri_bandas, envolventes, frecuencias)
+            - ri_bandas: matriz (n_bandas, N) con las señales filtradas
+              ((n_bandas, ..., N) si audiodata tiene varias señales).
+            - envolventes: matriz de la misma forma con las envolventes de cada banda.
+            - frecuencias: array con la frecuencia central de cada fila.
+
+    Raises:
+        ValueError: Si el tipo_filtro no es 'octava' ni 'tercio_octava', o si el
+            modo_filtrado no es válido.
+    """
+    _validar_modo_filtrado(modo_filtrado)
+    G, frecuencias_centrales = _bandas(tipo_filtro)
+    factor = np.power(2, G)
+    forma = np.shape(audiodata)
+    N = forma[-1]
+
+    # Con 'filtfilt' se reproduce el borde de sosfiltfilt: extensión impar de
+    # padlen muestras y estado inicial estacionario (ver _escalon_filtfilt)
+    relleno = 3 * (2 * orden_filtro + 1) if modo_filtrado == 'filtfilt' else 0
+    if n_fft is None:
+        ancho_minimo = min(frecuencias_centrales) * (factor - 1 / factor)
+        n_fft = sp_fft.next_fast_len(N + 2 * relleno + int(RELLENO_ESPECTRAL_ANCHOS * fs / ancho_minimo))
+    if frecuencias is not None:
+        frecuencias_centrales = [fc for fc in frecuencias_centrales if fc in frecuencias]
+
+    # 1) Una sola FFT de la RI, ya con la máscara analítica (x2 en frecuencias positivas)
+    if relleno:
+        extendida = _extension_impar(np.asarray(audiodata), relleno)
+        X = sp_fft.rfft(extendida, n_fft, workers=workers)
+        X -= extendida[..., :1] * _escalon_filtfilt(n_fft)
+    else:
+        X = sp_fft.rfft(audiodata, n_fft, workers=workers)
+    X[..., 1:(n_fft + 1) // 2] *= 2
+    tipo = X.real.dtype  # float32 si la señal es float32
+    Omega = np.tan(np.pi * sp_fft.rfftfreq(n_fft, 1 / fs) / fs)
+
+    # 2) Una FFT inversa por banda; las frecuencias negativas quedan en cero
+    espectro = np.zeros(forma[:-1] + (n_fft,), dtype=X.dtype)
+    ri_bandas = np.empty((len(frecuencias_centrales),) + forma, dtype=tipo)
+    envolventes = np.empty((len(frecuencias_centrales),) + forma, dtype=tipo)
+    for i, centerFrequency_Hz in enumerate(frecuencias_centrales):
+        H = _respuesta_espectral(Omega, centerFrequency_Hz, factor, fs, orden_filtro, modo_filtrado)
+        np.multiply(X, H, out=espectro[..., :X.shape[-1]])
+        analitica = sp_fft.ifft(espectro, workers=workers)[..., relleno:relleno + N]
+        ri_bandas[i] = analitica.real
+        np.abs(analitica, out=envolventes[i])
+
+    return ri_bandas, envolventes, np.array(frecuencias_centrales)
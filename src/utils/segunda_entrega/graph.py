@@ -3,7 +3,9 @@ import numpy as np
 from ..tercer_entrega.otras_func import get_output_filepath
 from .escala_log import escala_log
 from ..tercer_entrega.suavizado import hilbert_transform,filtro_promedio_movil
+from .. import metricas
 
+@metricas.medida('graficar_dominio_temporal')
 def graficar_dominio_temporal(signal, fs, hilbert=False):
     """
     Grafica la señal en el dominio temporal.
@@ -55,6 +57,7 @@ def graficar_dominio_temporal(signal, fs, hilbert=False):
     )
     plt.savefig(out_file, dpi=300, bbox_inches="tight")
 
+@metricas.medida('graficar_espectro')
 def graficar_espectro(signal, fs,color='r'):
     """
     Grafica el espectro de la señal x (longitud N, muestreo fs) con eje X en escala logarítmica y eje Y en dB.
@@ -124,6 +127,7 @@ def graficar_espectro(signal, fs,color='r'):
     out_file = get_output_filepath(f'freq_domain_plot.png',2,('static','img','temp'))
     plt.savefig(out_file,dpi=300,bbox_inches="tight")
 
+@metricas.medida('graficar_resultados')
 def graficar_resultados(freq, datos_debug, fs):
     """
     Grafica la RI filtrada en dB, la curva de decaimiento de Schroeder y la línea de regresión de Lundeby,
@@ -135,7 +139,8 @@ def graficar_resultados(freq, datos_debug, fs):
         Frecuencia central de la banda a graficar, en Hz.
     datos_debug : dict
         Diccionario que contiene los resultados de la segunda entrega, con las claves
-        'ri_filtradas', 'datos_lundeby', 'curvas_decay_db'.
+        'ri_filtradas', 'datos_lundeby', 'curvas_decay_db' y, si el análisis se
+        hizo a una frecuencia reducida, 'fs_analisis'.
     fs : int
         Frecuencia de muestreo en Hz.
 
@@ -165,7 +170,8 @@ def graficar_resultados(freq, datos_debug, fs):
     intercept = lundeby_info['intercept']
 
     # Datos de Schroeder
-    tiempo_sch_full = np.arange(len(datos_debug['curvas_decay_db'][freq])) / fs
+    fs_curvas = datos_debug.get('fs_analisis', fs)
+    tiempo_sch_full = np.arange(len(datos_debug['curvas_decay_db'][freq])) / fs_curvas
 
     # Crear la figura
     plt.figure(figsize=(14, 8))
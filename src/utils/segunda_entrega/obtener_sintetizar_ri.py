@@ -1,6 +1,38 @@
+import os
+import threading
+from collections import OrderedDict
 import soundfile as sf
 import numpy as np
-from ..tercer_entrega.otras_func import get_output_filepath
+from scipy import fft as sp_fft
+from scipy.signal import find_peaks, resample_poly
+from ..tercer_entrega.otras_func import array_multicanal_a_1d, get_output_filepath
+from .. import metricas
+
+# Espectros de filtros inversos que se guardan (uno por sweep y largo de FFT) y
+# memoria máxima que ocupan entre todos, en bytes
+MAX_ESPECTROS_INVERSOS = 16
+MAX_BYTES_ESPECTROS_INVERSOS = 128 * 1024 * 1024
+
+# Frecuencia de muestreo (aproximada) a la que se buscan las repeticiones del sweep
+FS_LOCALIZACION = 8000
+
+# Umbral de los picos de la deconvolución que se toman como repeticiones, en dB
+# respecto del mayor. Los productos de distorsión armónica quedan más abajo y,
+# además, a menos de un sweep del pico principal.
+UMBRAL_REPETICION_DB = -20.0
+
+# Una repetición se descarta si la energía de su diferencia con la RI mediana
+# supera FACTOR_ATIPICOS veces la mediana de esas energías
+FACTOR_ATIPICOS = 4.0
+
+# Energía de la diferencia con la RI mediana (en dB respecto de la mediana)
+# por debajo de la cual una repetición nunca es atípica: con repeticiones
+# prácticamente iguales la mediana de esas energías es casi cero, y el
+# redondeo alcanzaría para descartar alguna
+RESIDUO_MINIMO_ATIPICO_DB = -100.0
+
+# Muestras por bloque al normalizar en disco la salida de la deconvolución por bloques
+MUESTRAS_BLOQUE_NORMALIZADO = 2 ** 20
 
 def sintetizar_RI(frecuencias: dict,
                   fs: int = 44100,
@@ -91,43 +123,149 @@ def sintetizar_RI(frecuencias: dict,
     return {'audio_data':ri_ruido,
             'fs':fs}
 
-def obtener_RI_por_deconvolucion(grabacion, 
-                            filtro_inverso,
+# Caché de espectro_filtro_inverso: (parámetros, n_fft) -> (espectro, largo_filtro),
+# el usado más recientemente al final
+_espectros_inversos = OrderedDict()
+_lock_espectros_inversos = threading.Lock()
+
+
+def largo_fft_filtro_inverso(n):
+    """
+    Largo de FFT (la potencia de 2 mayor o igual a n) con el que se pide
+    espectro_filtro_inverso. Redondear a potencias de 2 hace que grabaciones
+    de largos parecidos compartan el mismo espectro guardado, en lugar de
+    calcular uno por cada largo exacto.
+    """
+    return 1 << max(int(n) - 1, 0).bit_length()
+
+
+def espectro_filtro_inverso(duracion, f_inferior, f_superior, fs, n_fft):
+    """
+    Espectro (rfft de largo n_fft) del filtro inverso de generar_sweep_inverse
+    para esos parámetros del sweep. Se guarda en caché: en una sesión de
+    medición todas las grabaciones usan el mismo sweep, y el filtro inverso y
+    su FFT se calculan una sola vez. La caché guarda hasta
+    MAX_ESPECTROS_INVERSOS espectros y MAX_BYTES_ESPECTROS_INVERSOS bytes
+    (siempre conserva el último) y descarta primero los usados hace más tiempo.
+    Para aprovecharla, n_fft debe salir de largo_fft_filtro_inverso.
+
+    Parámetros
+    ----------
+    duracion : float
+        Duración del sweep en segundos.
+    f_inferior, f_superior : float
+        Frecuencias inicial y final del sweep en Hz.
+    fs : int
+        Frecuencia de muestreo en Hz.
+    n_fft : int
+        Largo de la FFT.
+
+    Retorna
+    -------
+    tuple
+        (espectro, largo_filtro): el espectro complejo (de solo lectura) y el
+        largo del filtro inverso en muestras.
+    """
+    clave = (duracion, f_inferior, f_superior, fs, n_fft)
+    with _lock_espectros_inversos:
+        guardado = _espectros_inversos.get(clave)
+        if guardado is not None:
+            _espectros_inversos.move_to_end(clave)
+            return guardado
+
+    # Import diferido: el módulo de grabación carga sounddevice
+    from ..primer_entrega.funcs import generar_sweep_inverse
+    _, filtro_inverso, _ = generar_sweep_inverse(duracion, fs=fs, f_inferior=f_inferior, f_superior=f_superior)
+    espectro = sp_fft.rfft(np.asarray(filtro_inverso, dtype=np.float64), n_fft)
+    espectro.setflags(write=False)
+    guardado = (espectro, len(filtro_inverso))
+
+    with _lock_espectros_inversos:
+        _espectros_inversos[clave] = guardado
+        _espectros_inversos.move_to_end(clave)
+        while len(_espectros_inversos) > 1 and (
+                len(_espectros_inversos) > MAX_ESPECTROS_INVERSOS
+                or sum(e.nbytes for e, _ in _espectros_inversos.values()) > MAX_BYTES_ESPECTROS_INVERSOS):
+            _espectros_inversos.popitem(last=False)
+    return guardado
+
+
+def obtener_RI_por_deconvolucion(grabacion,
+                            filtro_inverso=None,
                             fs=44100,
                             exportar_wav=False,
-                            filename="RI_sweep.wav"):
+                            filename="RI_sweep.wav",
+                            parametros_sweep=None,
+                            duracion_ri_s=None):
     """
     Devuelve la respuesta al impulso h[n] = (grabacion * filtro_inverso) en el dominio del tiempo,
-    usando multiplicación de espectros (FFT).
+    usando multiplicación de espectros (FFT reales).
 
     Parámetros
     ----------
     grabacion : array_like (1D)
         Arreglo de muestras de la señal grabada y[n] (por ejemplo, el sine‐sweep captado con micrófono).
 
-    filtro_inverso : array_like (1D)
+    filtro_inverso : array_like (1D), opcional
         Arreglo de muestras del filtro inverso k[n] que diseñaste para deconvolucionar el sine‐sweep.
+        Puede omitirse si se indica parametros_sweep.
+
+    parametros_sweep : tuple, opcional
+        (duracion, f_inferior, f_superior) del sweep de generar_sweep_inverse. En lugar
+        de transformar filtro_inverso en cada llamada, se usa el espectro guardado por
+        espectro_filtro_inverso (se calcula la primera vez).
+
+    duracion_ri_s : float, opcional
+        Si se indica, solo se devuelve la parte causal de interés: duracion_ri_s
+        segundos desde el instante cero de la RI (la muestra len(filtro_inverso) - 1
+        de la convolución), en lugar de la convolución completa.
 
     Returns
     -------
-    h : ndarray (1D)
-        Respuesta al impulso lineal h[n] = y[n] * k[n], de longitud len(grabacion) + len(filtro_inverso) - 1.
-        Es un array real (dtype float) con la RI normalizada
+    dict
+        'audio_data': respuesta al impulso normalizada (array float). Sin duracion_ri_s
+        es la convolución lineal completa, de longitud len(grabacion) + len(filtro_inverso) - 1.
+        'fs': frecuencia de muestreo.
+        'inicio': índice de la primera muestra devuelta dentro de la convolución completa.
 
     """
+    grabacion = np.asarray(grabacion, dtype=np.float64)
+    if filtro_inverso is None and parametros_sweep is None:
+        raise ValueError("Se necesita filtro_inverso o parametros_sweep")
+    if parametros_sweep is None:
+        filtro_inverso = np.asarray(filtro_inverso, dtype=np.float64)
+        largo_filtro = len(filtro_inverso)
+    else:
+        duracion, f_inferior, f_superior = parametros_sweep
+        largo_filtro = int(duracion * fs)
+
     # 1. Longitud que debería tener la convolución lineal:
-    N_lineal = len(grabacion) + len(filtro_inverso) - 1
-    
-    # 2. Elegimos N_FFT como la siguiente potencia de 2 mayor a N_lineal (por eficiencia).
-    
-    N_FFT = 1 << int(np.ceil(np.log2(N_lineal)))
-    
-    #3. FFT de ambas señales completando el tamaño a N_FFT 
-    FFT_grab = np.fft.fft(grabacion,      n=N_FFT)
-    FFT_filt = np.fft.fft(filtro_inverso, n=N_FFT)
-    
-    RI = np.real(np.fft.ifft(FFT_grab * FFT_filt))
-    RI = RI[:N_lineal]
+    N_lineal = len(grabacion) + largo_filtro - 1
+
+    # 2. Largo de FFT: el siguiente largo rápido para FFT reales (no hace falta
+    #    llegar a la siguiente potencia de 2). Con parametros_sweep, la potencia
+    #    de 2 del espectro guardado, que comparten grabaciones de largo parecido
+    if parametros_sweep is None:
+        N_FFT = sp_fft.next_fast_len(N_lineal, real=True)
+    else:
+        N_FFT = largo_fft_filtro_inverso(N_lineal)
+
+    #3. FFT reales de ambas señales completando el tamaño a N_FFT
+    FFT_grab = sp_fft.rfft(grabacion, N_FFT)
+    if parametros_sweep is None:
+        FFT_filt = sp_fft.rfft(filtro_inverso, N_FFT)
+    else:
+        FFT_filt, largo_filtro = espectro_filtro_inverso(duracion, f_inferior, f_superior, fs, N_FFT)
+    FFT_grab *= FFT_filt
+    RI = sp_fft.irfft(FFT_grab, N_FFT)
+
+    #3.5 Ventana causal: desde el instante cero de la RI
+    inicio = 0
+    if duracion_ri_s is not None:
+        inicio = largo_filtro - 1
+        RI = RI[inicio:min(N_lineal, inicio + int(round(duracion_ri_s * fs)))].copy()
+    else:
+        RI = RI[:N_lineal]
     
     #4. Normalizar la respuesta al impulso
     RI /= np.max(np.abs(RI))
@@ -139,6 +277,351 @@ def obtener_RI_por_deconvolucion(grabacion,
         sf.write(str(out_file), ri_int16, fs)
 
     return {'audio_data': RI,
-             'fs': fs}
+             'fs': fs,
+             'inicio': inicio}
 
 
+def _leer_bloques(grabacion, muestras_bloque):
+    """
+    Generador de bloques consecutivos de muestras (float64, 1D) de una
+    grabación en disco (ruta, leída con soundfile) o en un array (por ejemplo,
+    un np.memmap). Los archivos multicanal se pasan a mono bloque a bloque.
+    """
+    if isinstance(grabacion, (str, os.PathLike)):
+        with sf.SoundFile(grabacion) as archivo:
+            for bloque in archivo.blocks(muestras_bloque, dtype='float64'):
+                yield array_multicanal_a_1d(bloque) if bloque.ndim > 1 else bloque
+    else:
+        for inicio in range(0, len(grabacion), muestras_bloque):
+            bloque = np.asarray(grabacion[inicio:inicio + muestras_bloque], dtype=np.float64)
+            yield array_multicanal_a_1d(bloque) if bloque.ndim > 1 else bloque
+
+
+def deconvolucion_por_bloques(grabacion,
+                              filtro_inverso=None,
+                              fs=None,
+                              parametros_sweep=None,
+                              muestras_bloque=None):
+    """
+    Deconvolución de una grabación larga por overlap-save: lee la grabación de
+    a bloques y devuelve, a medida que se calculan, los tramos consecutivos de
+    la convolución lineal grabacion * filtro_inverso (la misma señal que
+    obtener_RI_por_deconvolucion, sin normalizar). La memoria usada depende
+    del largo del filtro y del bloque, no del largo de la grabación.
+
+    Parámetros
+    ----------
+    grabacion : str, os.PathLike o array_like (1D)
+        Ruta de un archivo de audio (se lee de a bloques con soundfile) o array
+        de muestras; un np.memmap se lee de a bloques sin cargarlo entero.
+
+    filtro_inverso : array_like (1D), opcional
+        Filtro inverso k[n]. Puede omitirse si se indica parametros_sweep.
+
+    fs : int, opcional
+        Frecuencia de muestreo en Hz. Con una ruta, por defecto la del archivo
+        (si se indica, debe coincidir); con un array, por defecto 44100 Hz.
+
+    parametros_sweep : tuple, opcional
+        (duracion, f_inferior, f_superior) del sweep; se usa el espectro del
+        filtro inverso guardado por espectro_filtro_inverso.
+
+    muestras_bloque : int, opcional
+        Mínimo de muestras de la grabación procesadas por bloque. Por defecto
+        el largo del filtro, que es el bloque con menos operaciones por muestra
+        (bloques mucho más cortos que el filtro repiten su FFT muchas veces).
+
+    Yields
+    ------
+    tuple
+        (inicio, tramo): índice del primer valor del tramo dentro de la
+        convolución completa y el tramo (float64). Los tramos cubren, en
+        orden, las len(grabacion) + len(filtro_inverso) - 1 muestras.
+
+    Ejemplo
+    -------
+    >>> for inicio, tramo in deconvolucion_por_bloques('sesion.wav', parametros_sweep=(10, 20, 20000)):
+    ...     salida[inicio:inicio + len(tramo)] = tramo
+    """
+    if filtro_inverso is None and parametros_sweep is None:
+        raise ValueError("Se necesita filtro_inverso o parametros_sweep")
+    if isinstance(grabacion, (str, os.PathLike)):
+        info = sf.info(grabacion)
+        if fs is not None and fs != info.samplerate:
+            raise ValueError(f"fs={fs} no coincide con la del archivo ({info.samplerate} Hz)")
+        fs, N = info.samplerate, info.frames
+    else:
+        fs = 44100 if fs is None else fs
+        N = len(grabacion)
+
+    if parametros_sweep is None:
+        filtro_inverso = np.asarray(filtro_inverso, dtype=np.float64)
+        largo_filtro = len(filtro_inverso)
+    else:
+        duracion, f_inferior, f_superior = parametros_sweep
+        largo_filtro = int(duracion * fs)
+
+    # Overlap-save: cada bloque de B muestras nuevas se transforma junto con las
+    # L - 1 anteriores; las primeras L - 1 muestras de la salida circular tienen
+    # aliasing y se descartan. Se aprovecha todo el largo rápido de FFT para B.
+    solape = largo_filtro - 1
+    if parametros_sweep is None:
+        N_FFT = sp_fft.next_fast_len(max(muestras_bloque or largo_filtro, 1) + solape, real=True)
+    else:
+        N_FFT = largo_fft_filtro_inverso(max(muestras_bloque or largo_filtro, 1) + solape)
+    B = N_FFT - solape
+    if parametros_sweep is None:
+        espectro = sp_fft.rfft(filtro_inverso, N_FFT)
+    else:
+        espectro, _ = espectro_filtro_inverso(duracion, f_inferior, f_superior, fs, N_FFT)
+
+    N_lineal = N + solape
+    buffer = np.zeros(N_FFT)
+    bloques = _leer_bloques(grabacion, B)
+    inicio = 0
+    while inicio < N_lineal:
+        # Después del final de la grabación se siguen procesando ceros: la cola
+        # de la convolución
+        nuevo = next(bloques, None) if inicio < N else None
+        largo = min(B, N_lineal - inicio)
+        buffer[:solape] = buffer[B:]
+        buffer[solape:] = 0.0
+        if nuevo is not None:
+            buffer[solape:solape + len(nuevo)] = nuevo
+        tramo = sp_fft.irfft(sp_fft.rfft(buffer) * espectro, N_FFT)[solape:solape + largo]
+        yield inicio, tramo
+        inicio += largo
+
+
+def obtener_RI_por_deconvolucion_por_bloques(grabacion,
+                                             filtro_inverso=None,
+                                             fs=None,
+                                             parametros_sweep=None,
+                                             filename="RI_sweep.npy",
+                                             duracion_ri_s=None,
+                                             muestras_bloque=None):
+    """
+    Como obtener_RI_por_deconvolucion, pero para grabaciones que no entran en
+    memoria: deconvoluciona por bloques (ver deconvolucion_por_bloques) y
+    escribe la RI a medida que se calcula en un .npy en disco, que después se
+    normaliza de a bloques.
+
+    Parámetros
+    ----------
+    grabacion : str, os.PathLike o array_like (1D)
+        Ruta de un archivo de audio o array de muestras (por ejemplo, un np.memmap).
+
+    filtro_inverso, fs, parametros_sweep, muestras_bloque :
+        Ver deconvolucion_por_bloques.
+
+    filename : str, opcional
+        Nombre del .npy de salida (en temp_request/audio). Por defecto "RI_sweep.npy".
+
+    duracion_ri_s : float, opcional
+        Si se indica, solo se guarda la parte causal de interés (ver
+        obtener_RI_por_deconvolucion), y la lectura termina al completarla.
+
+    Returns
+    -------
+    dict
+        'audio_data': la RI normalizada, como np.memmap de solo lectura sobre el archivo.
+        'fs': frecuencia de muestreo.
+        'inicio': índice de la primera muestra guardada dentro de la convolución completa.
+        'ruta': ruta del .npy.
+    """
+    if isinstance(grabacion, (str, os.PathLike)):
+        info = sf.info(grabacion)
+        fs, N = (info.samplerate if fs is None else fs), info.frames
+    else:
+        fs = 44100 if fs is None else fs
+        N = len(grabacion)
+    largo_filtro = len(filtro_inverso) if parametros_sweep is None else int(parametros_sweep[0] * fs)
+
+    N_lineal = N + largo_filtro - 1
+    inicio, fin = 0, N_lineal
+    if duracion_ri_s is not None:
+        inicio = largo_filtro - 1
+        fin = min(N_lineal, inicio + int(round(duracion_ri_s * fs)))
+
+    ruta = get_output_filepath(filename, levels_up=2)
+    RI = np.lib.format.open_memmap(str(ruta), mode='w+', dtype=np.float64, shape=(fin - inicio,))
+    maximo = 0.0
+    for posicion, tramo in deconvolucion_por_bloques(grabacion, filtro_inverso, fs, parametros_sweep, muestras_bloque):
+        desde, hasta = max(posicion, inicio), min(posicion + len(tramo), fin)
+        if desde < hasta:
+            parte = tramo[desde - posicion:hasta - posicion]
+            RI[desde - inicio:hasta - inicio] = parte
+            maximo = max(maximo, float(np.max(np.abs(parte))))
+        if posicion + len(tramo) >= fin:
+            break
+
+    # Normalizar en disco, de a bloques
+    for desde in range(0, len(RI), MUESTRAS_BLOQUE_NORMALIZADO):
+        RI[desde:desde + MUESTRAS_BLOQUE_NORMALIZADO] /= maximo
+    RI.flush()
+    del RI
+
+    return {'audio_data': np.load(str(ruta), mmap_mode='r'),
+            'fs': fs,
+            'inicio': inicio,
+            'ruta': str(ruta)}
+
+
+def localizar_sweeps(grabacion, fs, parametros_sweep, n_repeticiones=None, umbral_db=UMBRAL_REPETICION_DB):
+    """
+    Localiza las repeticiones de un sweep en una grabación: la deconvolución
+    (a FS_LOCALIZACION, para que sea barata) tiene un pico por repetición.
+
+    Parámetros
+    ----------
+    grabacion : np.ndarray (1D)
+        Grabación con una o más repeticiones del sweep.
+    fs : int
+        Frecuencia de muestreo en Hz.
+    parametros_sweep : tuple
+        (duracion, f_inferior, f_superior) del sweep de generar_sweep_inverse.
+    n_repeticiones : int, opcional
+        Cantidad de repeticiones. Si se indica se toman los n picos mayores;
+        si no, todos los que superan umbral_db.
+    umbral_db : float, opcional
+        Nivel mínimo de un pico respecto del mayor. Por defecto UMBRAL_REPETICION_DB.
+
+    Retorna
+    -------
+    np.ndarray
+        Índice aproximado (± fs/FS_LOCALIZACION muestras) del pico de cada
+        repetición en la convolución completa, en orden.
+    """
+    # Import diferido: el módulo de grabación carga sounddevice
+    from ..primer_entrega.funcs import generar_sweep_inverse
+    duracion, f_inferior, f_superior = parametros_sweep
+    q = max(1, fs // FS_LOCALIZACION)
+    _, filtro_inverso, _ = generar_sweep_inverse(duracion, fs=fs, f_inferior=f_inferior, f_superior=f_superior)
+    grabacion_baja = resample_poly(grabacion, 1, q)
+    filtro_bajo = resample_poly(filtro_inverso.astype(np.float64), 1, q)
+
+    N_lineal = len(grabacion_baja) + len(filtro_bajo) - 1
+    N_FFT = sp_fft.next_fast_len(N_lineal, real=True)
+    envolvente = np.abs(sp_fft.irfft(sp_fft.rfft(grabacion_baja, N_FFT) * sp_fft.rfft(filtro_bajo, N_FFT), N_FFT)[:N_lineal])
+
+    # Dos repeticiones están separadas al menos por casi un sweep
+    picos, propiedades = find_peaks(envolvente,
+                                    height=np.max(envolvente) * 10 ** (umbral_db / 20),
+                                    distance=max(1, int(0.9 * len(filtro_bajo))))
+    if n_repeticiones is not None:
+        picos = np.sort(picos[np.argsort(propiedades['peak_heights'])[::-1][:n_repeticiones]])
+    return picos * q
+
+
+def promediar_sweeps(grabacion,
+                     fs,
+                     parametros_sweep,
+                     n_repeticiones=None,
+                     duracion_ri_s=None,
+                     factor_atipicos=FACTOR_ATIPICOS):
+    """
+    Promedio sincrónico de las repeticiones de un sweep grabadas una detrás de
+    otra: localiza cada repetición (ver localizar_sweeps), deconvoluciona todas
+    juntas con una sola FFT por lotes contra el espectro guardado del filtro
+    inverso, alinea las RIs por su pico, descarta las atípicas y promedia el
+    resto. Con R repeticiones útiles el ruido baja unos 10·log10(R) dB.
+
+    Parámetros
+    ----------
+    grabacion : array_like (1D)
+        Grabación con las repeticiones del sweep.
+    fs : int
+        Frecuencia de muestreo en Hz.
+    parametros_sweep : tuple
+        (duracion, f_inferior, f_superior) del sweep de generar_sweep_inverse.
+    n_repeticiones : int, opcional
+        Cantidad de repeticiones (ver localizar_sweeps). Por defecto se detectan.
+    duracion_ri_s : float, opcional
+        Largo de la RI en segundos. Por defecto (y como máximo) el silencio
+        entre el final de un sweep y el comienzo del siguiente; con una sola
+        repetición, hasta el final de la grabación.
+    factor_atipicos : float, opcional
+        Una repetición se descarta si la energía de su diferencia con la RI
+        mediana supera factor_atipicos veces la mediana de esas energías (y
+        RESIDUO_MINIMO_ATIPICO_DB). Por defecto FACTOR_ATIPICOS.
+
+    Returns
+    -------
+    dict
+        'audio_data': RI promediada y normalizada.
+        'fs': frecuencia de muestreo.
+        'posiciones': índice de inicio de cada repetición en la grabación.
+        'usadas': lista de bool, si cada repetición entró en el promedio.
+        'residuos_db': energía de la diferencia de cada RI con la mediana,
+        relativa a la energía de la mediana, en dB.
+    """
+    grabacion = np.asarray(grabacion, dtype=np.float64)
+    duracion, f_inferior, f_superior = parametros_sweep
+    largo_filtro = int(duracion * fs)
+
+    with metricas.etapa('localizar_sweeps'):
+        picos = localizar_sweeps(grabacion, fs, parametros_sweep, n_repeticiones)
+    if len(picos) == 0:
+        raise ValueError("No se encontró ninguna repetición del sweep en la grabación")
+
+    # Cada tramo empieza un margen antes de su repetición, para cubrir el error
+    # de la localización: el pico de cada RI se busca en los primeros dos
+    # márgenes, y al final sobra lugar para alinear
+    margen = 2 * max(1, fs // FS_LOCALIZACION) + int(0.01 * fs)
+    inicios = picos - (largo_filtro - 1) - margen
+
+    # Con varias repeticiones, todos los tramos se cortan (con ceros) un margen
+    # antes del comienzo de la repetición siguiente más cercana: la
+    # deconvolución del sweep siguiente, aunque sea parcial, deja energía antes
+    # de su pico, dentro de la RI. El corte es el mismo para todos (también
+    # para la última), así repeticiones iguales dan RIs iguales. La RI es
+    # completa en todas las frecuencias mientras la respuesta al final del
+    # sweep entre antes del corte: su largo máximo es el silencio entre sweeps.
+    if len(picos) > 1:
+        corte = int(np.min(np.diff(picos)))
+        largo = corte - largo_filtro
+        if largo <= 0:
+            raise ValueError("Las repeticiones del sweep no dejan silencio entre sí para la RI")
+    else:
+        corte = None
+        largo = len(grabacion) + largo_filtro - 1 - int(picos[0])
+    if duracion_ri_s is not None:
+        largo = min(largo, int(round(duracion_ri_s * fs)))
+
+    M = margen + largo_filtro + largo + 2 * margen
+    corte = M if corte is None else min(corte, M)
+    tramos = np.zeros((len(picos), M))
+    for fila, inicio in zip(tramos, inicios):
+        desde, hasta = max(inicio, 0), min(inicio + corte, len(grabacion))
+        if desde < hasta:
+            fila[desde - inicio:hasta - inicio] = grabacion[desde:hasta]
+
+    with metricas.etapa('deconvolucion') as m:
+        N_FFT = largo_fft_filtro_inverso(M + largo_filtro - 1)
+        espectro, _ = espectro_filtro_inverso(duracion, f_inferior, f_superior, fs, N_FFT)
+        espectros = sp_fft.rfft(tramos, N_FFT, axis=-1)
+        espectros *= espectro
+        ris = sp_fft.irfft(espectros, N_FFT, axis=-1)[:, largo_filtro - 1:largo_filtro - 1 + M - largo_filtro + 1]
+        m.tamano(ris)
+
+    with metricas.etapa('promedio'):
+        # Alinear por el pico (sonido directo) de cada RI, conservando antes
+        # del pico lo mismo en todas. La referencia es el pico mediano, para que
+        # una repetición con un transitorio no corra a las demás (se completa
+        # con ceros lo que quede fuera del tramo).
+        pico_ri = np.argmax(np.abs(ris[:, :2 * margen]), axis=-1)
+        previo = int(np.median(pico_ri))
+        ris = np.pad(ris, ((0, 0), (previo, largo)))
+        ris = np.stack([ri[p:p + largo] for ri, p in zip(ris, pico_ri)])
+
+        mediana = np.median(ris, axis=0)
+        residuos = np.sum((ris - mediana) ** 2, axis=-1) / np.sum(mediana ** 2)
+        usadas = residuos <= max(factor_atipicos * np.median(residuos), 10 ** (RESIDUO_MINIMO_ATIPICO_DB / 10))
+        RI = np.mean(ris[usadas], axis=0)
+        RI /= np.max(np.abs(RI))
+
+    return {'audio_data': RI,
+            'fs': fs,
+            'posiciones': [int(p) for p in inicios + margen],
+            'usadas': usadas.tolist(),
+            'residuos_db': (10 * np.log10(np.maximum(residuos, 1e-30))).tolist()}
@@ -34,9 +34,33 @@ def regresion_lineal_en_intervalo(x, y, lim_sup, lim_inf):
     """
     Ajusta una recta a y(t) en el tramo [lim_sup, lim_inf] dB.
 
+    Si y es una matriz (n_bandas, N) se ajusta una recta por fila, a lo largo
+    del último eje, con las mismas muestras que tomaría cada fila sola (no hace
+    falta que sean monótonas; para curvas de Schroeder en dB, CurvaIndexada
+    evita recorrerlas en cada rango); lim_sup y lim_inf pueden ser escalares o
+    arrays (n_bandas,).
+
     Retorna:
     - Dict: {'slope': pendiente, 'intercept': ordenada al origen}
+      (arrays de forma (n_bandas,) si y es una matriz)
     """
+    if np.ndim(y) > 1:
+        x = np.asarray(x, dtype=float)
+        lim_sup = np.asarray(lim_sup, dtype=float)[..., None]
+        lim_inf = np.asarray(lim_inf, dtype=float)[..., None]
+        mask = (y <= lim_sup) & (y >= lim_inf)
+
+        n   = np.count_nonzero(mask, axis=-1)
+        Sx  = np.sum(np.where(mask, x, 0.0), axis=-1)
+        Sy  = np.sum(np.where(mask, y, 0.0), axis=-1)
+        Sxx = np.sum(np.where(mask, x * x, 0.0), axis=-1)
+        Sxy = np.sum(np.where(mask, x * y, 0.0), axis=-1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = (n * Sxy - Sx * Sy) / (n * Sxx - Sx**2)
+            b = (Sy - a * Sx) / n
+        return {'slope':a,'intercept':b}
+
     #1. Selecciona únicamente los elementos que pertenecen a [lim_inf, lim_sup]. 
     mask = (y <= lim_sup) & (y >= lim_inf)
 
@@ -44,3 +68,100 @@ def regresion_lineal_en_intervalo(x, y, lim_sup, lim_inf):
     ajuste_lineal = regresion_lineal(x[mask], y[mask])
     return ajuste_lineal
 
+
+class CurvaIndexada:
+    """
+    Índice de sumas acumuladas de una curva de decaimiento para ajustar rectas
+    en cualquier intervalo de niveles sin volver a recorrer la curva.
+
+    Se calculan una sola vez las sumas acumuladas de x, x², y y x·y. Como las
+    curvas de Schroeder en dB son monótonas no crecientes, las muestras con
+    lim_inf <= y <= lim_sup forman un tramo contiguo [i0, i1), que se ubica con
+    dos búsquedas binarias (O(log N)); las cuatro sumas de la regresión salen de
+    restar los acumulados en los extremos del tramo. Así, cada rango adicional
+    (T15, T40, rangos a medida) no agrega otra pasada sobre la curva.
+
+    Parámetros
+    ----------
+    x : np.ndarray, forma (N,)
+        Eje de tiempo, común a todas las curvas.
+    y : np.ndarray, forma (N,) o (n_curvas, N)
+        Curva(s) monótona(s) no creciente(s), por ejemplo en dB.
+
+    Ejemplo
+    -------
+    >>> curva = CurvaIndexada(t, schroeder_db)
+    >>> t20 = curva.ajustar(-5, -25)
+    >>> t40 = curva.ajustar(-5, -45)
+    """
+
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        self.es_matriz = y.ndim > 1
+        y = np.atleast_2d(y)
+        n_curvas, N = y.shape
+
+        # -y es creciente, que es lo que necesita np.searchsorted
+        self._y_neg = -y
+
+        # Acumulados con un cero adelante: P[k] = suma de los primeros k valores
+        self._Px = np.concatenate(([0.0], np.cumsum(x)))
+        self._Pxx = np.concatenate(([0.0], np.cumsum(x * x)))
+        self._Py = np.zeros((n_curvas, N + 1))
+        self._Pxy = np.zeros((n_curvas, N + 1))
+        np.cumsum(y, axis=-1, out=self._Py[:, 1:])
+        np.cumsum(y * x, axis=-1, out=self._Pxy[:, 1:])
+
+    def tramo(self, lim_sup, lim_inf, filas=None):
+        """
+        Índices [i0, i1) del tramo de cada curva con lim_inf <= y <= lim_sup.
+        """
+        if filas is None:
+            filas = np.arange(self._y_neg.shape[0])
+        lim_sup = np.broadcast_to(lim_sup, filas.shape)
+        lim_inf = np.broadcast_to(lim_inf, filas.shape)
+
+        i0 = np.empty(len(filas), dtype=int)
+        i1 = np.empty(len(filas), dtype=int)
+        for k, fila in enumerate(filas):
+            # -y es creciente: i0 = cantidad de y > lim_sup, i1 = cantidad de y >= lim_inf
+            i0[k] = np.searchsorted(self._y_neg[fila], -lim_sup[k], side='left')
+            i1[k] = np.searchsorted(self._y_neg[fila], -lim_inf[k], side='right')
+        return i0, np.maximum(i1, i0)
+
+    def ajustar(self, lim_sup, lim_inf, filas=None):
+        """
+        Ajusta una recta a cada curva en el tramo [lim_sup, lim_inf] dB.
+
+        Parámetros
+        ----------
+        lim_sup, lim_inf : float o np.ndarray
+            Límites del tramo; pueden ser un array con un valor por curva.
+        filas : np.ndarray, opcional
+            Índices de las curvas a ajustar (por defecto, todas).
+
+        Retorna
+        -------
+        dict
+            {'slope': pendiente, 'intercept': ordenada al origen}; escalares si
+            la curva es 1D, arrays (n_filas,) si es una matriz.
+        """
+        if filas is None:
+            filas = np.arange(self._y_neg.shape[0])
+        filas = np.asarray(filas)
+        i0, i1 = self.tramo(lim_sup, lim_inf, filas)
+
+        n   = i1 - i0
+        Sx  = self._Px[i1] - self._Px[i0]
+        Sxx = self._Pxx[i1] - self._Pxx[i0]
+        Sy  = self._Py[filas, i1] - self._Py[filas, i0]
+        Sxy = self._Pxy[filas, i1] - self._Pxy[filas, i0]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = (n * Sxy - Sx * Sy) / (n * Sxx - Sx**2)
+            b = (Sy - a * Sx) / n
+
+        if not self.es_matriz:
+            return {'slope':a[0],'intercept':b[0]}
+        return {'slope':a,'intercept':b}
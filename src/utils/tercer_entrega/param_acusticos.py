@@ -1,5 +1,86 @@
+from functools import lru_cache
 import numpy as np
-from utils.tercer_entrega.linear_fit import regresion_lineal_en_intervalo
+from utils.tercer_entrega.linear_fit import CurvaIndexada
+
+@lru_cache(maxsize=None)
+def indices_energia(fs):
+    """
+    Índices de corte entre energía temprana y tardía para una frecuencia de
+    muestreo: (N50, N80), las muestras que hay en 50 ms y en 80 ms.
+    """
+    return int(0.050 * fs), int(0.080 * fs)
+
+def resumen_energia(E_acum: np.ndarray, fs: float) -> dict:
+    """
+    Extrae de la energía acumulada todo lo que necesitan los parámetros de
+    energía (C50, C80, D50, Ts), sin volver a recorrer p².
+
+    Parámetros
+    ----------
+    E_acum : np.ndarray
+        Energía acumulada, E_acum[..., k] = p2[..., 0] + ... + p2[..., k], de
+        forma (N,) o (n_bandas, N). Por ejemplo, el cumsum de integral_schroeder.
+    fs : float
+        Frecuencia de muestreo en Hz.
+
+    Retorna
+    -------
+    dict
+        - 'E_total' : energía total.
+        - 'E_50', 'E_80' : energía en los primeros 50 y 80 ms.
+        - 'momento' : suma de k·p2[k], que es igual a la suma de (E_total - E_acum[k]).
+        Cada valor es un escalar o un array (n_bandas,).
+    """
+    N = E_acum.shape[-1]
+    N50, N80 = indices_energia(fs)
+
+    def energia_hasta(n):
+        n = min(n, N)
+        return E_acum[..., n - 1].copy() if n > 0 else np.zeros_like(E_acum[..., -1])
+
+    # Copias: el acumulado puede reutilizarse (integral_schroeder lo pisa con S)
+    E_total = E_acum[..., -1].copy()
+    return {'E_total': E_total,
+            'E_50': energia_hasta(N50),
+            'E_80': energia_hasta(N80),
+            'momento': N * E_total - np.sum(E_acum, axis=-1)}
+
+def calcular_parametros_energia(energia: dict, fs: float) -> dict:
+    """
+    Calcula C50, C80, D50 y el tiempo central Ts a partir de un resumen de
+    energía (ver resumen_energia), para una banda o todas a la vez.
+
+    Parámetros
+    ----------
+    energia : dict
+        Salida de resumen_energia.
+    fs : float
+        Frecuencia de muestreo en Hz.
+
+    Retorna
+    -------
+    dict
+        - 'D50' : porcentaje de energía en los primeros 50 ms. Rango [0, 100].
+        - 'C50' : claridad C50 en dB, 10*log10(E_50/(E_total - E_50)).
+        - 'C80' : claridad C80 en dB, 10*log10(E_80/(E_total - E_80)).
+        - 'Ts' : tiempo central en segundos, sum(t·p²)/sum(p²).
+
+    Notas
+    -----
+    - Si la energía total es cero, D50 y Ts se establecen a 0.
+    - Igual que en calcular_D50_C80, la energía tardía se limita a 1e-10.
+    - Para Ts, la muestra k representa el intervalo [k, k+1)/fs y se toma su
+      centro, lo que también vale para envolventes diezmadas.
+    """
+    E_total = energia['E_total']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        hay_energia = E_total > 0
+        D50 = np.where(hay_energia, 100.0 * energia['E_50'] / E_total, 0.0)
+        C50 = 10.0 * np.log10(energia['E_50'] / np.clip(E_total - energia['E_50'], 1e-10, None))
+        C80 = 10.0 * np.log10(energia['E_80'] / np.clip(E_total - energia['E_80'], 1e-10, None))
+        Ts = np.where(hay_energia, (energia['momento'] / E_total + 0.5) / fs, 0.0)
+
+    return {'D50': D50[()], 'C50': C50, 'C80': C80, 'Ts': Ts[()]}
 
 def calcular_D50_C80(p2: np.ndarray, fs: int) -> dict:
     """
@@ -9,7 +90,8 @@ def calcular_D50_C80(p2: np.ndarray, fs: int) -> dict:
     ----------
     p2 : np.ndarray
         Energía instantánea muestreada, es decir, p(t)**2, de longitud N.
-        Debe ser un array 1D de valores no negativos.
+        Debe ser un array de valores no negativos: 1D, o matriz (n_bandas, N)
+        para calcular todas las bandas a la vez.
     fs : int
         Frecuencia de muestreo en Hz. Debe ser un valor positivo.
 
@@ -33,19 +115,23 @@ def calcular_D50_C80(p2: np.ndarray, fs: int) -> dict:
     #muestras hasta 50 ms
     N50 = int(0.050 * fs)
     # Aseguramos de no exceder la longitud de la señal
-    N50 = min(N50, len(p2))         
+    N50 = min(N50, p2.shape[-1])
 
-    E_total = np.sum(p2)               
-    E_early_50 = np.sum(p2[:N50])   
+    E_total = np.sum(p2, axis=-1)
+    E_early_50 = np.sum(p2[..., :N50], axis=-1)
 
-    D50 = 100.0 * (E_early_50 / E_total) if E_total > 0 else 0
+    if np.ndim(E_total) == 0:
+        D50 = 100.0 * (E_early_50 / E_total) if E_total > 0 else 0
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            D50 = np.where(E_total > 0, 100.0 * E_early_50 / E_total, 0.0)
 
     # --- C80 ---
     N80 = int(0.080 * fs) 
-    N80 = min(N80, len(p2))
+    N80 = min(N80, p2.shape[-1])
 
-    E_early_80 = np.sum(p2[:N80])       
-    E_late_80  = np.sum(p2[N80:])     
+    E_early_80 = np.sum(p2[..., :N80], axis=-1)
+    E_late_80  = np.sum(p2[..., N80:], axis=-1)
 
     # Evitar log(0): forzar un mínimo valor positivo
     E_late_80_clipped = np.clip(E_late_80, 1e-10, None)
@@ -54,21 +140,34 @@ def calcular_D50_C80(p2: np.ndarray, fs: int) -> dict:
 
     return {'D50': D50, 'C80': C80}
 
-def calcular_parametros_acusticos(signal_db, p2: np.ndarray, fs: int, return_regs=False) -> dict:
+def calcular_parametros_acusticos(signal_db, p2: np.ndarray, fs: int, return_regs=False, t=None,
+                                  rangos_extra=None, energia=None) -> dict:
     """
     Calcula los parámetros acústicos principales a partir de una curva de decaimiento.
 
     Parámetros
     ----------
     signal_db : np.ndarray
-        Curva de decaimiento de Schroeder en escala logarítmica (dB).
+        Curva de decaimiento de Schroeder en escala logarítmica (dB). Puede ser una
+        matriz (n_bandas, N): en ese caso todas las bandas se procesan a la vez y
+        cada valor del resultado es un array (n_bandas,).
     p2 : np.ndarray
-        Energía instantánea muestreada, p(t)**2, de la misma longitud que signal_db.
+        Energía instantánea muestreada, p(t)**2, de la misma forma que signal_db.
     fs : int
         Frecuencia de muestreo en Hz.
     return_regs : bool, opcional
         Si es True, retorna información adicional sobre las regresiones lineales.
         Por defecto es False.
+    t : np.ndarray, opcional
+        Vector de tiempo precalculado. Si es None se construye a partir de fs.
+    rangos_extra : dict, opcional
+        Tramos de decaimiento adicionales, {nombre: (lim_sup, lim_inf)} en dB; por
+        ejemplo {'T15': (-5, -20), 'T40': (-5, -45)} agrega 'T60_from_T15' y
+        'T60_from_T40' al resultado (y sus regresiones a regs). Por defecto None.
+    energia : dict, opcional
+        Resumen de energía ya calculado (por ejemplo, el 'energia' de
+        integral_schroeder con con_energia=True). Si es None se obtiene de p2
+        con una suma acumulada.
 
     Retorna
     -------
@@ -80,7 +179,9 @@ def calcular_parametros_acusticos(signal_db, p2: np.ndarray, fs: int, return_reg
             'T60_from_T20': float,   # T60 estimado del tramo -5 a -25 dB
             'T60_from_T30': float,   # T60 estimado del tramo -5 a -35 dB
             'D50': float,            # Definición (0-100%)
-            'C80': float             # Claridad en dB
+            'C80': float,            # Claridad en dB
+            'C50': float,            # Claridad para la palabra en dB
+            'Ts': float              # Tiempo central (s)
         }
         
         Si return_regs es True, retorna una tupla (dic, regs) donde:
@@ -97,32 +198,47 @@ def calcular_parametros_acusticos(signal_db, p2: np.ndarray, fs: int, return_reg
     -----
     - La señal se normaliza internamente para que su máximo sea 0 dB.
     - Los tiempos de reverberación se calculan asumiendo un decaimiento lineal.
+    - Las regresiones se resuelven con una CurvaIndexada: la curva se recorre una
+      sola vez y cada tramo se ubica por búsqueda binaria.
     """
     #Vector de tiempo
-    t = np.arange(len(signal_db))/fs
+    N = np.shape(signal_db)[-1]
+    if t is None:
+        t = np.arange(N)/fs
+    else:
+        t = t[:N]
 
     #Normalizar para que el máximo sea 0 dB
-    signal_db_norm = signal_db - np.max(signal_db)
+    signal_db_norm = signal_db - np.max(signal_db, axis=-1, keepdims=True)
+
+    curva = CurvaIndexada(t, signal_db_norm)
 
     # 1) EDT: tramo  -1  → -11 dB
-    edt_reg = regresion_lineal_en_intervalo(t, signal_db_norm,  -1, -11)
+    edt_reg = curva.ajustar(-1, -11)
     edt = -60.0 / edt_reg['slope'] 
 
     # 2) T10: tramo -5  → -15 dB
-    t10_reg = regresion_lineal_en_intervalo(t, signal_db_norm,  -5, -15)
+    t10_reg = curva.ajustar(-5, -15)
     t60_from_t10 = -60.0 / t10_reg['slope']
 
 
     # 3) T20: tramo -5  → -25 dB
-    t20_reg = regresion_lineal_en_intervalo(t, signal_db_norm,  -5, -25)
+    t20_reg = curva.ajustar(-5, -25)
     t60_from_t20 = -60.0 / t20_reg['slope']
 
     # 4) T30: tramo -5  → -35 dB
-    t30_reg = regresion_lineal_en_intervalo(t, signal_db_norm,  -5, -35)
+    t30_reg = curva.ajustar(-5, -35)
     t60_from_t30 = -60.0 / t30_reg['slope']
 
-    # 5) D50 y C80
-    d50_c80 = calcular_D50_C80(p2,fs)
+    # 4.5) Tramos adicionales
+    regs_extra = {}
+    for nombre, (lim_sup, lim_inf) in (rangos_extra or {}).items():
+        regs_extra[nombre] = curva.ajustar(lim_sup, lim_inf)
+
+    # 5) Parámetros de energía (D50, C80, C50, Ts) desde la energía acumulada
+    if energia is None:
+        energia = resumen_energia(np.cumsum(p2, axis=-1), fs)
+    param_energia = calcular_parametros_energia(energia, fs)
 
     #6) diccionario
     dic = {
@@ -130,9 +246,14 @@ def calcular_parametros_acusticos(signal_db, p2: np.ndarray, fs: int, return_reg
         'T60_from_T10': t60_from_t10,
         'T60_from_T20': t60_from_t20,
         'T60_from_T30': t60_from_t30,
-        'D50': d50_c80['D50'],
-        'C80': d50_c80['C80']
     }
+    for nombre, reg in regs_extra.items():
+        dic[f'T60_from_{nombre}'] = -60.0 / reg['slope']
+    dic['D50'] = param_energia['D50']
+    dic['C80'] = param_energia['C80']
+    dic['C50'] = param_energia['C50']
+    dic['Ts'] = param_energia['Ts']
+
     if not return_regs:
         return dic
     
@@ -141,6 +262,7 @@ def calcular_parametros_acusticos(signal_db, p2: np.ndarray, fs: int, return_reg
         'EDT': edt_reg,
         'T10': t10_reg,
         'T20': t20_reg,
-        'T30': t30_reg}
+        'T30': t30_reg,
+        **regs_extra}
         return (dic,datos_reg)
     
\ No newline at end of file
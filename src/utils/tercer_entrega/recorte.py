@@ -0,0 +1,107 @@
+import numpy as np
+from utils.tercer_entrega.schroeder_lundeby import lundeby_bandas
+
+# Umbral del punto de inicio (ISO 3382-1, A.3.4): primera muestra a -20 dB del pico
+UMBRAL_INICIO_DB = -20.0
+
+# La cola se corta en inicio + FACTOR_COLA·(cruce - inicio), con cruce el punto de
+# Lundeby de la señal de banda ancha. Con 2, después del cruce queda tanto ruido
+# como decaimiento: el Lundeby de cada banda sigue teniendo ruido para estimar
+# (usa el último 10 % de la señal) y las bandas graves, que decaen más lento
+# que la banda ancha, no se cortan antes de su propio cruce.
+FACTOR_COLA = 2.0
+
+
+def detectar_inicio(ri, umbral_db=UMBRAL_INICIO_DB):
+    """
+    Punto de inicio de una respuesta al impulso según ISO 3382-1: la primera
+    muestra cuyo nivel llega a umbral_db respecto del pico.
+
+    Parámetros
+    ----------
+    ri : np.ndarray
+        Respuesta al impulso 1D, o matriz (canales, N). Con varios canales se
+        toma el inicio más temprano, para no alterar sus diferencias de tiempo.
+    umbral_db : float, opcional
+        Nivel relativo al pico en dB. Por defecto -20 dB.
+
+    Retorna
+    -------
+    int
+        Índice de la muestra de inicio.
+    """
+    amplitud = np.abs(ri)
+    umbral = np.max(amplitud, axis=-1, keepdims=True) * 10 ** (umbral_db / 20)
+    return int(np.min(np.argmax(amplitud >= umbral, axis=-1)))
+
+
+def estimar_fin(ri, fs, inicio=0, factor_cola=FACTOR_COLA, ms_bloque=20):
+    """
+    Estima hasta dónde la RI tiene información útil: el cruce de Lundeby de la
+    señal de banda ancha (desde inicio), extendido por factor_cola.
+
+    Parámetros
+    ----------
+    ri : np.ndarray
+        Respuesta al impulso 1D, o matriz (canales, N). Con varios canales se
+        toma el fin más tardío.
+    fs : int
+        Frecuencia de muestreo en Hz.
+    inicio : int, opcional
+        Índice de inicio (ver detectar_inicio). Por defecto 0.
+    factor_cola : float, opcional
+        Largo conservado, en múltiplos del tramo inicio → cruce. Por defecto
+        FACTOR_COLA.
+    ms_bloque : float, opcional
+        Bloques del Lundeby de banda ancha, en ms. Por defecto 20 ms.
+
+    Retorna
+    -------
+    int
+        Índice (exclusivo) de la última muestra a conservar. Si el cruce no se
+        puede estimar, el largo de la RI.
+    """
+    filas = np.atleast_2d(ri)[:, inicio:]
+    N = np.shape(ri)[-1]
+    if filas.shape[-1] < 10 * int(fs * ms_bloque / 1000):
+        return N
+    cruce = lundeby_bandas(filas, fs, ms_bloque=ms_bloque)
+    if np.any(cruce <= 0):
+        return N
+    return int(min(N, inicio + np.ceil(factor_cola * np.max(cruce))))
+
+
+def recortar_ri(ri, fs, umbral_db=UMBRAL_INICIO_DB, recortar_cola=True, factor_cola=FACTOR_COLA, margen_previo=0):
+    """
+    Recorta el retardo inicial y la cola de ruido de una respuesta al impulso,
+    para que el análisis procese solo la parte útil.
+
+    Parámetros
+    ----------
+    ri : np.ndarray
+        Respuesta al impulso 1D, o matriz (canales, N) (el mismo recorte para
+        todos los canales).
+    fs : int
+        Frecuencia de muestreo en Hz.
+    umbral_db : float, opcional
+        Umbral del punto de inicio (ver detectar_inicio). Por defecto -20 dB.
+    recortar_cola : bool, opcional
+        Si es True, también se recorta la cola (ver estimar_fin). Por defecto True.
+    factor_cola : float, opcional
+        Ver estimar_fin. Por defecto FACTOR_COLA.
+    margen_previo : int, opcional
+        Muestras a conservar antes del inicio (sin pasar del comienzo de la
+        señal). Por defecto 0.
+
+    Retorna
+    -------
+    dict
+        'ri'     : la RI recortada (una vista de ri).
+        'inicio' : índice del punto de inicio en ri.
+        'fin'    : índice (exclusivo) del final conservado en ri.
+        'margen' : muestras conservadas antes del inicio.
+    """
+    inicio = detectar_inicio(ri, umbral_db)
+    fin = estimar_fin(ri, fs, inicio, factor_cola) if recortar_cola else np.shape(ri)[-1]
+    margen = min(int(margen_previo), inicio)
+    return {'ri': ri[..., inicio - margen:fin], 'inicio': inicio, 'fin': fin, 'margen': margen}
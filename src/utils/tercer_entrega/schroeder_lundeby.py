@@ -1,6 +1,8 @@
 import numpy as np
 from utils.segunda_entrega.escala_log import escala_log
-from utils.tercer_entrega.linear_fit import regresion_lineal_en_intervalo
+from utils.tercer_entrega.linear_fit import CurvaIndexada
+from utils.tercer_entrega.param_acusticos import resumen_energia
+from utils import metricas
 
 def calcular_rms_por_bloques(ir, fs, ms_bloque=20):
     """
@@ -9,7 +11,8 @@ def calcular_rms_por_bloques(ir, fs, ms_bloque=20):
     Parámetros
     ----------
     ir : np.ndarray
-        Vector con la respuesta al impulso discreta (dominio del tiempo).
+        Vector con la respuesta al impulso discreta (dominio del tiempo), o matriz
+        (n_bandas, N) con una banda por fila.
     fs : int
         Frecuencia de muestreo en Hz.
     ms_bloque : float, opcional
@@ -18,7 +21,8 @@ def calcular_rms_por_bloques(ir, fs, ms_bloque=20):
     Retorna
     -------
     rms_por_bloque : np.ndarray
-        Array de forma (num_bloques,) con el valor RMS calculado en cada bloque.
+        Array de forma (num_bloques,) (o (n_bandas, num_bloques)) con el valor RMS
+        calculado en cada bloque.
     tamano_bloque : int
         Número de muestras que componen cada bloque (equivalente a ms_bloque·fs/1000).
 
@@ -32,19 +36,20 @@ def calcular_rms_por_bloques(ir, fs, ms_bloque=20):
     tamano_bloque = int(fs * ms_bloque / 1000)
 
     # 2) Cantidad de bloques completos que caben en la señal
-    num_bloques = len(ir) // tamano_bloque
+    num_bloques = np.shape(ir)[-1] // tamano_bloque
 
     # 3) Cortamos la señal para quedarnos solo con num_bloques * tamano_bloque muestras,
-    ir_recortada = ir[: num_bloques * tamano_bloque]
+    ir_recortada = ir[..., : num_bloques * tamano_bloque]
 
     # 4) La transformamos en una matriz de forma (num_bloques, tamano_bloque):
-    #    cada fila es un bloque sucesivo de la señal.
-    ir_bloques = ir_recortada.reshape(num_bloques, tamano_bloque)
+    #    cada fila es un bloque sucesivo de la señal. Es una vista, no una copia.
+    ir_bloques = ir_recortada.reshape(ir.shape[:-1] + (num_bloques, tamano_bloque))
 
     # 5) Ahora, para cada bloque (cada fila), calculamos su RMS:
     #    RMS = sqrt( mean( muestras^2 ) )
-    #    axis=1 indica "por fila".
-    rms_por_bloque = np.sqrt(np.mean(ir_bloques**2, axis=1))
+    #    La suma de cuadrados se hace con einsum, sin copiar la señal al cuadrado.
+    suma_cuadrados = np.einsum('...j,...j->...', ir_bloques, ir_bloques)
+    rms_por_bloque = np.sqrt(suma_cuadrados / tamano_bloque)
 
     return {'rms_por_bloque':rms_por_bloque,'tamano_bloque': tamano_bloque}
 
@@ -53,6 +58,8 @@ def lundeby(ri, fs, ms_bloque=20, max_iter=6, tol_cruce=1e-3, return_debug_data=
     Implementa el algoritmo de Lundeby para encontrar el punto de cruce entre el
     decaimiento de la respuesta al impulso y el ruido de fondo.
 
+    Es la versión de una sola banda de lundeby_bandas.
+
     Parámetros
     ----------
     ri : np.ndarray
@@ -82,73 +89,144 @@ def lundeby(ri, fs, ms_bloque=20, max_iter=6, tol_cruce=1e-3, return_debug_data=
         'idx_cruce': int, índice de la muestra del punto de cruce.
         'iteraciones': int, número de iteraciones realizadas.
         'convergencia': bool, indica si la iteración convergió.
+        'sin_rango': bool, indica si la iteración se detuvo porque el ruido no
+            deja rango dinámico para refinar la pendiente (SNR demasiado bajo).
         'tiempo_rms': np.ndarray, array de tiempos (en segundos) de la señal RMS.
         'schroeder_db': np.ndarray, array con la integral de Schroeder en dB.
     """ 
+    res = lundeby_bandas(np.asarray(ri)[None, :], fs, ms_bloque, max_iter, tol_cruce,
+                         return_debug_data=return_debug_data)
+    if not return_debug_data:
+        return int(res[0])
+    return {clave: (valor if clave == 'tiempo_rms' else valor[0]) for clave, valor in res.items()}
+
+def lundeby_bandas(envolventes, fs, ms_bloque=20, max_iter=6, tol_cruce=1e-3, return_debug_data=False):
+    """
+    Algoritmo de Lundeby para todas las bandas a la vez.
+
+    Cada banda sigue exactamente los pasos de lundeby (RMS por bloques, Schroeder
+    de los bloques, ruido inicial, regresión inicial y refinamiento iterativo),
+    pero las iteraciones avanzan en paralelo para todas las bandas: en cada paso
+    solo se recalculan las bandas que todavía no convergieron ni se detuvieron
+    por falta de rango dinámico.
+
+    Parámetros
+    ----------
+    envolventes : np.ndarray
+        Matriz (n_bandas, N) con las respuestas al impulso suavizadas.
+    fs : float
+        Frecuencia de muestreo en Hz.
+    ms_bloque : float, opcional
+        Duración de cada bloque en milisegundos. Por defecto 20 ms.
+    max_iter : int, opcional
+        Número máximo de iteraciones. Por defecto 6.
+    tol_cruce : float, opcional
+        Tolerancia para considerar convergida la iteración. Por defecto 1e-3.
+    return_debug_data : bool, opcional
+        Si True, devuelve un diccionario con los datos de depuración.
+
+    Retorna
+    -------
+    idx_cruce : np.ndarray
+        Array (n_bandas,) de enteros con el índice de cruce de cada banda.
+    o
+    debug_data : dict
+        Las mismas claves que lundeby, con arrays (n_bandas,) por clave;
+        'tiempo_rms' es común a todas las bandas (num_bloques,) y
+        'schroeder_db' es una matriz (n_bandas, num_bloques).
+    """
+    N = envolventes.shape[-1]
+    n_bandas = envolventes.shape[0]
 
     # 1) RMS por bloques
-    rms = calcular_rms_por_bloques(ri, fs, ms_bloque)
+    rms = calcular_rms_por_bloques(envolventes, fs, ms_bloque)
     rms_vals = rms['rms_por_bloque']
     tb = rms['tamano_bloque']
-    tiempo_rms = np.arange(len(rms_vals)) * tb / fs
+    num_bloques = rms_vals.shape[-1]
+    tiempo_rms = np.arange(num_bloques) * tb / fs
 
     # 2) Schroeder
     fs_rms = fs / tb
     sch = integral_schroeder(rms_vals, fs=fs_rms)
-    sch_db = escala_log(sch['schroeder'])
+    sch_db = escala_log(sch['schroeder'], por_fila=True)
+
+    # La curva de bloques se indexa una sola vez para todas las regresiones
+    curva = CurvaIndexada(tiempo_rms, sch_db)
+
+    # Sumas de cola: el ruido desde el bloque j es cola[:, j] / (num_bloques - j)
+    cola = np.cumsum(sch_db[:, ::-1], axis=-1)[:, ::-1]
+    largo_cola = num_bloques - np.arange(num_bloques)
 
     # 3) Ruido inicial
-    idx0 = int(len(sch_db)*0.9)
-    nivel_ruido = np.mean(sch_db[idx0:])
+    idx0 = int(num_bloques*0.9)
+    nivel_ruido = np.mean(sch_db[:, idx0:], axis=-1)
 
     # 4) Regresión inicial
     nivel_inf = nivel_ruido + 7.5
-    reg = regresion_lineal_en_intervalo(
-        tiempo_rms, sch_db,
-        lim_sup=0, lim_inf=nivel_inf
-    )
+    reg = curva.ajustar(lim_sup=0, lim_inf=nivel_inf)
     slope = reg['slope']; intercept = reg['intercept']
 
-    punto_cruce = (nivel_ruido - intercept) / slope
-    prev_cruce = punto_cruce
+    with np.errstate(divide='ignore', invalid='ignore'):
+        punto_cruce = (nivel_ruido - intercept) / slope
+    prev_cruce = punto_cruce.copy()
 
-    # 5) Iteración de Lundeby
-    convergencia = False
+    # 5) Iteración de Lundeby, todas las bandas en paralelo
+    convergencia = np.zeros(n_bandas, dtype=bool)
+    sin_rango_dinamico = np.zeros(n_bandas, dtype=bool)
+    iteraciones = np.zeros(n_bandas, dtype=int)
+    activas = np.isfinite(punto_cruce)
+    min_len = int(0.1 * N)
+    db_sup = -5.0  # Límite superior FIJO, en la zona limpia del decaimiento.
     for i in range(1, max_iter+1):
+        if not np.any(activas):
+            break
+        b = np.flatnonzero(activas)
+        iteraciones[b] = i
+
         # 5.1) Re-estimar ruido
-        t_start = (nivel_ruido + 7.5 - intercept) / slope
-        i0 = max(0, min(len(ri), int(t_start * fs)))
-        min_len = int(0.1 * len(ri))
-        if len(ri) - i0 < min_len:
-            i0 = len(ri) - min_len
-        nivel_ruido = np.mean(sch_db[int(i0/tb):])
+        t_start = (nivel_ruido[b] + 7.5 - intercept[b]) / slope[b]
+        i0 = np.clip(np.trunc(t_start * fs), 0, N).astype(int)
+        i0 = np.where(N - i0 < min_len, N - min_len, i0)
+        j0 = np.minimum(i0 // tb, num_bloques - 1)
+        nivel_ruido[b] = cola[b, j0] / largo_cola[j0]
 
         # 5.2) Nueva regresión
-        db_sup = -5.0  # Límite superior FIJO, en la zona limpia del decaimiento.
-        db_inf = nivel_ruido + 10.0 # Límite inferior adaptativo, 10 dB sobre el ruido.
+        db_inf = nivel_ruido[b] + 10.0 # Límite inferior adaptativo, 10 dB sobre el ruido.
 
         # Control de seguridad: ¿Hay suficiente rango dinámico para la regresión?
-        if db_inf >= db_sup:
-            print(f"ADVERTENCIA (Iteración {i}): SNR demasiado bajo. No se puede refinar más la pendiente.")
-            # Salimos del bucle y nos quedamos con el último valor válido.
-            break 
-            
-        reg = regresion_lineal_en_intervalo(
-            tiempo_rms, sch_db,
-            lim_sup=db_sup, lim_inf=db_inf
-        )
-        slope = reg['slope']; intercept = reg['intercept']
+        # Si no (SNR demasiado bajo), la banda se queda con el último valor válido.
+        sin_rango = db_inf >= db_sup
+        sin_rango_dinamico[b[sin_rango]] = True
+        activas[b[sin_rango]] = False
+        b = b[~sin_rango]
+        db_inf = db_inf[~sin_rango]
+        if len(b) == 0:
+            break
+
+        reg = curva.ajustar(lim_sup=db_sup, lim_inf=db_inf, filas=b)
+        slope[b] = reg['slope']; intercept[b] = reg['intercept']
 
         # 5.3) Nuevo punto de cruce
-        punto_cruce = (nivel_ruido - intercept) / slope
-        idx_cruce   = int(round(punto_cruce * fs))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            punto_cruce[b] = (nivel_ruido[b] - intercept[b]) / slope[b]
 
         # Check convergence
-        if abs(punto_cruce - prev_cruce) < tol_cruce:
-            convergencia = True
-            break
-        prev_cruce = punto_cruce
-        
+        convergio = np.abs(punto_cruce[b] - prev_cruce[b]) < tol_cruce
+        convergencia[b[convergio]] = True
+        activas[b[convergio | ~np.isfinite(punto_cruce[b])]] = False
+        prev_cruce[b] = punto_cruce[b]
+
+    # Si una banda no llega a iterar, su cruce es el de la regresión inicial
+    idx_cruce = np.round(np.nan_to_num(punto_cruce * fs)).astype(int)
+
+    if metricas.habilitadas():
+        metricas.observar('lundeby_iteraciones', iteraciones, metricas.BUCKETS_CONTEO)
+        n_convergidas = int(np.count_nonzero(convergencia))
+        n_sin_rango = int(np.count_nonzero(sin_rango_dinamico))
+        metricas.contar('lundeby_bandas_total', n_convergidas, convergio='si')
+        metricas.contar('lundeby_bandas_total', n_sin_rango, convergio='sin_rango')
+        metricas.contar('lundeby_bandas_total', n_bandas - n_convergidas - n_sin_rango, convergio='no')
+
     if not return_debug_data:
         return idx_cruce
     else:
@@ -159,14 +237,17 @@ def lundeby(ri, fs, ms_bloque=20, max_iter=6, tol_cruce=1e-3, return_debug_data=
         'intercept': intercept,
         'tiempo_cruce': punto_cruce,
         'idx_cruce':idx_cruce,
-        'iteraciones': i,
+        'iteraciones': iteraciones,
         'convergencia': convergencia,
+        'sin_rango': sin_rango_dinamico,
         'tiempo_rms': tiempo_rms,
         'schroeder_db':sch_db}
       
         return debug_data
       
-def integral_schroeder(p: np.ndarray, fs: float, t_lundeby: int = None) -> dict:
+def integral_schroeder(p: np.ndarray, fs: float, t_lundeby: int = None,
+                       out: np.ndarray = None, out_p2: np.ndarray = None,
+                       con_energia: bool = False) -> dict:
     """
     Calcula la integral de Schroeder hasta el tiempo de Lundeby y descarta
     la energía más allá de ese punto (ruido de fondo).
@@ -174,29 +255,52 @@ def integral_schroeder(p: np.ndarray, fs: float, t_lundeby: int = None) -> dict:
     Parameters
     ----------
     p : np.ndarray
-        Respuesta al impulso (suavizada).
-    t_lundeby : int, optional
+        Respuesta al impulso (suavizada). Puede ser una matriz (n_bandas, N),
+        en cuyo caso se integran todas las bandas a la vez a lo largo del último eje.
+    t_lundeby : int or np.ndarray, optional
         Índice de muestra que marca el fin de la parte útil (cruce Lundeby).
+        Para una matriz, un array (n_bandas,) con un índice por banda.
     fs : float
         Frecuencia de muestreo en Hz.
+    out : np.ndarray, optional
+        Solo para matrices: array float64 de la forma de p donde se escribe la
+        curva de Schroeder (la integración se hace en el mismo lugar, sin
+        temporales). La curva es float64 aunque p sea float32.
+    out_p2 : np.ndarray, optional
+        Solo para matrices: array de la forma de p donde se escribe p².
+    con_energia : bool, optional
+        Solo para matrices: si es True, se agrega 'energia' con el resumen de
+        energía (ver resumen_energia) leído del mismo cumsum, sobre toda la
+        longitud de p.
 
     Returns
     -------
     schroeder : np.ndarray
         Integral de Schroeder cortada en t_lundeby:
         S(t) = ∫ₜ^{t_L} p²(τ)dτ.
+        Para una matriz, tiene la forma de p y vale 0 desde t_lundeby de cada banda.
     p2 : np.ndarray
         Vector de p²(t).
+    energia : dict
+        Solo si con_energia es True.
     """
     dt = 1.0 / fs
+    if np.ndim(p) > 1:
+        p2 = np.multiply(p, p, out=out_p2)
+        S, energia = _integral_schroeder_matriz(p2, fs, t_lundeby, out, con_energia)
+        resultado = {'schroeder': S, 'p2': p2}
+        if con_energia:
+            resultado['energia'] = energia
+        return resultado
+
     p2 = p**2
     if t_lundeby is None:
         t_lundeby = len(p)
     # 1) Energía total hasta t_lundeby:
-    E_total_L = np.sum(p2[:t_lundeby]) * dt
+    E_total_L = np.sum(p2[:t_lundeby], dtype=np.float64) * dt
 
-    # 2) Energía acumulada hasta cada t:
-    E_acum = np.cumsum(p2[:t_lundeby]) * dt
+    # 2) Energía acumulada hasta cada t (siempre en float64):
+    E_acum = np.cumsum(p2[:t_lundeby], dtype=np.float64) * dt
 
     # 3) Integral de Schroeder hasta t_L:
     #    S(t) = E_total_L - E_acum(t)
@@ -206,3 +310,32 @@ def integral_schroeder(p: np.ndarray, fs: float, t_lundeby: int = None) -> dict:
     S[t_lundeby:] = 0.0
 
     return {'schroeder':S,'p2':p2}
+
+def _integral_schroeder_matriz(p2, fs, t_lundeby, out=None, con_energia=False):
+    """
+    Integral de Schroeder de todas las filas de p2 con un único cumsum. Si se
+    pasa out, todos los pasos se hacen sobre ese array. Con con_energia, el
+    resumen de energía se lee del cumsum antes de reutilizarlo para S (si no,
+    se devuelve None en su lugar).
+    """
+    dt = 1.0 / fs
+    N = p2.shape[-1]
+    if t_lundeby is None:
+        t_lundeby = np.full(p2.shape[:-1], N)
+    t_lundeby = np.clip(np.asarray(t_lundeby), 1, N)
+
+    # 1) Energía acumulada hasta cada t (todas las bandas juntas)
+    #    En float64 aunque p2 sea float32: la cola de S es una resta de valores
+    #    casi iguales y en float32 el piso quedaría cerca de -70 dB.
+    E_acum = np.cumsum(p2, axis=-1, dtype=np.float64, out=out)
+    energia = resumen_energia(E_acum, fs) if con_energia else None
+    E_acum *= dt
+
+    # 2) Energía total hasta el t_lundeby de cada banda
+    E_total_L = np.take_along_axis(E_acum, (t_lundeby - 1)[..., None], axis=-1)
+
+    # 3) S(t) = E_total_L - E_acum(t), y 0 para t >= t_lundeby
+    S = np.subtract(E_total_L, E_acum, out=E_acum)
+    for fila, t_L in zip(S.reshape(-1, N), t_lundeby.ravel()):
+        fila[t_L:] = 0.0
+    return S, energia
@@ -1,4 +1,5 @@
 import numpy as np
+from scipy import fft as sp_fft
 
 def hilbert_transform(s_t):
     """
@@ -6,59 +7,132 @@ def hilbert_transform(s_t):
     de la Transformada de Hilbert.
 
     Args:
-    s_t (np.ndarray): La señal de entrada.
+    s_t (np.ndarray): La señal de entrada. Puede ser una matriz (n_bandas, N):
+        la transformada se aplica a lo largo del último eje, todas las bandas a la vez.
 
     Returns:
     np.ndarray: La envolvente de la señal (envolvente).
     """
 
-    N = len(s_t)
+    N = np.shape(s_t)[-1]
 
     # Llevamosal dominio de frecuencias s(t)->S(w)
-    S_w = np.fft.fft(s_t)
-
-    # h representa a (1+sgn(w))
-    h = np.zeros(N)
+    S_w = np.fft.fft(s_t, axis=-1)
 
+    # Multiplicamos por (1+sgn(w)) directamente sobre el espectro, sin armar
+    # un array auxiliar h en cada llamada.
     #frecuencias positivas:
     # En el array FFT,ellas van desde 1 hasta la mitad
-    h[1:N//2] = 2
-    h[0]=1
+    S_w[..., 1:N//2] *= 2
     #Para la frecuencia de Nyquist del punto medio (solo  si N es par),  no tiene un conjugado negativo.
-    if N % 2 == 0:
-        h[N // 2] = 1
+    #El resto (frecuencias negativas) se anula.
+    S_w[..., N//2 + (1 if N % 2 == 0 else 0):] = 0
 
     #obtenemos la señal analitica como S_a(t)= F⁻¹{(S(w)(1+sgn(w))}
-    S_w *= h 
-    analitica = np.fft.ifft(S_w)
+    analitica = np.fft.ifft(S_w, axis=-1)
 
     #Calculamos la envolvente de la señal
     envolvente = np.abs(analitica)
 
     return envolvente
 
-def filtro_promedio_movil(x, L):
+def envolvente_hilbert(s_t, workers=None, relleno=0):
+    """
+    Envolvente de la señal analítica calculada con FFT reales.
+
+    A diferencia de hilbert_transform, no arma el espectro complejo completo:
+    obtiene la transformada de Hilbert x̂(t) = F⁻¹{-j·sgn(w)·S(w)} con un par
+    rfft/irfft y calcula la envolvente como |x + j·x̂| = hypot(x, x̂). Con
+    relleno, las FFT se hacen con el largo rápido inmediato superior a N +
+    relleno (scipy.fft.next_fast_len), para evitar la lentitud de los largos
+    primos o con factores grandes: los ceros de más no cambian nada, porque la
+    señal ya no se pliega sobre sí misma.
+
+    Args:
+    s_t (np.ndarray): La señal de entrada, 1D o matriz (n_bandas, N); en ese caso
+        todas las bandas se transforman a la vez a lo largo del último eje.
+    workers (int, optional): Cantidad de hilos para las FFT de scipy.fft
+        (-1 usa todos los núcleos). Por defecto None (un hilo).
+    relleno (int, optional): Ceros que se agregan al final antes de las FFT. Sin
+        relleno la transformada es circular: si la señal empieza con amplitud
+        grande (una RI que arranca en el sonido directo), el salto entre su
+        final y su inicio ensucia la cola de la envolvente. Con relleno = N el
+        salto queda a N muestras de la señal. Por defecto 0: FFT de largo N
+        exacto, con el mismo resultado que abs(scipy.signal.hilbert(s_t)) (y
+        que hilbert_transform cuando N es par; con N impar, hilbert_transform
+        descarta la frecuencia positiva más alta).
+
+    Returns:
+    np.ndarray: La envolvente, de la misma forma que s_t.
+    """
+    N = np.shape(s_t)[-1]
+    n_fft = sp_fft.next_fast_len(N + relleno, real=True) if relleno else N
+
+    # Espectro de frecuencias positivas
+    S_w = sp_fft.rfft(s_t, n_fft, axis=-1, workers=workers)
+
+    # -j·sgn(w): la continua y Nyquist no tienen transformada de Hilbert
+    S_w[..., 0] = 0
+    if n_fft % 2 == 0:
+        S_w[..., -1] = 0
+    S_w *= -1j
+
+    s_hilbert = sp_fft.irfft(S_w, n_fft, axis=-1, workers=workers)[..., :N]
+
+    #Calculamos la envolvente de la señal
+    return np.hypot(s_t, s_hilbert)
+
+def filtro_promedio_movil(x, L, axis=-1, paso=1):
     """
     Aplica un filtro de promedio móvil de longitud L a una señal x.
+
+    Equivale a np.convolve(x, np.ones(L)/L, mode='same') (mismo largo de salida,
+    misma alineación y ceros fuera de la señal), pero se calcula con una suma
+    acumulada: cada salida es la diferencia de dos valores del acumulado, por lo
+    que el costo es O(N) sin importar el largo de la ventana.
     
     Parámetros:
     ------------
     x : ndarray
-        Señal de entrada (1D, array de valores reales o complejos).
+        Señal de entrada (1D, array de valores reales o complejos), o array
+        multibanda, por ejemplo una matriz (n_bandas, N).
     L : int
         Longitud (muestras) de la ventana de promedio.
+    axis : int, opcional
+        Eje a lo largo del cual se promedia. Por defecto el último.
+    paso : int, opcional
+        Si es mayor que 1, la salida se diezma por `paso`: se calcula solo la
+        muestra central de cada intervalo de `paso` muestras (equivale a
+        y[..., paso//2::paso], sin calcular las demás), de modo que la muestra j
+        representa al intervalo [j·paso, (j+1)·paso). Por defecto 1.
     
     Retorna:
     --------
     y : ndarray
-        Señal suavizada.
+        Señal suavizada, float32 si x es float32 (la suma acumulada se hace
+        siempre en float64) y float64 en otro caso.
     """
     if L < 1:
         raise ValueError("La longitud L debe ser mayor o igual a 1")
 
-    # Creamos la ventana deslizante
-    kernel = np.ones(L) / L
+    x = np.moveaxis(np.asarray(x), axis, -1)
+    N = x.shape[-1]
+
+    # 1) Suma acumulada con un cero adelante: c[k] = x[0] + ... + x[k-1]
+    c = np.zeros(x.shape[:-1] + (N + 1,), dtype=np.result_type(x.dtype, np.float64))
+    np.cumsum(x, axis=-1, out=c[..., 1:])
+
+    # 2) Índices de la convolución completa que conserva mode='same'
+    #    (largo max(N, L), centrado)
+    n_salida = max(N, L)
+    inicio = (N + L - 1 - n_salida) // 2
+    k = np.arange(inicio + paso // 2, inicio + n_salida, paso)
+
+    # 3) Salida k de la convolución completa: suma de x[k-L+1 .. k] (recortado a la señal)
+    hasta = np.minimum(k + 1, N)
+    desde = np.maximum(k - L + 1, 0)
+    y = (c[..., hasta] - c[..., desde]) / L
+    if x.dtype == np.float32:
+        y = y.astype(np.float32)
 
-    # Convolucionamos
-    y = np.convolve(x, kernel, mode='same')  
-    return y
+    return np.moveaxis(y, -1, axis)
\ No newline at end of file